@@ -0,0 +1,19 @@
+"""
+Template context processors for role-based access control.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from .identity import identity_map
+
+
+def user_roles(request):
+    """
+    Expose the user's group names as `user_roles`, read lazily through the
+    request's identity map:
+
+        {% if user.is_superuser or 'Admin' in user_roles %}
+    """
+    user = getattr(request, 'user', None)
+    if user is None:
+        return {'user_roles': frozenset()}
+    return {'user_roles': SimpleLazyObject(lambda: identity_map().group_names(user))}
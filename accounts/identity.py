@@ -0,0 +1,86 @@
+"""
+Request-scoped identity map.
+
+IdentityMapMiddleware gives every request its own IdentityMap, so views
+and permission helpers that look up the same row (a post by slug, the
+user's groups) share one fetch instead of each running its own query.
+Outside a request, identity_map() returns a fresh map that caches nothing
+between calls.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.http import Http404
+
+
+_current = ContextVar('identity_map', default=None)
+
+_MISSING = object()
+
+
+class IdentityMap:
+    """Model instances by primary key and by the lookups used to find them."""
+
+    def __init__(self):
+        self._objects = {}
+        self._lookups = {}
+        self._groups = {}
+
+    def get(self, model, **lookup):
+        """
+        Return the instance matching `lookup` from the default manager,
+        querying at most once per distinct lookup. Raises DoesNotExist.
+        """
+        label = model._meta.label
+        key = (label, tuple(sorted(lookup.items())))
+        pk = self._lookups.get(key, lookup.get('pk'))
+        if pk is _MISSING:
+            raise model.DoesNotExist(f'{model._meta.object_name} matching query does not exist.')
+        if pk is not None and (label, pk) in self._objects:
+            return self._objects[(label, pk)]
+        try:
+            obj = model._default_manager.get(**lookup)
+        except model.DoesNotExist:
+            # Remember misses too, so a 404 costs one query
+            self._lookups[key] = _MISSING
+            raise
+        self._lookups[key] = obj.pk
+        return self.add(obj)
+
+    def get_or_404(self, model, **lookup):
+        try:
+            return self.get(model, **lookup)
+        except model.DoesNotExist:
+            raise Http404(f'No {model._meta.verbose_name} found matching the query')
+
+    def add(self, obj):
+        self._objects[(obj._meta.label, obj.pk)] = obj
+        return obj
+
+    def group_names(self, user):
+        """Names of the user's groups, fetched once per request."""
+        if not user.is_authenticated:
+            return frozenset()
+        names = self._groups.get(user.pk)
+        if names is None:
+            names = self._groups[user.pk] = frozenset(user.groups.values_list('name', flat=True))
+        return names
+
+    def forget_groups(self, user):
+        self._groups.pop(user.pk, None)
+
+
+def identity_map():
+    """The current request's IdentityMap, or a throwaway one outside requests."""
+    current = _current.get()
+    return current if current is not None else IdentityMap()
+
+
+@contextmanager
+def identity_scope():
+    """Use a fresh IdentityMap for the duration of the block."""
+    token = _current.set(IdentityMap())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
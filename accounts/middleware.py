@@ -5,6 +5,21 @@ from django.contrib.auth.models import Group
 from django.utils import timezone
 from django.contrib.auth.signals import user_logged_in
 
+from .identity import identity_map, identity_scope
+
+
+class IdentityMapMiddleware:
+    """
+    Give each request its own IdentityMap (see accounts.identity), so a
+    model instance or the user's groups are fetched at most once per request.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_scope():
+            return self.get_response(request)
+
 
 class AssignDefaultRoleMiddleware:
     """
@@ -18,10 +33,11 @@ class AssignDefaultRoleMiddleware:
         # Assign default Reader role if user has no groups (fallback only)
         # Note: Role should be assigned during registration, this is just a safety net
         if request.user.is_authenticated and not request.user.is_superuser:
-            if not request.user.groups.exists():
+            if not identity_map().group_names(request.user):
                 try:
                     reader_group = Group.objects.get(name='Reader')
                     request.user.groups.add(reader_group)
+                    identity_map().forget_groups(request.user)
                 except Group.DoesNotExist:
                     # Groups not created yet, skip silently
                     pass
@@ -1,29 +1,34 @@
 """
 Permission utilities for role-based access control.
+
+Group membership is read through the request's identity map, so any number
+of checks in one request cost a single query.
 """
 from django.contrib.auth.models import Group
 from django.core.exceptions import PermissionDenied
 
+from .identity import identity_map
+
 
 def is_admin(user):
     """Check if user is in Admin group."""
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name='Admin').exists() or user.is_superuser
+    return 'Admin' in identity_map().group_names(user) or user.is_superuser
 
 
 def is_author(user):
     """Check if user is in Author group."""
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name='Author').exists()
+    return 'Author' in identity_map().group_names(user)
 
 
 def is_reader(user):
     """Check if user is in Reader group."""
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name='Reader').exists()
+    return 'Reader' in identity_map().group_names(user)
 
 
 def can_edit_post(user, post):
@@ -39,7 +44,7 @@ def can_edit_post(user, post):
     if is_admin(user):
         return True
     
-    if is_author(user) and post.author == user:
+    if is_author(user) and post.author_id == user.pk:
         return True
     
     return False
@@ -58,7 +63,7 @@ def can_delete_post(user, post):
     if is_admin(user):
         return True
     
-    if is_author(user) and post.author == user:
+    if is_author(user) and post.author_id == user.pk:
         return True
     
     return False
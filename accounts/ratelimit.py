@@ -0,0 +1,110 @@
+"""
+Token-bucket rate limiting backed by the Django cache.
+
+Each limit in settings.RATE_LIMITS has a refill rate and a burst size:
+
+    RATE_LIMITS = {'comment': {'rate': '6/m', 'burst': 3}}
+
+A client may make `burst` requests back to back, then one request per
+1/rate seconds. Authenticated requests draw from a bucket for the user and
+one for the client IP; anonymous requests only from the IP bucket. A bucket
+is a single cache entry, so a check costs one get_many and one set_many
+whatever the traffic. Concurrent requests from the same client can race
+between the read and the write and occasionally let one extra request
+through, which is acceptable for abuse throttling.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import render
+
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Convert '6/m' (or '100/5m') into tokens per second."""
+    count, period = rate.split('/')
+    multiplier = int(period[:-1]) if len(period) > 1 else 1
+    return int(count) / (multiplier * RATE_UNITS[period[-1]])
+
+
+def get_client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class TokenBucket:
+    """
+    Token buckets stored as (tokens, timestamp) in a cache.
+    Tokens are refilled lazily from the elapsed time on each check.
+    """
+
+    def __init__(self, rate, burst, cache=None, prefix='ratelimit'):
+        self.rate = parse_rate(rate) if isinstance(rate, str) else rate
+        self.burst = burst
+        self.cache = cache or caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+        self.prefix = prefix
+        # Keep a bucket until it would have refilled completely
+        self.timeout = math.ceil(burst / self.rate) + 1
+
+    def consume(self, keys, now=None):
+        """
+        Take one token from every bucket in `keys`.
+        Returns (allowed, retry_after_seconds); nothing is taken when denied.
+        """
+        now = time.time() if now is None else now
+        cache_keys = [f'{self.prefix}:{key}' for key in keys]
+        stored = self.cache.get_many(cache_keys)
+
+        levels = {}
+        for cache_key in cache_keys:
+            tokens, updated = stored.get(cache_key, (self.burst, now))
+            levels[cache_key] = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+        lowest = min(levels.values())
+        if lowest < 1:
+            return False, math.ceil((1 - lowest) / self.rate)
+
+        self.cache.set_many({key: (level - 1, now) for key, level in levels.items()}, self.timeout)
+        return True, 0
+
+
+def rate_limit_keys(scope, request):
+    keys = [f'{scope}:ip:{get_client_ip(request)}']
+    if request.user.is_authenticated:
+        keys.append(f'{scope}:user:{request.user.pk}')
+    return keys
+
+
+def too_many_requests(request, retry_after):
+    """429 page with a Retry-After header."""
+    response = render(request, '429.html', {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """
+    Limit a view with the RATE_LIMITS[scope] bucket. Only requests using one
+    of `methods` are counted, so showing a form is never throttled.
+
+        @ratelimit('comment')
+        def add_comment(request, slug): ...
+
+        path('login/', ratelimit('login')(LoginView.as_view()), name='login')
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            config = getattr(settings, 'RATE_LIMITS', {}).get(scope)
+            if config and getattr(settings, 'RATE_LIMIT_ENABLED', True) and request.method in methods:
+                bucket = TokenBucket(config['rate'], config['burst'])
+                allowed, retry_after = bucket.consume(rate_limit_keys(scope, request))
+                if not allowed:
+                    return too_many_requests(request, retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
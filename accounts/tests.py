@@ -1,3 +1,138 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import caches
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .identity import identity_map, identity_scope
+from .permissions import can_create_post, is_admin, is_reader
+from .ratelimit import TokenBucket, parse_rate
+
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit-tests'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TokenBucketTests(TestCase):
+    """Token bucket burst and steady-state behaviour, with an explicit clock."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.bucket = TokenBucket('6/m', burst=3)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('6/m'), 0.1)
+        self.assertEqual(parse_rate('10/s'), 10)
+        self.assertEqual(parse_rate('30/5m'), 0.1)
+
+    def test_burst_then_denied(self):
+        results = [self.bucket.consume(['a'], now=1000)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_retry_after_until_next_token(self):
+        for _ in range(3):
+            self.bucket.consume(['a'], now=1000)
+        self.assertEqual(self.bucket.consume(['a'], now=1000), (False, 10))
+        self.assertEqual(self.bucket.consume(['a'], now=1004), (False, 6))
+        self.assertEqual(self.bucket.consume(['a'], now=1010), (True, 0))
+
+    def test_steady_state_rate(self):
+        for _ in range(3):
+            self.bucket.consume(['a'], now=1000)
+        # One request every 10 seconds is sustained indefinitely
+        for step in range(1, 20):
+            self.assertTrue(self.bucket.consume(['a'], now=1000 + step * 10)[0])
+        # ...but not faster
+        self.assertFalse(self.bucket.consume(['a'], now=1000 + 19 * 10 + 5)[0])
+
+    def test_refill_is_capped_at_burst(self):
+        self.bucket.consume(['a'], now=1000)
+        results = [self.bucket.consume(['a'], now=5000)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_keys_are_independent(self):
+        for _ in range(3):
+            self.bucket.consume(['a'], now=1000)
+        self.assertTrue(self.bucket.consume(['b'], now=1000)[0])
+
+    def test_denied_when_any_bucket_is_empty(self):
+        for _ in range(3):
+            self.bucket.consume(['ip'], now=1000)
+        self.assertFalse(self.bucket.consume(['user', 'ip'], now=1000)[0])
+        # The user bucket was not charged for the denied request
+        for _ in range(3):
+            self.assertTrue(self.bucket.consume(['user'], now=1000)[0])
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    RATE_LIMITS={'login': {'rate': '1/m', 'burst': 2}, 'register': {'rate': '1/h', 'burst': 1}},
+)
+class RateLimitedViewTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_login_returns_429_after_burst(self):
+        url = reverse('accounts:login')
+        data = {'username': 'nobody', 'password': 'wrong'}
+        # A fixed clock, so slow password checks don't refill the bucket between posts
+        with mock.patch('accounts.ratelimit.time.time', return_value=1000):
+            self.assertEqual(self.client.post(url, data).status_code, 200)
+            self.assertEqual(self.client.post(url, data).status_code, 200)
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_get_is_not_limited(self):
+        url = reverse('accounts:login')
+        for _ in range(5):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_register_limited_per_ip(self):
+        url = reverse('accounts:register')
+        self.client.post(url, {})
+        response = self.client.post(url, {}, REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        # Another client address has its own bucket
+        self.assertNotEqual(self.client.post(url, {}, REMOTE_ADDR='10.0.0.2').status_code, 429)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        url = reverse('accounts:login')
+        for _ in range(5):
+            self.assertEqual(self.client.post(url, {}).status_code, 200)
+
+
+class IdentityMapTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('author', password='pass')
+        self.user.groups.add(Group.objects.create(name='Author'))
+
+    def test_lookups_are_cached_within_a_scope(self):
+        with identity_scope() as objects:
+            with self.assertNumQueries(1):
+                first = objects.get(User, username='author')
+                self.assertIs(objects.get(User, username='author'), first)
+                self.assertIs(objects.get(User, pk=first.pk), first)
+            with self.assertNumQueries(1):
+                for _ in range(2):
+                    with self.assertRaises(Http404):
+                        objects.get_or_404(User, username='missing')
+
+    def test_permission_checks_share_one_group_query(self):
+        with identity_scope():
+            with self.assertNumQueries(1):
+                self.assertTrue(can_create_post(self.user))
+                self.assertFalse(is_admin(self.user))
+                self.assertFalse(is_reader(self.user))
+
+    def test_no_caching_outside_a_scope(self):
+        with self.assertNumQueries(2):
+            identity_map().get(User, username='author')
+            identity_map().get(User, username='author')
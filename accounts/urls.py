@@ -4,12 +4,13 @@ URL configuration for accounts app.
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from . import views
+from .ratelimit import ratelimit
 
 app_name = 'accounts'
 
 urlpatterns = [
     path('register/', views.RegisterView.as_view(), name='register'),
-    path('login/', auth_views.LoginView.as_view(template_name='accounts/login.html'), name='login'),
+    path('login/', ratelimit('login')(auth_views.LoginView.as_view(template_name='accounts/login.html')), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('profile/', views.profile_view, name='profile'),
 ]
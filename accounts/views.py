@@ -5,9 +5,12 @@ from django.contrib import messages
 from django.contrib.auth.models import Group
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from .forms import UserRegistrationForm
+from .ratelimit import ratelimit
 
 
+@method_decorator(ratelimit('register'), name='dispatch')
 class RegisterView(CreateView):
     """User registration view."""
     form_class = UserRegistrationForm
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,18 +41,26 @@ INSTALLED_APPS = [
     # Third-party apps
     'ckeditor',
     'ckeditor_uploader',
-    'taggit',
     # Local apps
     'blog',
     'accounts',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    # Request metrics (first, so timings cover the whole stack)
+    'monitoring.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # CDN cache headers (outside everything that may set cookies, see blog.cdn)
+    'blog.cdn.EdgeCacheMiddleware',
+    'blog.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Request-scoped identity map (before anything that checks permissions)
+    'accounts.middleware.IdentityMapMiddleware',
+    'monitoring.middleware.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Custom middleware
@@ -63,7 +72,8 @@ ROOT_URLCONF = 'advanced_blog.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates subclass that reports render time to the request metrics
+        'BACKEND': 'monitoring.template_backend.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,6 +82,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.user_roles',
             ],
         },
     },
@@ -87,9 +98,48 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests (pragmas run once per connection)
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds the sqlite3 driver waits for a lock before raising "database is locked"
+            'timeout': 20,
+        },
     }
 }
 
+# Local read-replica stand-in: a copy of db.sqlite3 refreshed by `python manage.py sync_replica`.
+# Set BLOG_SQLITE_REPLICA=1 to route read-only views to it.
+if os.environ.get('BLOG_SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        # Tests read the replica through the primary's test database
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+# Read replicas for views with `replica_reads = True` (see blog.routers)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['blog.routers.ReadReplicaRouter']
+# Seconds a client keeps reading from the primary after it writes
+REPLICA_STICKY_SECONDS = 10
+
+# SQLite tuning, applied to every new connection (see blog.db.apply_sqlite_pragmas)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',         # readers no longer block the writer
+    'synchronous': 'NORMAL',       # safe with WAL, far fewer fsyncs
+    'mmap_size': 134217728,        # 128 MB memory-mapped I/O
+    'cache_size': -20000,          # ~20 MB page cache per connection
+    'busy_timeout': 20000,         # ms to wait for a lock
+    'temp_store': 'MEMORY',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -145,14 +195,137 @@ CKEDITOR_CONFIGS = {
     },
 }
 
-# Taggit Configuration
-TAGGIT_CASE_INSENSITIVE = True
-
 # Authentication Settings
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/accounts/login/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Request metrics
+# Server-Timing header with total/db/template time on every response
+SERVER_TIMING_HEADER = True
+# Clients allowed to scrape /monitoring/metrics/ without a staff login
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# Slow query log (set the threshold to None to disable)
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_FILE = BASE_DIR / 'logs' / 'slow_queries.jsonl'
+
+# Request profiling (staff: X-Profile: 1 header or ?profile=1)
+PROFILING_DIR = BASE_DIR / 'profiles'
+# Also profile one in N requests (0 disables sampling)
+PROFILING_SAMPLE_EVERY = 0
+# Oldest profiles beyond this are deleted with their files
+PROFILING_MAX_PROFILES = 200
+
+# Post view counting (see blog.counters)
+# Buffered views are written to PostStats at most this often, in seconds
+VIEW_COUNT_FLUSH_INTERVAL = 30
+# ...or as soon as this many post/day pairs are waiting
+VIEW_COUNT_MAX_PENDING = 1000
+
+# Days of recent activity shown on the author dashboard
+DASHBOARD_ACTIVITY_DAYS = 7
+
+# Daily Rollups Configuration (python manage.py rollup_stats, see blog.rollups)
+# Rows newer than this are left for the next run, so open transactions are not skipped
+ROLLUP_LAG_SECONDS = 60
+
+# Post Rankings Configuration (python manage.py update_rankings, see blog.rankings)
+# Activity loses half its weight after this many hours
+RANKING_HALF_LIFE_HOURS = {
+    'trending': 24,
+    'discussed': 72,
+}
+# An approved comment counts as this many views towards Trending
+RANKING_COMMENT_WEIGHT = 5
+# Days of activity considered when a post is recomputed
+RANKING_WINDOW_DAYS = 14
+# Posts shown in each ranking module
+RANKING_TOP_N = 5
+
+# Comment Threads Configuration
+# Replies deeper than this are attached to the deepest allowed ancestor
+COMMENT_MAX_DEPTH = 4
+# Top-level threads per page on the post detail page
+COMMENT_THREADS_PER_PAGE = 20
+# Threads untouched this long are moved to the archive (python manage.py archive_comments, see blog.archive)
+COMMENT_ARCHIVE_AFTER_DAYS = 365
+# Threads moved per transaction
+COMMENT_ARCHIVE_BATCH_SIZE = 200
+
+# Comment Queue Configuration (python manage.py drain_comments, see blog.comment_queue)
+# Queue new comments on disk and insert them in batches instead of one INSERT each
+COMMENT_QUEUE_ENABLED = False
+COMMENT_QUEUE_DIR = BASE_DIR / 'comment_queue'
+# Comments inserted per transaction
+COMMENT_QUEUE_BATCH_SIZE = 500
+# Seconds before comments claimed by a drainer that died are queued again
+COMMENT_QUEUE_CLAIM_TIMEOUT = 300
+
+# Exports Configuration (CSV/JSON Lines downloads, see blog.exports)
+# Rows fetched from the database and sent to the client at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# Search Suggestions Configuration (/search/suggest/, see blog.suggestions)
+# Suggestions returned per group (posts, categories, tags)
+SEARCH_SUGGEST_LIMIT = 5
+# A process further behind the change log than this rebuilds its title index
+SEARCH_SUGGEST_MAX_CHANGES = 500
+
+# Rate Limiting Configuration (token buckets, see accounts.ratelimit)
+# 'rate' is the steady refill rate, 'burst' how many requests may arrive back to back
+RATE_LIMITS = {
+    'comment': {'rate': '6/m', 'burst': 3},
+    'register': {'rate': '5/h', 'burst': 3},
+    'login': {'rate': '10/m', 'burst': 5},
+}
+RATE_LIMIT_ENABLED = True
+# Use a cache shared by all workers (Redis/Memcached) in production
+RATE_LIMIT_CACHE = 'default'
+
+# Fragment Caching Configuration ({% fragment %} tag, see blog.fragments)
+FRAGMENT_CACHE_ENABLED = True
+# Use a cache shared by all workers (Redis/Memcached) in production
+FRAGMENT_CACHE = 'default'
+# Keys change whenever their content does, so this only bounds stale memory
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Page Caching Configuration (per role segment, see blog.page_cache)
+# Cache the home, post, category and tag pages once per role instead of per user
+PAGE_CACHE_ENABLED = False
+# Bounds how stale the trending and most-discussed sidebars can get
+PAGE_CACHE_TIMEOUT = 60
+
+# Warm-up Configuration (python manage.py warmup, see blog.warmup)
+# Run the warm-up steps in every WSGI worker before it serves requests
+WARMUP_ON_BOOT = False
+# Steps left out of the on-boot warm-up, e.g. ('pages',)
+WARMUP_SKIP = ()
+# Newest published posts whose pages are rendered (plus the trending ones)
+WARMUP_POSTS = 10
+
+# Static Export Configuration (python manage.py export_static, see blog.static_export)
+# Directory the HTML files and their manifest are written to
+STATIC_EXPORT_DIR = BASE_DIR / 'static_site'
+# Pages rendered in parallel
+STATIC_EXPORT_WORKERS = 4
+
+# CDN Configuration (Cache-Control and surrogate keys, see blog.cdn)
+# Shared-cache lifetimes for anonymous pages; purges on change keep them fresh
+EDGE_CACHE_POLICIES = {
+    'listing': {'s_maxage': 300, 'stale_while_revalidate': 60},
+    'post': {'s_maxage': 3600, 'stale_while_revalidate': 300},
+}
+# 'Surrogate-Key' for Fastly, 'Cache-Tag' for Cloudflare, 'xkey' for Varnish
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+# e.g. 'blog.cdn.HTTPPurgeBackend' with {'url': ..., 'headers': {'Fastly-Key': ...}}
+CDN_PURGE_BACKEND = 'blog.cdn.NullPurgeBackend'
+CDN_PURGE_OPTIONS = {}
+
+# Startup Budget (python manage.py importtime, see monitoring.startup)
+# Cold start of the WSGI application in a fresh interpreter, best of 3 runs
+STARTUP_BUDGET_MS = 1000
+
 # Site URL (for email notifications)
 SITE_URL = 'http://localhost:8000'  # Change this in production
 
@@ -13,6 +13,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('ckeditor/', include('ckeditor_uploader.urls')),
     path('accounts/', include('accounts.urls')),
+    path('monitoring/', include('monitoring.urls')),
     path('', include('blog.urls')),
 ]
 
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'advanced_blog.settings')
 
 application = get_wsgi_application()
+
+# Optional warm-up so the first requests to this worker aren't slow (see blog.warmup)
+if getattr(settings, 'WARMUP_ON_BOOT', False):
+    from blog.warmup import run_warmup
+    run_warmup(skip=getattr(settings, 'WARMUP_SKIP', ()))
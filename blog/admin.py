@@ -1,12 +1,31 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Post, Category, Tag, Comment
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from .models import (
+    Post, Category, Tag, Comment, ArchivedComment, PostStats,
+    CategoryDailyStats, TagDailyStats, AuthorDailyStats,
+)
+from .taxonomy import taxonomy_index
+
+
+class IndexedAutocompleteMixin:
+    """Answer admin autocomplete lookups from the in-memory taxonomy index (blog.taxonomy)."""
+    taxonomy_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        match = request.resolver_match
+        if search_term and match is not None and match.url_name == 'autocomplete':
+            ids = [pk for pk, _ in taxonomy_index.search(self.taxonomy_kind, search_term, limit=100)]
+            return queryset.filter(pk__in=ids), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(IndexedAutocompleteMixin, admin.ModelAdmin):
     """Admin configuration for Category model."""
+    taxonomy_kind = 'categories'
     list_display = ['name', 'slug', 'post_count', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'slug']
@@ -22,8 +41,9 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(IndexedAutocompleteMixin, admin.ModelAdmin):
     """Admin configuration for Tag model."""
+    taxonomy_kind = 'tags'
     list_display = ['name', 'slug', 'post_count', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'slug']
@@ -52,13 +72,14 @@ class TagAdmin(admin.ModelAdmin):
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     """Admin configuration for Post model."""
-    list_display = ['title', 'author', 'category', 'status', 'created_at', 'published_at', 'comment_count', 'post_actions']
+    list_display = ['title', 'author', 'category', 'status', 'created_at', 'published_at', 'view_count', 'comment_count', 'post_actions']
     list_filter = ['status', 'category', 'created_at', 'published_at']
     search_fields = ['title', 'content', 'author__username', 'author__email']
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ['created_at', 'updated_at', 'published_at']
     date_hierarchy = 'created_at'
-    filter_horizontal = ['tags']
+    # Loads only the selected values; searches go through the taxonomy index
+    autocomplete_fields = ['category', 'tags']
     # Comment inline disabled temporarily to fix formset error
     # You can manage comments separately in the Comments admin section
     # inlines = [CommentInline]
@@ -89,6 +110,12 @@ class PostAdmin(admin.ModelAdmin):
         return 0
     comment_count.short_description = 'Comments'
     
+    def view_count(self, obj):
+        """Display total views recorded in PostStats."""
+        return getattr(obj, 'total_views', 0)
+    view_count.short_description = 'Views'
+    view_count.admin_order_field = 'total_views'
+    
     def post_actions(self, obj):
         """Display action buttons."""
         if obj and obj.pk and obj.slug:
@@ -113,7 +140,9 @@ class PostAdmin(admin.ModelAdmin):
         """Optimize queryset with select_related."""
         try:
             qs = super().get_queryset(request)
-            return qs.select_related('author', 'category').prefetch_related('tags', 'comments')
+            return qs.select_related('author', 'category').prefetch_related('tags', 'comments').annotate(
+                total_views=Coalesce(Sum('stats__views'), 0)
+            )
         except:
             return super().get_queryset(request)
 
@@ -124,13 +153,14 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ['content_preview', 'post_link', 'user', 'is_approved', 'created_at', 'comment_actions']
     list_filter = ['is_approved', 'created_at', 'post__category']
     search_fields = ['content', 'user__username', 'post__title']
-    readonly_fields = ['post', 'user', 'content', 'created_at', 'updated_at']
+    readonly_fields = ['post', 'parent', 'user', 'content', 'created_at', 'updated_at']
     date_hierarchy = 'created_at'
     list_editable = ['is_approved']
+    actions = ['approve_threads', 'hide_threads']
     
     fieldsets = (
         ('Comment Information', {
-            'fields': ('post', 'user', 'content', 'is_approved')
+            'fields': ('post', 'parent', 'user', 'content', 'is_approved')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at')
@@ -168,6 +198,18 @@ class CommentAdmin(admin.ModelAdmin):
         return '-'
     comment_actions.short_description = 'Actions'
     
+    def approve_threads(self, request, queryset):
+        """Approve the selected comments and all replies to them."""
+        count = sum(comment.set_subtree_approved(True) for comment in queryset)
+        self.message_user(request, f'{count} comments approved.')
+    approve_threads.short_description = 'Approve selected comments and their replies'
+    
+    def hide_threads(self, request, queryset):
+        """Hide the selected comments and all replies to them."""
+        count = sum(comment.set_subtree_approved(False) for comment in queryset)
+        self.message_user(request, f'{count} comments hidden.')
+    hide_threads.short_description = 'Hide selected comments and their replies'
+    
     def get_queryset(self, request):
         """Optimize queryset with select_related."""
         try:
@@ -175,3 +217,120 @@ class CommentAdmin(admin.ModelAdmin):
             return qs.select_related('post', 'user', 'post__author')
         except:
             return super().get_queryset(request)
+
+
+@admin.register(ArchivedComment)
+class ArchivedCommentAdmin(admin.ModelAdmin):
+    """Read-only archived comments (moved here by python manage.py archive_comments)."""
+    list_display = ['id', 'post', 'user', 'is_approved', 'created_at', 'archived_at']
+    list_filter = ['is_approved', 'archived_at']
+    search_fields = ['content', 'user__username', 'post__title']
+    date_hierarchy = 'created_at'
+    list_select_related = ['post', 'user']
+    readonly_fields = ['id', 'post', 'user', 'parent_id', 'content', 'is_approved', 'path', 'depth',
+                       'created_at', 'updated_at', 'archived_at']
+
+    def has_add_permission(self, request):
+        """Rows are written by the archive_comments command only."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PostStats)
+class PostStatsAdmin(admin.ModelAdmin):
+    """Read-only daily view counts per post."""
+    list_display = ['post', 'date', 'views']
+    list_filter = ['date']
+    search_fields = ['post__title']
+    date_hierarchy = 'date'
+    list_select_related = ['post']
+    readonly_fields = ['post', 'date', 'views']
+
+    def has_add_permission(self, request):
+        """Rows are written by the view counter only."""
+        return False
+
+
+class DateRangeFilter(admin.FieldListFilter):
+    """From/to date inputs filtering on <field>__gte and <field>__lte."""
+    template = 'admin/blog/date_range_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_gte = f'{field_path}__gte'
+        self.lookup_lte = f'{field_path}__lte'
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def expected_parameters(self):
+        return [self.lookup_gte, self.lookup_lte]
+
+    def choices(self, changelist):
+        ours = self.expected_parameters()
+        yield {
+            'gte_name': self.lookup_gte,
+            'lte_name': self.lookup_lte,
+            'gte': self.used_parameters.get(self.lookup_gte, ''),
+            'lte': self.used_parameters.get(self.lookup_lte, ''),
+            'hidden': [(name, value) for name, value in changelist.params.items() if name not in ours],
+            'reset_url': changelist.get_query_string(remove=ours),
+        }
+
+
+class DailyRollupAdmin(admin.ModelAdmin):
+    """Read-only report over a daily rollup filled by the rollup_stats command."""
+    dimension = None
+    list_display = ['date', 'posts_published', 'comments']
+    list_filter = [('date', DateRangeFilter)]
+    date_hierarchy = 'date'
+    change_list_template = 'admin/blog/rollup_change_list.html'
+
+    def get_list_display(self, request):
+        return [self.dimension, *self.list_display]
+
+    def get_list_select_related(self, request):
+        return [self.dimension]
+
+    def changelist_view(self, request, extra_context=None):
+        """Add range totals and the top entries for the filtered days."""
+        response = super().changelist_view(request, extra_context)
+        cl = getattr(response, 'context_data', {}).get('cl')
+        if cl is not None:
+            queryset = cl.queryset.order_by()
+            response.context_data['rollup_totals'] = queryset.aggregate(
+                posts_published=Coalesce(Sum('posts_published'), 0),
+                comments=Coalesce(Sum('comments'), 0),
+            )
+            name_field = 'username' if self.dimension == 'author' else 'name'
+            response.context_data['rollup_dimension'] = self.model._meta.get_field(self.dimension).verbose_name
+            response.context_data['rollup_top'] = queryset.values(
+                name=F(f'{self.dimension}__{name_field}')
+            ).annotate(
+                posts_published=Sum('posts_published'), comments=Sum('comments')
+            ).order_by('-comments', '-posts_published')[:20]
+        return response
+
+    def has_add_permission(self, request):
+        """Rows are written by the rollup_stats command only."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CategoryDailyStats)
+class CategoryDailyStatsAdmin(DailyRollupAdmin):
+    dimension = 'category'
+
+
+@admin.register(TagDailyStats)
+class TagDailyStatsAdmin(DailyRollupAdmin):
+    dimension = 'tag'
+
+
+@admin.register(AuthorDailyStats)
+class AuthorDailyStatsAdmin(DailyRollupAdmin):
+    dimension = 'author'
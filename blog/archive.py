@@ -0,0 +1,122 @@
+"""
+Hot/cold archival of old comment threads.
+
+Threads (a top-level comment with all its replies) that started more than
+COMMENT_ARCHIVE_AFTER_DAYS ago and have had no new or edited replies since
+are moved from Comment to ArchivedComment, COMMENT_ARCHIVE_BATCH_SIZE threads
+per transaction (python manage.py archive_comments). Moderation queries,
+counts and the Comment indexes then only cover recent threads.
+
+Archived threads stay on the post page: thread_page() lists the live
+threads first and continues with the archived ones, so they show up on the
+later comment pages. PostStats and the daily rollups keep counting archived
+comments.
+"""
+import operator
+from datetime import timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .fragments import bump_versions_on_commit, comments_version_name
+from .models import ArchivedComment, Comment
+
+
+ARCHIVED_FIELDS = ('id', 'post_id', 'user_id', 'parent_id', 'content', 'is_approved',
+                   'path', 'depth', 'created_at', 'updated_at')
+DELETE_CHUNK_SIZE = 500
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'COMMENT_ARCHIVE_AFTER_DAYS', 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_threads(cutoff):
+    """Top-level comments older than `cutoff` whose whole thread is untouched since."""
+    recent_replies = Comment.objects.filter(
+        post=OuterRef('post'), path__startswith=OuterRef('path'), updated_at__gte=cutoff,
+    )
+    return Comment.objects.filter(depth=0, created_at__lt=cutoff).exclude(Exists(recent_replies))
+
+
+def delete_comments(ids):
+    """DELETE comments by id in plain SQL, so no delete signals (or cascades in Python) run."""
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    column = connection.ops.quote_name(Comment._meta.pk.column)
+    with connection.cursor() as cursor:
+        # Chunked to stay below the database's limit on query parameters
+        for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+            chunk = ids[start:start + DELETE_CHUNK_SIZE]
+            cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({", ".join(["%s"] * len(chunk))})', chunk)
+
+
+def archive_threads(cutoff, limit):
+    """Archive up to `limit` threads in one transaction. Returns (threads, comments) moved."""
+    from .cdn import post_key, purge
+
+    with transaction.atomic():
+        roots = list(archivable_threads(cutoff).order_by('pk').values_list('post_id', 'path')[:limit])
+        if not roots:
+            return 0, 0
+        threads = reduce(operator.or_, (Q(post_id=post_id, path__startswith=path) for post_id, path in roots))
+        comments = list(Comment.objects.filter(threads).values(*ARCHIVED_FIELDS))
+        ArchivedComment.objects.bulk_create(ArchivedComment(**comment) for comment in comments)
+        # Copied rows are removed with plain SQL DELETEs, without the delete
+        # signals: the comments still count in PostStats and the rollups.
+        # Deleting exactly the copied ids (not the paths) makes a reply
+        # written meanwhile fail the parent constraint and roll back.
+        delete_comments([comment['id'] for comment in comments])
+
+        post_ids = {post_id for post_id, _ in roots}
+        bump_versions_on_commit(*map(comments_version_name, post_ids))
+        purge(*map(post_key, post_ids))
+    return len(roots), len(comments)
+
+
+def archive_comments(days=None, batch_size=None):
+    """Archive every archivable thread in batches. Returns (threads, comments) moved."""
+    cutoff = archive_cutoff(days)
+    batch_size = batch_size or getattr(settings, 'COMMENT_ARCHIVE_BATCH_SIZE', 200)
+    total_threads = total_comments = 0
+    while True:
+        threads, comments = archive_threads(cutoff, batch_size)
+        total_threads += threads
+        total_comments += comments
+        if threads < batch_size:
+            return total_threads, total_comments
+
+
+def visible_comments(model, include_hidden):
+    return model.objects.all() if include_hidden else model.objects.filter(is_approved=True)
+
+
+def thread_root_count(post, include_hidden=False):
+    """Number of threads on the post, live and archived."""
+    return sum(
+        visible_comments(model, include_hidden).filter(post=post, depth=0).count()
+        for model in (Comment, ArchivedComment)
+    )
+
+
+def thread_page(post, page=1, per_page=20, include_hidden=False):
+    """
+    One page of threads with their replies: the live threads, newest first,
+    then the archived ones. The archive is only read once the live threads
+    run out.
+    """
+    start = (page - 1) * per_page
+    comments = list(visible_comments(Comment, include_hidden).threads(post, page, per_page).select_related('user'))
+    roots = sum(comment.depth == 0 for comment in comments)
+    if roots == per_page:
+        return comments
+
+    live_roots = start + roots if roots else visible_comments(Comment, include_hidden).filter(post=post, depth=0).count()
+    archived = visible_comments(ArchivedComment, include_hidden).thread_slice(
+        post, max(0, start - live_roots), per_page - roots,
+    )
+    return comments + list(archived.select_related('user'))
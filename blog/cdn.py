@@ -0,0 +1,258 @@
+"""
+Caching-proxy (CDN) support: cache policies, surrogate keys and purging.
+
+Public views mark their responses with a policy from EDGE_CACHE_POLICIES and
+the surrogate keys of everything they show (EdgeCacheMixin).
+EdgeCacheMiddleware turns that into headers, but only for anonymous,
+cookie-free 200 responses; everything else is marked private:
+
+    Cache-Control: public, max-age=0, s-maxage=300, stale-while-revalidate=60
+    Surrogate-Key: posts taxonomy post-12 post-15 category-3
+
+Keys name the objects a page depends on:
+
+    post-<pk>               the post's own page and every card showing it
+    category-<pk>, tag-<pk> pages showing the category/tag name
+    posts                   listings of all posts (home page)
+    category-posts-<pk>     the category's post listing
+    tag-posts-<pk>          the tag's post listing
+    taxonomy                pages listing every category and tag
+
+Signals in blog.signals call purge() with the keys a change affects. Keys are
+sent to the CDN_PURGE_BACKEND once the transaction commits; a failed purge
+is logged and the proxy falls back to expiring on s-maxage.
+"""
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+def post_key(pk):
+    return f'post-{pk}'
+
+
+def category_key(pk):
+    return f'category-{pk}'
+
+
+def tag_key(pk):
+    return f'tag-{pk}'
+
+
+def category_posts_key(pk):
+    return f'category-posts-{pk}'
+
+
+def tag_posts_key(pk):
+    return f'tag-posts-{pk}'
+
+
+def post_keys(posts):
+    return [post_key(post.pk) for post in posts]
+
+
+class EdgeCacheMixin:
+    """
+    Mark a view's responses as cacheable by the proxy under `cache_policy`
+    (a key of EDGE_CACHE_POLICIES), tagged with get_surrogate_keys().
+    """
+    cache_policy = None
+
+    def get_surrogate_keys(self, context):
+        return []
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        response.cache_policy = self.cache_policy
+        response.surrogate_keys = self.get_surrogate_keys(context)
+        return response
+
+
+class EdgeCacheMiddleware:
+    """Add Cache-Control and surrogate-key headers to responses marked by EdgeCacheMixin."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        policy_name = getattr(response, 'cache_policy', None)
+        if policy_name is None:
+            return response
+
+        user = getattr(request, 'user', None)
+        shared = (
+            request.method in ('GET', 'HEAD')
+            and response.status_code == 200
+            and not (user and user.is_authenticated)
+            # Flash messages, CSRF tokens and the replica pin are per visitor
+            and not response.cookies
+        )
+        if not shared:
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        policy = getattr(settings, 'EDGE_CACHE_POLICIES', {}).get(policy_name, {})
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=policy.get('max_age', 0),
+            s_maxage=policy.get('s_maxage', 300),
+            stale_while_revalidate=policy.get('stale_while_revalidate', 60),
+        )
+        keys = list(dict.fromkeys(response.surrogate_keys))
+        if keys:
+            response[getattr(settings, 'SURROGATE_KEY_HEADER', 'Surrogate-Key')] = ' '.join(keys)
+        return response
+
+
+class NullPurgeBackend:
+    """Purges nothing (no proxy in front of the site)."""
+
+    def __init__(self, **options):
+        pass
+
+    def purge(self, keys):
+        pass
+
+
+class LoggingPurgeBackend(NullPurgeBackend):
+    """Logs the keys that would be purged (development)."""
+
+    def purge(self, keys):
+        logger.info('Purge surrogate keys: %s', ' '.join(keys))
+
+
+class HTTPPurgeBackend:
+    """
+    POST the keys to a purge endpoint, both in the surrogate-key header and as
+    {"surrogate_keys": [...]} (Fastly's batch purge format). `headers` can
+    carry an API token.
+    """
+
+    def __init__(self, url, headers=None, timeout=2, batch_size=256):
+        self.url = url
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.batch_size = batch_size
+
+    def purge(self, keys):
+        import urllib.request  # pulls in http.client and email; only needed when purging
+
+        header = getattr(settings, 'SURROGATE_KEY_HEADER', 'Surrogate-Key')
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            request = urllib.request.Request(
+                self.url,
+                data=json.dumps({'surrogate_keys': batch}).encode(),
+                headers={**self.headers, header: ' '.join(batch), 'Content-Type': 'application/json'},
+                method='POST',
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+
+
+def get_purge_backend():
+    backend = import_string(getattr(settings, 'CDN_PURGE_BACKEND', 'blog.cdn.NullPurgeBackend'))
+    return backend(**getattr(settings, 'CDN_PURGE_OPTIONS', {}))
+
+
+class PurgeDispatcher:
+    """
+    Collect keys per thread and send them once the current transaction
+    commits, so the proxy can't re-cache a page before the change is visible.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def purge(self, *keys):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            pending = self._local.pending = set()
+        pending.update(keys)
+        if not self.scheduled():
+            self._local.scheduled = True
+            transaction.on_commit(self.flush)
+
+    def scheduled(self):
+        """
+        Whether flush() already runs when the current transaction commits; a
+        rollback drops it, so the next purge() schedules it again.
+        """
+        if not getattr(self._local, 'scheduled', False):
+            return False
+        connection = transaction.get_connection()
+        return connection.in_atomic_block and any(entry[1] == self.flush for entry in connection.run_on_commit)
+
+    def discard(self):
+        """Drop pending keys without purging them (tests)."""
+        getattr(self._local, 'pending', set()).clear()
+        self._local.scheduled = False
+
+    def flush(self):
+        """Send every pending key; keys of a rolled-back transaction go out with the next commit."""
+        self._local.scheduled = False
+        pending = getattr(self._local, 'pending', None)
+        if not pending:
+            return
+        keys = sorted(pending)
+        pending.clear()
+        try:
+            get_purge_backend().purge(keys)
+        except Exception as e:
+            logger.error(f'Error purging surrogate keys {keys}: {e}')
+
+
+purge_dispatcher = PurgeDispatcher()
+purge = purge_dispatcher.purge
+
+
+class LocalPurgeServer:
+    """
+    Stand-in purge endpoint on 127.0.0.1 that records the keys it receives,
+    for tests and local development with HTTPPurgeBackend:
+
+        with LocalPurgeServer() as server:
+            with override_settings(CDN_PURGE_BACKEND='blog.cdn.HTTPPurgeBackend',
+                                   CDN_PURGE_OPTIONS={'url': server.url}):
+                ...
+            server.purged  # ['post-1', 'posts', ...]
+    """
+
+    def __init__(self, port=0):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.purged = []
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                server.requests += 1
+                server.purged.extend(json.loads(body or b'{}').get('surrogate_keys', []))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/purge'
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
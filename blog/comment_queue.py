@@ -0,0 +1,161 @@
+"""
+Write-coalescing comment ingestion.
+
+With COMMENT_QUEUE_ENABLED, add_comment doesn't insert the comment. It writes
+it as a small JSON file to COMMENT_QUEUE_DIR/pending, fsynced and renamed
+into place so it survives a crash, and acknowledges straight away. A single
+writer (python manage.py drain_comments) inserts queued comments with one
+Comment.objects.bulk_create per COMMENT_QUEUE_BATCH_SIZE comments. That call
+sets the thread paths, updates the PostStats rollup and expires the cached
+comment lists once per batch. Under load the number of write transactions
+then follows the drain interval, not the number of commenters.
+
+A batch is claimed by renaming its files to processing/, so several drainers
+don't pick the same files. The claimed files are only removed after the
+transaction commits. Claims left behind by a crashed drainer are returned
+to the queue after COMMENT_QUEUE_CLAIM_TIMEOUT seconds. Each comment stores
+the name of its file in Comment.queue_key (unique), so a file that comes back
+after its comment was committed is skipped instead of inserted twice.
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Comment, Post
+
+
+logger = logging.getLogger(__name__)
+
+
+def queue_enabled():
+    return getattr(settings, 'COMMENT_QUEUE_ENABLED', False)
+
+
+class CommentQueue:
+    """Durable spool directory of comments waiting to be inserted."""
+
+    @property
+    def directory(self):
+        return Path(getattr(settings, 'COMMENT_QUEUE_DIR', settings.BASE_DIR / 'comment_queue'))
+
+    def _dir(self, name):
+        path = self.directory / name
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def enqueue(self, post_id, user_id, content, parent_id=None, is_approved=True):
+        """Store a comment for the next drain; returns once it is on disk."""
+        # Names sort by arrival, so comments are inserted in the order they were sent
+        name = f'{time.time_ns():020d}-{uuid.uuid4().hex}.json'
+        data = json.dumps({
+            'post_id': post_id, 'user_id': user_id, 'parent_id': parent_id,
+            'content': content, 'is_approved': is_approved,
+        })
+        temporary = self._dir('tmp') / name
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._dir('pending') / name)
+
+    def pending(self):
+        """Number of comments waiting in the queue."""
+        return sum(1 for _ in self._dir('pending').glob('*.json'))
+
+    def claim(self, limit):
+        """Move up to `limit` of the oldest queued files to processing/ and return them."""
+        processing = self._dir('processing')
+        claimed = []
+        for path in sorted(self._dir('pending').glob('*.json'))[:limit]:
+            target = processing / path.name
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue  # Claimed by another drainer
+            os.utime(target)  # Claim time, for release_stale()
+            claimed.append(target)
+        return claimed
+
+    def release_stale(self):
+        """Return claims older than COMMENT_QUEUE_CLAIM_TIMEOUT (a drainer died) to the queue."""
+        timeout = getattr(settings, 'COMMENT_QUEUE_CLAIM_TIMEOUT', 300)
+        pending = self._dir('pending')
+        released = 0
+        for path in self._dir('processing').glob('*.json'):
+            try:
+                if time.time() - path.stat().st_mtime > timeout:
+                    os.rename(path, pending / path.name)
+                    released += 1
+            except FileNotFoundError:
+                continue
+        return released
+
+    def drain(self, batch_size=None):
+        """
+        Insert one batch of queued comments in a single transaction.
+        Returns (inserted, dropped); comments whose post, author or parent
+        comment is gone by now are dropped. Entries that were already
+        inserted (a drainer stopped after its commit, or a claim was
+        returned to the queue while still being inserted) are skipped.
+        """
+        batch_size = batch_size or getattr(settings, 'COMMENT_QUEUE_BATCH_SIZE', 500)
+        claimed = self.claim(batch_size)
+        if not claimed:
+            return 0, 0
+        # The file name is the entry's idempotency key, stored as Comment.queue_key
+        entries = {path.stem: json.loads(path.read_text(encoding='utf-8')) for path in claimed}
+        try:
+            with transaction.atomic():
+                inserted = set(Comment.objects.filter(queue_key__in=entries).values_list('queue_key', flat=True))
+                new = {key: e for key, e in entries.items() if key not in inserted}
+                posts = set(Post.objects.filter(pk__in={e['post_id'] for e in new.values()}).values_list('pk', flat=True))
+                users = set(User.objects.filter(pk__in={e['user_id'] for e in new.values()}).values_list('pk', flat=True))
+                parents = Comment.objects.in_bulk({e['parent_id'] for e in new.values() if e['parent_id']})
+                comments = [
+                    Comment(
+                        post_id=e['post_id'], user_id=e['user_id'], parent=parents.get(e['parent_id']),
+                        content=e['content'], is_approved=e['is_approved'], queue_key=key,
+                    )
+                    for key, e in new.items()
+                    if e['post_id'] in posts and e['user_id'] in users
+                    and (not e['parent_id'] or e['parent_id'] in parents)
+                ]
+                if comments:
+                    Comment.objects.bulk_create(comments)
+        except Exception:
+            # Back to the queue for the next drain
+            pending = self._dir('pending')
+            for path in claimed:
+                try:
+                    os.rename(path, pending / path.name)
+                except FileNotFoundError:
+                    continue  # Returned by release_stale() meanwhile
+            raise
+        for path in claimed:
+            path.unlink(missing_ok=True)
+        if inserted:
+            logger.warning(f'Skipped {len(inserted)} queued comments that were already inserted')
+        dropped = len(new) - len(comments)
+        if dropped:
+            logger.warning(f'Dropped {dropped} queued comments whose post, author or parent comment was deleted')
+        return len(comments), dropped
+
+    def drain_all(self, batch_size=None):
+        """Drain batches until the queue is empty. Returns (inserted, dropped, batches)."""
+        inserted = dropped = batches = 0
+        while self.pending():
+            batch_inserted, batch_dropped = self.drain(batch_size)
+            inserted += batch_inserted
+            dropped += batch_dropped
+            batches += 1
+        return inserted, dropped, batches
+
+
+comment_queue = CommentQueue()
@@ -0,0 +1,87 @@
+"""
+Buffered post view counters.
+
+Views are counted in memory and written to PostStats in one bulk upsert after
+a response has been sent, at most once every VIEW_COUNT_FLUSH_INTERVAL seconds
+(or sooner once VIEW_COUNT_MAX_PENDING post/day pairs are buffered). Pending
+counts are flushed when the process exits, so a crash loses at most one
+interval of views for that worker.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from .rollups import add_to_post_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Thread-safe in-process buffer of (post id, date) -> view count."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+
+    def increment(self, post_id, day=None):
+        with self._lock:
+            self._pending[(post_id, day or timezone.localdate())] += 1
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def discard(self):
+        """Drop buffered counts without writing them."""
+        with self._lock:
+            self._pending.clear()
+
+    def flush_due(self):
+        interval = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 30)
+        max_pending = getattr(settings, 'VIEW_COUNT_MAX_PENDING', 1000)
+        return bool(self._pending) and (
+            time.monotonic() - self._last_flush >= interval or len(self._pending) >= max_pending
+        )
+
+    def flush(self):
+        """Write buffered counts to PostStats; returns the number of rows upserted."""
+        # Only one thread writes at a time; others keep buffering
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+            try:
+                return add_to_post_stats({key: {'views': views} for key, views in pending.items()})
+            except Exception:
+                # Put the counts back so the next flush retries them
+                with self._lock:
+                    self._pending.update(pending)
+                raise
+        finally:
+            self._flush_lock.release()
+
+
+view_counter = ViewCounter()
+
+
+def flush_at_exit():
+    if view_counter.pending():
+        try:
+            view_counter.flush()
+        except Exception as e:
+            logger.error(f'Error flushing post view counts at exit: {e}')
+
+
+atexit.register(flush_at_exit)
@@ -0,0 +1,52 @@
+"""
+Database helpers: SQLite connection tuning and retrying writes on lock errors.
+"""
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+
+logger = logging.getLogger(__name__)
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def apply_sqlite_pragmas(connection):
+    """Run the PRAGMAs from settings.SQLITE_PRAGMAS on a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and any(msg in str(exc) for msg in LOCKED_MESSAGES)
+
+
+def retry_on_locked(func, *args, attempts=5, base_delay=0.05, max_delay=1.0, using=None, **kwargs):
+    """
+    Call func(*args, **kwargs), retrying with jittered exponential backoff
+    while SQLite reports the database as locked.
+
+    Inside an atomic block the error is re-raised immediately, because the
+    enclosing transaction has to be retried as a whole.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    for attempt in range(1, attempts + 1):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            if not is_locked_error(e) or connection.in_atomic_block or attempt == attempts:
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(f'Database locked, retrying {func.__qualname__} in {delay * 1000:.0f} ms '
+                           f'(attempt {attempt}/{attempts})')
+            time.sleep(delay)
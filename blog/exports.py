@@ -0,0 +1,82 @@
+"""
+Streaming CSV and JSON Lines exports.
+
+Rows are read with values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE), so
+the database cursor is read in chunks and no model instances are built. Each
+chunk is encoded and sent on its own through a StreamingHttpResponse, so
+memory stays flat however many rows are exported.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def csv_cell(value):
+    value = export_value(value)
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(headers, rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([csv_cell(value) for value in row])
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(headers, rows, chunk_size):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(headers, map(export_value, row))), ensure_ascii=False))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_response(queryset, columns, fmt, filename):
+    """
+    Stream `queryset` as CSV or JSON Lines. `columns` is a list of
+    (header, field lookup) pairs, e.g. [('post', 'post__slug')].
+    """
+    if fmt not in FORMATS:
+        raise Http404(f'Unknown export format: {fmt}')
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    headers = [header for header, _ in columns]
+    rows = queryset.values_list(*(lookup for _, lookup in columns)).iterator(chunk_size=chunk_size)
+    chunks = csv_chunks if fmt == 'csv' else jsonl_chunks
+    response = StreamingHttpResponse(chunks(headers, rows, chunk_size), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
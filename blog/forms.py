@@ -1,5 +1,6 @@
 from django import forms
 from .models import Post, Category, Tag, Comment
+from .widgets import AutocompleteSelect, AutocompleteSelectMultiple
 
 
 class PostForm(forms.ModelForm):
@@ -21,12 +22,12 @@ class PostForm(forms.ModelForm):
                 'class': 'form-control',
                 'accept': 'image/*'
             }),
-            'category': forms.Select(attrs={
+            # Only the selected values are rendered; the rest come from the autocomplete endpoint
+            'category': AutocompleteSelect('categories', attrs={
                 'class': 'form-control'
             }),
-            'tags': forms.SelectMultiple(attrs={
-                'class': 'form-control',
-                'size': '5'
+            'tags': AutocompleteSelectMultiple('tags', attrs={
+                'class': 'form-control'
             }),
             'status': forms.Select(attrs={
                 'class': 'form-control'
@@ -37,10 +38,8 @@ class PostForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Make category optional
         self.fields['category'].required = False
-        self.fields['category'].queryset = Category.objects.all().order_by('name')
         # Make tags optional
         self.fields['tags'].required = False
-        self.fields['tags'].queryset = Tag.objects.all().order_by('name')
         # Make image optional
         self.fields['image'].required = False
 
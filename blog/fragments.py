@@ -0,0 +1,83 @@
+"""
+Versioned keys for nested ("Russian doll") template fragment caching.
+
+Fragments are cached under a key built from everything they depend on, so
+nothing is ever deleted: a change produces a new key and the old entry
+expires on its own. Dependencies that have no timestamp of their own are
+tracked as version tokens in the cache, bumped by the signals in
+blog.signals:
+
+    taxonomy        any category or tag was saved or deleted
+    posts           any post was saved or deleted (sidebar post counts)
+    comments:<pk>   a comment on post <pk> was added, changed or removed
+
+An outer fragment's key includes the keys of the fragments nested in it, so
+when one post card changes, the listing around it is re-assembled from the
+other cards' cached HTML instead of being rendered from scratch.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+VERSION_PREFIX = 'fragment-version'
+KEY_PREFIX = 'fragment'
+
+
+def fragment_cache():
+    return caches[getattr(settings, 'FRAGMENT_CACHE', 'default')]
+
+
+def fragment_timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600)
+
+
+def comments_version_name(post_id):
+    return f'comments:{post_id}'
+
+
+def digest(parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def fragment_key(name, *vary_on):
+    """Cache key for fragment `name` rendered with the given dependencies."""
+    return f'{KEY_PREFIX}:{name}:{digest(vary_on)}'
+
+
+def get_versions(*names):
+    """
+    Return {name: version token} with one cache round trip. A missing token
+    (never bumped, or evicted) is started at a fresh random value, so an
+    eviction can never bring back fragments rendered before it.
+    """
+    cache = fragment_cache()
+    keys = {name: f'{VERSION_PREFIX}:{name}' for name in names}
+    stored = cache.get_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        version = stored.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[name] = version
+    return versions
+
+
+def bump_versions(*names):
+    """Invalidate every fragment that depends on any of `names`."""
+    fragment_cache().set_many({f'{VERSION_PREFIX}:{name}': uuid.uuid4().hex for name in names}, None)
+
+
+def bump_versions_on_commit(*names):
+    """Bump once the current transaction commits, so no reader can cache the old state under the new version."""
+    transaction.on_commit(lambda: bump_versions(*names))
+
+
+def list_version(objects):
+    """Version of a listing built from `objects`: changes when any of them is updated, added or removed."""
+    return digest(f'{obj.pk}@{obj.updated_at.isoformat()}' for obj in objects)
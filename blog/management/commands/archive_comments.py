@@ -0,0 +1,33 @@
+"""
+Management command to move old, inactive comment threads to the archive table.
+Run: python manage.py archive_comments [--days 365] [--batch-size 200] [--dry-run]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.archive import archivable_threads, archive_comments, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Moves comment threads with no activity for COMMENT_ARCHIVE_AFTER_DAYS days to ArchivedComment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Archive threads untouched for this many days (default: COMMENT_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int,
+                            help='Threads moved per transaction (default: COMMENT_ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the threads that would be archived')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_threads(archive_cutoff(options['days'])).count()
+            self.stdout.write(f'{count} thread{"s" if count != 1 else ""} would be archived')
+            return
+
+        start = time.perf_counter()
+        threads, comments = archive_comments(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Archived {threads} thread{"s" if threads != 1 else ""} ({comments} comments) in '
+            f'{(time.perf_counter() - start) * 1000:.0f} ms'
+        ))
@@ -0,0 +1,233 @@
+"""
+Management command to benchmark every blog and accounts view.
+Run: python manage.py benchmark --output bench.json [--baseline baseline.json]
+"""
+import json
+import logging
+import math
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from blog.counters import view_counter
+from blog.management.seed import ensure_role_users, seed_content
+from blog.models import Comment
+from monitoring.metrics import RequestMetrics
+from monitoring.middleware import QueryTimer
+
+
+ROLES = ['anonymous', 'reader', 'author', 'admin']
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Rollback(Exception):
+    """Raised to discard all data written during a benchmark run."""
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks every blog/accounts URL for each user role and reports latency and SQL cost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed requests per view and role (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Untimed requests per view and role before measuring (default: 2)')
+        parser.add_argument('--posts', type=int, default=20,
+                            help='Number of published posts to seed (default: 20)')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare results against this JSON file')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Allowed p95 latency increase over the baseline, in percent (default: 20)')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Ignore latency increases smaller than this many ms (default: 1.0)')
+        parser.add_argument('--live', action='store_true',
+                            help='Run against the configured database (changes are rolled back) '
+                                 'instead of a throwaway test database')
+
+    def handle(self, *args, **options):
+        # Expected 403/404 responses would otherwise flood stderr with tracebacks
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        setup_test_environment()
+        old_name = None
+        if not options['live']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = self.run_in_rollback(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'iterations': options['iterations'],
+                'posts': options['posts'],
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'results': results,
+        }
+        self.print_table(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'✓ Results written to {options["output"]}'))
+
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+            regressions = compare(baseline.get('results', {}), results,
+                                  options['threshold'], options['min_delta_ms'])
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(self.style.ERROR(f'✗ {line}'))
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('✓ No regressions against baseline'))
+
+    def run_in_rollback(self, options):
+        """Seed data, run every view and roll all writes back afterwards."""
+        results = {}
+        try:
+            with transaction.atomic():
+                users = ensure_role_users()
+                posts = seed_content(users['author'], posts=options['posts'], commenter=users['reader'])
+                fixtures = Fixtures(posts[0], users)
+                for url_name, build_kwargs in self.collect_urls():
+                    for role in ROLES:
+                        results.setdefault(url_name, {})[role] = self.measure(
+                            url_name, build_kwargs, fixtures, role, users, options
+                        )
+                # Buffered view counts belong to the discarded data too
+                view_counter.discard()
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def collect_urls(self):
+        """Yield (name, kwargs builder) for every named blog/accounts URL."""
+        from blog import urls as blog_urls
+        from accounts import urls as accounts_urls
+
+        for module in (blog_urls, accounts_urls):
+            for pattern in module.urlpatterns:
+                if not pattern.name:
+                    continue
+                url_name = f'{module.app_name}:{pattern.name}'
+                params = set(getattr(pattern.pattern, 'converters', {}))
+                builder = Fixtures.builder_for(pattern.name, params)
+                if builder is None:
+                    self.stderr.write(self.style.WARNING(f'Skipping {url_name}: unknown parameters {sorted(params)}'))
+                    continue
+                yield url_name, builder
+
+    def measure(self, url_name, build_kwargs, fixtures, role, users, options):
+        """Time one view for one role and return its summary statistics."""
+        from django.urls import reverse
+
+        client = Client()
+        latencies, query_counts, sql_times = [], [], []
+        status = None
+        total = options['warmup'] + options['iterations']
+        for i in range(total):
+            if role != 'anonymous':
+                # Re-login every time so views such as logout cannot affect the next request
+                client.force_login(users[role])
+            url = reverse(url_name, kwargs=build_kwargs(fixtures))
+            metrics = RequestMetrics()
+            with connection.execute_wrapper(QueryTimer(metrics)):
+                start = time.perf_counter()
+                response = client.get(url)
+                elapsed = time.perf_counter() - start
+            status = response.status_code
+            if i >= options['warmup']:
+                latencies.append(elapsed * 1000)
+                query_counts.append(metrics.sql_count)
+                sql_times.append(metrics.sql_time * 1000)
+
+        return {
+            'status': status,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+            'queries': int(statistics.median(query_counts)) if query_counts else 0,
+            'sql_ms': round(statistics.median(sql_times), 3) if sql_times else 0.0,
+        }
+
+    def print_table(self, results):
+        header = f'{"view":32} {"role":10} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"sql ms":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for url_name in sorted(results):
+            for role, row in results[url_name].items():
+                self.stdout.write(
+                    f'{url_name:32} {role:10} {row["status"]:>6} {row["p50_ms"]:>9.2f} '
+                    f'{row["p95_ms"]:>9.2f} {row["queries"]:>8} {row["sql_ms"]:>9.2f}'
+                )
+
+
+class Fixtures:
+    """Objects used to fill in URL parameters."""
+
+    def __init__(self, post, users):
+        self.post = post
+        self.users = users
+        self.comment = post.comments.first()
+
+    def new_comment(self):
+        """Create a comment for views that delete the one they are given."""
+        return Comment.objects.create(post=self.post, user=self.users['reader'], content='Benchmark comment')
+
+    @classmethod
+    def builder_for(cls, name, params):
+        """Return a callable producing URL kwargs for the named route, or None."""
+        if not params:
+            return lambda fixtures: {}
+        if name == 'category_posts':
+            return lambda fixtures: {'slug': fixtures.post.category.slug}
+        if name == 'tag_posts':
+            return lambda fixtures: {'slug': fixtures.post.tags.first().slug}
+        if name == 'delete_comment':
+            return lambda fixtures: {'comment_id': fixtures.new_comment().pk}
+        if params == {'comment_id'}:
+            return lambda fixtures: {'comment_id': fixtures.comment.pk}
+        if params == {'slug'}:
+            return lambda fixtures: {'slug': fixtures.post.slug}
+        return None
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    """Return a list of human-readable regressions of `current` against `baseline`."""
+    regressions = []
+    for url_name, roles in current.items():
+        for role, row in roles.items():
+            old = baseline.get(url_name, {}).get(role)
+            if not old:
+                continue
+            if row['queries'] > old['queries']:
+                regressions.append(
+                    f'{url_name} [{role}]: queries {old["queries"]} -> {row["queries"]}'
+                )
+            delta = row['p95_ms'] - old['p95_ms']
+            if delta > min_delta_ms and row['p95_ms'] > old['p95_ms'] * (1 + threshold / 100):
+                regressions.append(
+                    f'{url_name} [{role}]: p95 {old["p95_ms"]:.2f}ms -> {row["p95_ms"]:.2f}ms'
+                )
+    return regressions
@@ -0,0 +1,35 @@
+"""
+Management command to insert queued comments in batches (COMMENT_QUEUE_ENABLED).
+Run: python manage.py drain_comments [--interval 1] [--batch-size 500]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.comment_queue import comment_queue
+
+
+class Command(BaseCommand):
+    help = 'Inserts comments from the comment queue with one bulk insert per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep draining every N seconds instead of once')
+        parser.add_argument('--batch-size', type=int,
+                            help='Comments inserted per transaction (default: COMMENT_QUEUE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        while True:
+            released = comment_queue.release_stale()
+            if released:
+                self.stdout.write(self.style.WARNING(f'Returned {released} abandoned comments to the queue'))
+            start = time.perf_counter()
+            inserted, dropped, batches = comment_queue.drain_all(options['batch_size'])
+            if batches or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Inserted {inserted} comments in {batches} batch{"es" if batches != 1 else ""} '
+                    f'({dropped} dropped) in {(time.perf_counter() - start) * 1000:.0f} ms'
+                ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+"""
+Management command to export published content as static HTML files.
+Run: python manage.py export_static [--output static_site] [--workers 4] [--full]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.static_export import export_dir, export_site
+
+
+class Command(BaseCommand):
+    help = 'Renders published posts, category, tag and listing pages to HTML files, re-rendering only what changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Output directory (default: STATIC_EXPORT_DIR)')
+        parser.add_argument('--workers', type=int, help='Render threads (default: STATIC_EXPORT_WORKERS)')
+        parser.add_argument('--full', action='store_true', help='Ignore the manifest and re-render every page')
+
+    def handle(self, *args, **options):
+        result = export_site(output_dir=options['output'], workers=options['workers'], full=options['full'])
+        for error in result.errors:
+            self.stderr.write(self.style.ERROR(f'✗ {error}'))
+        if result.errors:
+            raise CommandError(f'{len(result.errors)} pages failed; they are retried on the next run')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rendered {result.rendered} URLs ({result.pages} pages), removed {result.removed} '
+            f'in {result.seconds * 1000:.0f} ms to {export_dir(options["output"])}'
+        ))
@@ -0,0 +1,304 @@
+"""
+Management command to load-test the WSGI application under concurrency.
+Run: python manage.py loadtest --duration 30 --concurrency 16 --mix browse=60,search=20,comment=15,publish=5
+"""
+import http.client
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib import import_module
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.signals import got_request_exception
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils.crypto import get_random_string
+
+from blog.management.commands.benchmark import percentile
+from blog.counters import view_counter
+from blog.management.seed import ensure_role_users, seed_content
+
+
+ACTIONS = ['browse', 'search', 'comment', 'publish']
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+SEARCH_TERMS = ['lorem', 'ipsum', 'benchmark', 'post', 'dolor', 'amet']
+
+
+class QuietHandler(WSGIRequestHandler):
+    """Request handler that does not log every request to stderr."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LoadTestServer(ThreadedWSGIServer):
+    """Threaded WSGI server with a listen backlog large enough for the test."""
+    request_queue_size = 256
+
+
+def parse_mix(value):
+    """Parse 'browse=60,search=20,...' into a dict of action -> weight."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ACTIONS:
+            raise CommandError(f'Unknown action "{name}" in --mix; choose from {", ".join(ACTIONS)}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for "{name}" in --mix')
+    if not any(mix.values()):
+        raise CommandError('--mix needs at least one action with a positive weight')
+    return mix
+
+
+def run_worker(plan, worker_id):
+    """
+    Drive requests against the server until the deadline.
+    Top-level so it can run in a ProcessPoolExecutor as well as a thread.
+    Returns a list of (action, status, latency_ms) tuples; status 0 means a connection error.
+    """
+    rng = random.Random(worker_id)
+    reader_session = plan['reader_sessions'][worker_id % len(plan['reader_sessions'])]
+    author_session = plan['author_sessions'][worker_id % len(plan['author_sessions'])]
+    csrf_token = plan['csrf_token']
+    actions = list(plan['mix'])
+    weights = [plan['mix'][name] for name in actions]
+    samples = []
+
+    while time.time() < plan['deadline']:
+        action = rng.choices(actions, weights)[0]
+        method, body, cookies = 'GET', None, {}
+        if action == 'browse':
+            path = rng.choice(['/', f'/post/{rng.choice(plan["slugs"])}/', f'/category/{plan["category"]}/'])
+            cookies['sessionid'] = reader_session if rng.random() < 0.5 else None
+        elif action == 'search':
+            path = '/?' + urlencode({'q': rng.choice(SEARCH_TERMS)})
+        elif action == 'comment':
+            method = 'POST'
+            path = f'/post/{rng.choice(plan["slugs"])}/comment/'
+            cookies['sessionid'] = reader_session
+            body = {'content': f'Load test comment from worker {worker_id}'}
+        else:
+            method = 'POST'
+            path = '/post/create/'
+            cookies['sessionid'] = author_session
+            body = {
+                'title': f'Load test post {uuid.uuid4().hex[:12]}',
+                'content': '<p>Load test content</p>',
+                'status': 'published',
+            }
+
+        headers = {}
+        if method == 'POST':
+            cookies['csrftoken'] = csrf_token
+            body['csrfmiddlewaretoken'] = csrf_token
+            body = urlencode(body)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        cookie_header = '; '.join(f'{k}={v}' for k, v in cookies.items() if v)
+        if cookie_header:
+            headers['Cookie'] = cookie_header
+
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection(plan['host'], plan['port'], timeout=plan['timeout'])
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            conn.close()
+        except OSError:
+            status = 0
+        samples.append((action, status, (time.perf_counter() - start) * 1000))
+    return samples
+
+
+class Command(BaseCommand):
+    help = 'Serves the WSGI application on a local threaded server and drives a concurrent read/write mix against it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Seconds to generate load for (default: 10)')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Number of concurrent clients (default: 8)')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Run clients in a thread pool or a process pool (default: thread)')
+        parser.add_argument('--mix', default='browse=60,search=20,comment=15,publish=5',
+                            help='Weighted request mix (default: browse=60,search=20,comment=15,publish=5)')
+        parser.add_argument('--posts', type=int, default=20,
+                            help='Number of published posts to seed (default: 20)')
+        parser.add_argument('--sessions', type=int, default=20,
+                            help='Logged-in sessions per role to spread clients over (default: 20)')
+        parser.add_argument('--timeout', type=float, default=30.0,
+                            help='Per-request client timeout in seconds (default: 30)')
+        parser.add_argument('--no-pragmas', action='store_true',
+                            help='Disable SQLITE_PRAGMAS (WAL etc.) to compare against the default rollback journal')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        pragmas = {} if options['no_pragmas'] else getattr(settings, 'SQLITE_PRAGMAS', {})
+        tmpdir = None
+        old_test_name = connection.settings_dict['TEST'].get('NAME')
+        if connection.vendor == 'sqlite':
+            # Threads must share one on-disk database to reproduce real lock contention
+            tmpdir = tempfile.TemporaryDirectory()
+            connection.settings_dict['TEST']['NAME'] = str(Path(tmpdir.name) / 'loadtest.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        server_errors = Counter()
+
+        def record_exception(sender, request=None, **kwargs):
+            exc = sys.exc_info()[1]
+            server_errors[f'{type(exc).__name__}: {exc}'] += 1
+
+        got_request_exception.connect(record_exception, weak=False)
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=['127.0.0.1'],
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                SQLITE_PRAGMAS=pragmas,
+                SLOW_QUERY_THRESHOLD_MS=None,
+                # Every simulated client shares 127.0.0.1
+                RATE_LIMIT_ENABLED=False,
+            ):
+                plan = self.prepare(mix, options)
+                connection.close()
+                samples, elapsed = self.run_load(plan, options)
+        finally:
+            got_request_exception.disconnect(record_exception)
+            view_counter.discard()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['TEST']['NAME'] = old_test_name
+            if tmpdir is not None:
+                tmpdir.cleanup()
+
+        self.report(samples, elapsed, server_errors, options)
+
+    def prepare(self, mix, options):
+        """Seed content and logged-in sessions, and build the client plan."""
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.stdout.write(f'SQLite journal mode: {cursor.fetchone()[0]}')
+        users = ensure_role_users()
+        posts = seed_content(users['author'], posts=options['posts'], commenter=users['reader'])
+        return {
+            'mix': mix,
+            'slugs': [post.slug for post in posts],
+            'category': posts[0].category.slug,
+            'reader_sessions': [self.login_session(users['reader']) for _ in range(options['sessions'])],
+            'author_sessions': [self.login_session(users['author']) for _ in range(options['sessions'])],
+            'csrf_token': get_random_string(32),
+            'timeout': options['timeout'],
+        }
+
+    def login_session(self, user):
+        """Create an authenticated session for `user` and return its key."""
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def run_load(self, plan, options):
+        """Start the server, run all clients and return (samples, elapsed seconds)."""
+        from advanced_blog.wsgi import application
+
+        server = LoadTestServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+        server.set_app(application)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        plan['host'], plan['port'] = server.server_address[:2]
+        self.stdout.write(
+            f'Serving on http://{plan["host"]}:{plan["port"]}/ - '
+            f'{options["concurrency"]} {options["pool"]} clients for {options["duration"]:.0f}s'
+        )
+
+        executor_class = ThreadPoolExecutor if options['pool'] == 'thread' else ProcessPoolExecutor
+        samples = []
+        try:
+            start = time.perf_counter()
+            plan['deadline'] = time.time() + options['duration']
+            with executor_class(max_workers=options['concurrency']) as executor:
+                futures = [executor.submit(run_worker, plan, i) for i in range(options['concurrency'])]
+                for future in futures:
+                    samples.extend(future.result())
+            elapsed = time.perf_counter() - start
+        finally:
+            server.shutdown()
+            server.server_close()
+        return samples, elapsed
+
+    def report(self, samples, elapsed, server_errors, options):
+        by_action = defaultdict(list)
+        for action, status, latency in samples:
+            by_action[action].append((status, latency))
+
+        total = len(samples)
+        failed = sum(1 for _, status, _ in samples if status == 0 or status >= 500)
+        locked = sum(count for message, count in server_errors.items() if 'database is locked' in message)
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{total} requests in {elapsed:.1f}s - {total / elapsed:.1f} req/s, '
+            f'{failed} errors ({(failed / total * 100) if total else 0:.1f}%), '
+            f'{locked} "database is locked"'
+        ))
+
+        header = f'{"action":10} {"requests":>9} {"req/s":>8} {"errors":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for action in ACTIONS:
+            rows = by_action.get(action)
+            if not rows:
+                continue
+            latencies = [latency for _, latency in rows]
+            errors = sum(1 for status, _ in rows if status == 0 or status >= 500)
+            self.stdout.write(
+                f'{action:10} {len(rows):>9} {len(rows) / elapsed:>8.1f} {errors:>7} '
+                f'{percentile(latencies, 50):>9.1f} {percentile(latencies, 95):>9.1f} {percentile(latencies, 99):>9.1f}'
+            )
+
+        for action in ACTIONS:
+            rows = by_action.get(action)
+            if not rows:
+                continue
+            self.stdout.write(f'\nLatency histogram: {action}')
+            self.print_histogram([latency for _, latency in rows])
+            statuses = Counter(status for status, _ in rows)
+            self.stdout.write('  status codes: ' + ', '.join(
+                f'{status or "conn-error"}={count}' for status, count in sorted(statuses.items())
+            ))
+
+        if server_errors:
+            self.stdout.write(self.style.ERROR('\nServer exceptions:'))
+            for message, count in server_errors.most_common():
+                self.stdout.write(self.style.ERROR(f'  {count:>6} x {message}'))
+
+    def print_histogram(self, latencies, width=40):
+        counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for latency in latencies:
+            for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+                if latency <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        peak = max(counts) or 1
+        labels = [f'<= {bound} ms' for bound in HISTOGRAM_BUCKETS_MS] + [f'> {HISTOGRAM_BUCKETS_MS[-1]} ms']
+        for label, count in zip(labels, counts):
+            bar = '#' * round(count / peak * width)
+            self.stdout.write(f'  {label:>12} {count:>7} {bar}')
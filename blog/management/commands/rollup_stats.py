@@ -0,0 +1,30 @@
+"""
+Management command to update the daily category, tag and author rollups.
+Run: python manage.py rollup_stats [--rebuild]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.models import Watermark
+from blog.rollups import CONTENT_ROLLUP_WATERMARK, update_content_rollups
+
+
+class Command(BaseCommand):
+    help = 'Adds posts published and comments received since the last run to the daily rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Clear the rollups and recount everything from the beginning')
+        parser.add_argument('--batch-days', type=int, default=7,
+                            help='Days of data counted per transaction')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        windows = update_content_rollups(rebuild=options['rebuild'], batch_days=options['batch_days'])
+        watermark = Watermark.objects.filter(name=CONTENT_ROLLUP_WATERMARK).first()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rolled up {windows} batch{"es" if windows != 1 else ""} in '
+            f'{(time.perf_counter() - start) * 1000:.0f} ms'
+            f'{f" (up to {watermark.value:%Y-%m-%d %H:%M:%S})" if watermark else ""}'
+        ))
@@ -0,0 +1,53 @@
+"""
+Management command to refresh the local SQLite read-replica stand-in from the primary.
+Run: BLOG_SQLITE_REPLICA=1 python manage.py sync_replica [--interval 5]
+"""
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database into each SQLite replica in DATABASE_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep syncing every N seconds instead of once (simulates replication lag)')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        replicas = [
+            alias for alias in getattr(settings, 'DATABASE_REPLICAS', [])
+            if settings.DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3'
+        ]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_replica only supports a SQLite primary database')
+        if not replicas:
+            raise CommandError('No SQLite replicas configured (set BLOG_SQLITE_REPLICA=1)')
+
+        while True:
+            for alias in replicas:
+                start = time.perf_counter()
+                self.sync(primary['NAME'], settings.DATABASES[alias]['NAME'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Synced {alias} in {(time.perf_counter() - start) * 1000:.0f} ms'
+                ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, source_path, target_path):
+        """
+        Copy the primary page by page with SQLite's online backup API.
+        The copy happens in place, so replica connections kept open by
+        CONN_MAX_AGE see the new data on their next read.
+        """
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path, timeout=20)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,26 @@
+"""
+Management command to recompute the Trending and Most discussed post rankings.
+Run: python manage.py update_rankings [--full]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.rankings import update_rankings
+
+
+class Command(BaseCommand):
+    help = 'Recomputes time-decayed post rankings for posts with new activity since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every post instead of only those changed since the last run')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Posts recomputed per transaction')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        posts, rows = update_rankings(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Ranked {posts} posts ({rows} ranking rows) in {(time.perf_counter() - start) * 1000:.0f} ms'
+        ))
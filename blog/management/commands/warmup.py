@@ -0,0 +1,33 @@
+"""
+Management command to warm up templates, URLs and caches after a deploy.
+Run: python manage.py warmup [--skip pages]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.warmup import STEPS, run_warmup
+
+
+class Command(BaseCommand):
+    help = 'Compiles templates, resolves every named URL and primes the page, fragment and taxonomy caches, with per-step timings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip', action='append', default=[], choices=[name for name, _ in STEPS],
+                            help='Skip a step (repeatable)')
+
+    def handle(self, *args, **options):
+        results = run_warmup(skip=options['skip'])
+        width = max(len(step.name) for step in results) if results else 0
+        for step in results:
+            line = f'{step.name:<{width}}  {step.seconds * 1000:8.1f} ms  {step.detail}'
+            if step.errors:
+                self.stdout.write(self.style.WARNING(f'! {line} ({len(step.errors)} errors)'))
+                for error in step.errors:
+                    self.stdout.write(f'    {error}')
+            else:
+                self.stdout.write(f'  {line}')
+
+        total = sum(step.seconds for step in results) * 1000
+        failed = sum(len(step.errors) for step in results)
+        if failed:
+            raise CommandError(f'Warm-up finished in {total:.0f} ms with {failed} errors')
+        self.stdout.write(self.style.SUCCESS(f'✓ Warm-up finished in {total:.0f} ms'))
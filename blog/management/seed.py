@@ -0,0 +1,66 @@
+"""
+Helpers for creating repeatable fixture data for benchmark and load-test commands.
+"""
+import io
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+
+from blog.models import Post, Category, Tag, Comment
+
+
+ROLE_USERS = {
+    'reader': 'bench_reader',
+    'author': 'bench_author',
+    'admin': 'bench_admin',
+}
+
+
+def ensure_groups():
+    """Create the Admin/Author/Reader groups if they do not exist yet."""
+    if Group.objects.filter(name__in=['Admin', 'Author', 'Reader']).count() < 3:
+        call_command('setup_groups', stdout=io.StringIO())
+
+
+def ensure_role_users():
+    """Return a dict of role name -> User, creating the users if needed."""
+    ensure_groups()
+    users = {}
+    for role, username in ROLE_USERS.items():
+        user, created = User.objects.get_or_create(
+            username=username,
+            defaults={'email': f'{username}@example.com'},
+        )
+        if created:
+            user.set_unusable_password()
+            user.save()
+            user.groups.add(Group.objects.get(name=role.capitalize()))
+        users[role] = user
+    return users
+
+
+def seed_content(author, posts=20, comments_per_post=5, commenter=None):
+    """
+    Make sure at least `posts` published posts by `author` exist, each with
+    `comments_per_post` comments. Returns the list of seeded posts.
+    """
+    commenter = commenter or author
+    category, _ = Category.objects.get_or_create(name='Benchmark')
+    tag, _ = Tag.objects.get_or_create(name='Benchmark')
+
+    existing = list(Post.objects.filter(author=author, category=category).order_by('pk'))
+    for i in range(len(existing), posts):
+        post = Post.objects.create(
+            title=f'Benchmark post {i}',
+            content='<p>' + 'Lorem ipsum dolor sit amet. ' * 40 + '</p>',
+            author=author,
+            category=category,
+            status=Post.Status.PUBLISHED,
+        )
+        post.tags.add(tag)
+        Comment.objects.bulk_create([
+            Comment(post=post, user=commenter, content=f'Benchmark comment {j}')
+            for j in range(comments_per_post)
+        ])
+        existing.append(post)
+    return existing[:posts]
@@ -0,0 +1,47 @@
+"""
+Middleware for read-replica routing with read-your-writes stickiness.
+"""
+import time
+
+from django.conf import settings
+
+from .routers import RoutingState, routing_state
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let views marked with `replica_reads = True` read from replicas, and pin a
+    client to the primary for REPLICA_STICKY_SECONDS after any request that wrote.
+    The pin is kept in a cookie so that it costs no session write.
+    """
+    cookie_name = 'pin_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            pinned_until = 0
+        state = RoutingState(pinned=pinned_until > time.time())
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        if state.wrote and self.sticky_seconds:
+            response.set_cookie(
+                self.cookie_name, str(int(time.time() + self.sticky_seconds)),
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        state = routing_state.get()
+        if state is not None and request.method in ('GET', 'HEAD'):
+            state.allow_replica = getattr(view, 'replica_reads', False)
+        return None
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='blog.post')),
+            ],
+            options={
+                'verbose_name_plural': 'Post stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='blog_postst_date_f5237c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='poststats',
+            constraint=models.UniqueConstraint(fields=('post', 'date'), name='blog_poststats_post_date_uniq'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_poststats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('trending', 'Trending'), ('discussed', 'Most discussed')], max_length=10)),
+                ('scope', models.CharField(max_length=32)),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='blog.post')),
+            ],
+            options={
+                'ordering': ['kind', 'scope', '-score'],
+                'indexes': [models.Index(fields=['kind', 'scope', '-score'], name='blog_postra_kind_63f6f5_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postranking',
+            constraint=models.UniqueConstraint(fields=('kind', 'scope', 'post'), name='blog_postranking_kind_scope_post_uniq'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_root_paths(apps, schema_editor):
+    """Existing comments become top-level threads (see blog.models.comment_path)."""
+    Comment = apps.get_model('blog', 'Comment')
+    segment_max = 36 ** 6 - 1
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+    def segment(value):
+        out = []
+        while value:
+            value, digit = divmod(value, 36)
+            out.append(digits[digit])
+        return ''.join(reversed(out)).rjust(6, '0')
+
+    comments = list(Comment.objects.only('pk'))
+    for comment in comments:
+        comment.path = segment(segment_max - comment.pk)
+    Comment.objects.bulk_update(comments, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_postranking_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='blog.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(set_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='blog_commen_post_id_34d25d_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:44
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_comment_counts(apps, schema_editor):
+    """Count existing comments into PostStats by post and creation date."""
+    Comment = apps.get_model('blog', 'Comment')
+    PostStats = apps.get_model('blog', 'PostStats')
+    counts = {}
+    rows = Comment.objects.annotate(day=TruncDate('created_at')).values(
+        'post_id', 'day', 'is_approved'
+    ).annotate(count=Count('id'))
+    for row in rows:
+        field = 'comments' if row['is_approved'] else 'pending_comments'
+        counts.setdefault((row['post_id'], row['day']), {})[field] = row['count']
+    for (post_id, day), fields in counts.items():
+        PostStats.objects.update_or_create(post_id=post_id, date=day, defaults=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poststats',
+            name='comments',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='poststats',
+            name='pending_comments',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comment_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0005_poststats_comments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('posts_published', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Author daily stats',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('posts_published', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Category daily stats',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TagDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('posts_published', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Tag daily stats',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['published_at'], name='blog_post_publish_698bc0_idx'),
+        ),
+        migrations.AddField(
+            model_name='tagdailystats',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='blog.tag'),
+        ),
+        migrations.AddField(
+            model_name='categorydailystats',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='blog.category'),
+        ),
+        migrations.AddField(
+            model_name='authordailystats',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tagdailystats',
+            index=models.Index(fields=['date'], name='blog_tagdai_date_4b392a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagdailystats',
+            constraint=models.UniqueConstraint(fields=('tag', 'date'), name='blog_tagdailystats_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='categorydailystats',
+            index=models.Index(fields=['date'], name='blog_catego_date_ceba86_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorydailystats',
+            constraint=models.UniqueConstraint(fields=('category', 'date'), name='blog_categorydailystats_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='authordailystats',
+            index=models.Index(fields=['date'], name='blog_author_date_7809c5_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='authordailystats',
+            constraint=models.UniqueConstraint(fields=('author', 'date'), name='blog_authordailystats_uniq'),
+        ),
+    ]
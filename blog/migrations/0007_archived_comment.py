@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0006_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('content', models.TextField()),
+                ('is_approved', models.BooleanField(default=True)),
+                ('path', models.CharField(max_length=255)),
+                ('depth', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to='blog.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'default_permissions': ('delete', 'view'),
+                'indexes': [models.Index(fields=['post', 'path'], name='blog_archiv_post_id_e3775d_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.urls import reverse
@@ -88,6 +90,7 @@ class Post(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['status']),
+            models.Index(fields=['published_at']),
         ]
 
     def __str__(self):
@@ -122,14 +125,131 @@ class Post(models.Model):
         return self.status == self.Status.PUBLISHED
 
 
+# Materialized path segments: fixed-width base-36 comment ids
+PATH_SEGMENT_WIDTH = 6
+PATH_SEGMENT_MAX = 36 ** PATH_SEGMENT_WIDTH - 1
+PATH_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(value):
+    digits = []
+    while value:
+        value, digit = divmod(value, 36)
+        digits.append(PATH_DIGITS[digit])
+    return ''.join(reversed(digits)).rjust(PATH_SEGMENT_WIDTH, '0')
+
+
+def comment_path(comment_id, parent_path=''):
+    """
+    Path of a comment under `parent_path`. Top-level segments are inverted
+    so that ordering by path lists the newest threads first while replies
+    inside a thread stay in the order they were written.
+    """
+    if parent_path:
+        return parent_path + path_segment(comment_id)
+    return path_segment(PATH_SEGMENT_MAX - comment_id)
+
+
+class ThreadQuerySet(models.QuerySet):
+    """Thread queries over the materialized comment path."""
+
+    def threads(self, post, page=1, per_page=20):
+        """
+        Top-level comments for a page of threads with all their replies,
+        depth first, in one query on the (post, path) index.
+        """
+        return self.thread_slice(post, (page - 1) * per_page, per_page)
+
+    def thread_slice(self, post, start, count):
+        """Threads start to start + count (by root, newest first) with all their replies."""
+        comments = self.filter(post=post)
+        roots = comments.filter(depth=0).order_by('path').values('path')
+        return comments.filter(
+            path__gte=models.Subquery(roots[start:start + 1]),
+            path__lt=Coalesce(
+                models.Subquery(roots[start + count:start + count + 1]),
+                models.Value('~'),
+            ),
+        ).order_by('path')
+
+    def subtree(self, comment):
+        """A comment and all of its replies."""
+        if not comment.path:
+            return self.filter(pk=comment.pk)
+        return self.filter(post_id=comment.post_id, path__startswith=comment.path)
+
+
+class CommentQuerySet(ThreadQuerySet):
+    """Comment queries; bulk_create keeps paths, rollups and caches up to date."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Create comments in bulk, then set their paths with one bulk update,
+        in one transaction so no comment is left without a path.
+        """
+        from .rollups import comment_deltas, add_to_post_stats
+        from .fragments import bump_versions_on_commit, comments_version_name
+        from .cdn import post_key, purge
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            self.place_under_parents(objs)
+            objs = super().bulk_create(objs, *args, **kwargs)
+            placed = []
+            for comment in objs:
+                if comment.pk and not comment.path:
+                    comment.path = comment_path(comment.pk, comment.parent.path if comment.parent_id else '')
+                    placed.append(comment)
+            if placed:
+                self.model.objects.bulk_update(placed, ['path'])
+            add_to_post_stats(comment_deltas(objs))
+            bump_versions_on_commit(*{comments_version_name(comment.post_id) for comment in objs})
+            purge(*{post_key(comment.post_id) for comment in objs})
+        return objs
+
+    def place_under_parents(self, objs):
+        """
+        Comment.place_under_parent() for a batch: parents, and the ancestors
+        of replies past COMMENT_MAX_DEPTH, are loaded with one query per level.
+        """
+        max_depth = getattr(settings, 'COMMENT_MAX_DEPTH', 4)
+        parent_field = self.model._meta.get_field('parent')
+        replies = [comment for comment in objs if comment.parent_id and not comment.path]
+        while replies:
+            missing = {comment.parent_id for comment in replies if not parent_field.is_cached(comment)}
+            parents = self.model.objects.in_bulk(missing) if missing else {}
+            too_deep = []
+            for comment in replies:
+                if comment.parent_id in parents:
+                    comment.parent = parents[comment.parent_id]
+                if comment.parent.depth >= max_depth:
+                    # Changing parent_id drops the cached parent; it is loaded on the next pass
+                    comment.parent_id = comment.parent.parent_id
+                    too_deep.append(comment)
+                else:
+                    comment.depth = comment.parent.depth + 1
+            replies = too_deep
+
+
 class Comment(models.Model):
     """Comment model for post comments."""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     content = models.TextField()
     is_approved = models.BooleanField(default=True)
+    # Ancestor ids from the root down, see comment_path()
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Name of the queue entry a comment was inserted from, so a replayed entry is skipped (see blog.comment_queue)
+    queue_key = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
+
+    objects = CommentQuerySet.as_manager()
+
+    # Archived comments (ArchivedComment) are read-only
+    is_archived = False
 
     class Meta:
         ordering = ['-created_at']
@@ -137,11 +257,214 @@ class Comment(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['is_approved']),
+            models.Index(fields=['post', 'path']),
         ]
 
     def __str__(self):
         return f'Comment by {self.user.username} on {self.post.title}'
 
+    def save(self, *args, **kwargs):
+        """Set depth and path for new comments."""
+        self.place_under_parent()
+        if self.path:
+            return super().save(*args, **kwargs)
+        # The path needs the primary key, so it is written right after the
+        # insert, in the same transaction: a comment without a path would
+        # fall outside every thread range and never be shown.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.path = comment_path(self.pk, self.parent.path if self.parent_id else '')
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
     def get_absolute_url(self):
         """Return URL to post with comment anchor."""
         return f"{self.post.get_absolute_url()}#comment-{self.id}"
+
+    def place_under_parent(self):
+        """Attach replies past COMMENT_MAX_DEPTH to the deepest allowed ancestor."""
+        if self.parent_id and not self.path:
+            max_depth = getattr(settings, 'COMMENT_MAX_DEPTH', 4)
+            while self.parent.depth >= max_depth:
+                self.parent = self.parent.parent
+            self.depth = self.parent.depth + 1
+
+    def set_subtree_approved(self, approved):
+        """
+        Approve or hide this comment and every reply below it in one UPDATE.
+        Returns the number of comments that changed state.
+        """
+        from .rollups import moderation_deltas, add_to_post_stats
+        from .fragments import bump_versions_on_commit, comments_version_name
+        with transaction.atomic():
+            changing = Comment.objects.subtree(self).exclude(is_approved=approved)
+            deltas = moderation_deltas(changing, approved)
+            count = changing.update(is_approved=approved, updated_at=timezone.now())
+            add_to_post_stats(deltas)
+            if count:
+                bump_versions_on_commit(comments_version_name(self.post_id))
+                from .cdn import post_key, purge
+                purge(post_key(self.post_id))
+        return count
+
+
+class ArchivedComment(models.Model):
+    """
+    A comment moved out of the Comment table by blog.archive. Whole threads
+    are archived together, keeping their ids, paths and depths, so they are
+    listed and rendered like live comments, only without moderation or
+    reply controls.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='archived_comments')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_comments')
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    content = models.TextField()
+    is_approved = models.BooleanField(default=True)
+    path = models.CharField(max_length=255)
+    depth = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ThreadQuerySet.as_manager()
+
+    is_archived = True
+
+    class Meta:
+        ordering = ['-created_at']
+        default_permissions = ('delete', 'view')
+        indexes = [
+            models.Index(fields=['post', 'path']),
+        ]
+
+    def __str__(self):
+        return f'Archived comment by {self.user.username} on {self.post.title}'
+
+
+class PostStats(models.Model):
+    """
+    Daily rollup per post: views (written in bulk by blog.counters) and
+    approved/pending comments by creation date (kept up to date by
+    blog.rollups as comments are added, moderated and deleted).
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='stats')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    # Net counters, adjusted by +/- deltas
+    comments = models.IntegerField(default=0)
+    pending_comments = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Post stats'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'date'], name='blog_poststats_post_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f'{self.post} on {self.date}: {self.views} views, {self.comments} comments'
+
+
+class DailyRollup(models.Model):
+    """Posts published and comments received per day, written by the rollup_stats command."""
+    date = models.DateField()
+    posts_published = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ['-date']
+
+
+class CategoryDailyStats(DailyRollup):
+    """Daily rollup per category."""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta(DailyRollup.Meta):
+        verbose_name_plural = 'Category daily stats'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'date'], name='blog_categorydailystats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f'{self.category} on {self.date}'
+
+
+class TagDailyStats(DailyRollup):
+    """Daily rollup per tag."""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta(DailyRollup.Meta):
+        verbose_name_plural = 'Tag daily stats'
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'date'], name='blog_tagdailystats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f'{self.tag} on {self.date}'
+
+
+class AuthorDailyStats(DailyRollup):
+    """Daily rollup per author."""
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta(DailyRollup.Meta):
+        verbose_name_plural = 'Author daily stats'
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'date'], name='blog_authordailystats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f'{self.author} on {self.date}'
+
+
+class PostRanking(models.Model):
+    """
+    Precomputed post score per ranking and scope, written by the
+    update_rankings command (see blog.rankings).
+    """
+
+    class Kind(models.TextChoices):
+        TRENDING = 'trending', 'Trending'
+        DISCUSSED = 'discussed', 'Most discussed'
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    # 'all', 'category:<id>' or 'tag:<id>'
+    scope = models.CharField(max_length=32)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='rankings')
+    # Log of the decayed score relative to a fixed epoch; only the order is meaningful
+    score = models.FloatField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['kind', 'scope', '-score']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'scope', 'post'], name='blog_postranking_kind_scope_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'scope', '-score']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} ({self.scope}): {self.post}'
+
+
+class Watermark(models.Model):
+    """Point in time up to which an incremental background job has processed data."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
@@ -0,0 +1,140 @@
+"""
+Whole-page caching per role segment, for logged-in readers too.
+
+With PAGE_CACHE_ENABLED, the home, post, category and tag pages are cached
+once per role segment (anonymous, reader, author, admin) instead of once per
+user. What still differs between users of a segment is rendered as
+placeholders and filled in for each response by fill_user_bits():
+
+    the navbar username           {% per_user_name %}
+    CSRF tokens                   {% csrf_token %} (the token is a placeholder)
+    controls on your own comments {% owner_only comment.user_id %}...{% endowner_only %}
+
+Filling in is a few string replacements, so a hit costs two cache reads
+(the page and its fragment versions, see blog.fragments) and no queries.
+A page is re-rendered when any of the versions it was built from has moved,
+after PAGE_CACHE_TIMEOUT seconds otherwise (the trending sidebars), and
+always for the post's own author, who sees the edit and moderation controls.
+Requests with flash messages waiting, and requests flagged with
+bypass_page_cache (the static export), are never served from the cache.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.html import escape
+
+from accounts.permissions import is_admin, is_author
+
+from .fragments import fragment_cache, fragment_key, get_versions
+
+
+USERNAME_PLACEHOLDER = '<!--per-user:username-->'
+# Only characters that are valid in a token, so it survives attribute escaping
+CSRF_PLACEHOLDER = 'perUserCsrfTokenPlaceholder'
+OWNER_BLOCK = re.compile(r'<!--owner:(\d+)-->(.*?)<!--/owner-->', re.S)
+
+
+def page_cache_enabled():
+    return getattr(settings, 'PAGE_CACHE_ENABLED', False)
+
+
+def role_segment(user):
+    if not user.is_authenticated:
+        return 'anonymous'
+    if is_admin(user):
+        return 'admin'
+    if is_author(user):
+        return 'author'
+    return 'reader'
+
+
+def has_pending_messages(request):
+    session = getattr(request, 'session', None)
+    return CookieStorage.cookie_name in request.COOKIES or (
+        session is not None and SessionStorage.session_key in session
+    )
+
+
+def fill_user_bits(content, request):
+    """Replace the per-user placeholders in a segment page for this request."""
+    user = request.user
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    content = content.replace(USERNAME_PLACEHOLDER, escape(user.get_username()) if user.is_authenticated else '')
+    return OWNER_BLOCK.sub(lambda match: match[2] if str(user.pk) == match[1] else '', content)
+
+
+class SegmentCacheMixin:
+    """
+    Serve the view's GET responses from the page cache (see module docstring).
+    Views list the fragment versions their page depends on in
+    get_page_versions() and may name an owner who always gets a fresh page.
+    """
+    page_versions = ('posts', 'taxonomy')
+    page_segment = None
+
+    def get_page_versions(self):
+        return list(self.page_versions)
+
+    def get_page_owner_id(self):
+        return None
+
+    def page_storable(self):
+        return True
+
+    def page_cache_hit(self, entry):
+        """Called instead of the view when a cached page is served."""
+
+    def page_key(self, request):
+        return fragment_key('page', self.page_segment, request.get_full_path())
+
+    def dispatch(self, request, *args, **kwargs):
+        if (not page_cache_enabled() or request.method != 'GET' or getattr(request, 'bypass_page_cache', False)
+                or 'q' in request.GET or has_pending_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+        self.page_segment = role_segment(request.user)
+        key = self.page_key(request)
+        cache = fragment_cache()
+        entry = cache.get(key)
+        if (entry is not None
+                and not (request.user.is_authenticated and entry['owner_id'] == request.user.pk)
+                and get_versions(*entry['versions']) == entry['versions']):
+            self.page_cache_hit(entry)
+            response = HttpResponse(fill_user_bits(entry['content'], request))
+            response.cache_policy = entry['cache_policy']
+            response.surrogate_keys = entry['surrogate_keys']
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if not hasattr(response, 'render'):
+            return response
+        response.render()
+        content = response.content.decode(response.charset)
+        owner_id = self.get_page_owner_id()
+        if response.status_code == 200 and self.page_storable() and not (
+            request.user.is_authenticated and owner_id == request.user.pk
+        ):
+            cache.set(key, {
+                'content': content,
+                'versions': self.page_version_tokens,
+                'owner_id': owner_id,
+                'object_id': getattr(getattr(self, 'object', None), 'pk', None),
+                'cache_policy': getattr(response, 'cache_policy', None),
+                'surrogate_keys': getattr(response, 'surrogate_keys', []),
+            }, getattr(settings, 'PAGE_CACHE_TIMEOUT', 60))
+        response.content = fill_user_bits(content, request)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.page_segment is not None:
+            # Read before rendering, so a change made meanwhile expires the page
+            self.page_version_tokens = get_versions(*self.get_page_versions())
+            context['page_segment'] = self.page_segment
+            context['csrf_token'] = CSRF_PLACEHOLDER
+        return context
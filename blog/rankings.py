@@ -0,0 +1,153 @@
+"""
+Time-decayed "Trending" and "Most discussed" post rankings.
+
+A post's score is the sum of its daily activity, each day weighted by
+2 ** (-age / half_life). Trending counts views plus approved comments
+(weighted by RANKING_COMMENT_WEIGHT); Most discussed counts approved comments
+only. Scores are stored as log(sum(activity * 2 ** (hours_since_epoch / half_life))),
+which orders posts exactly like the decayed score at any later moment. That
+makes the ranking table incremental: a post's row only has to be recomputed
+when its own activity changes, never because time passed.
+
+Each post has one row per ranking in the 'all' scope, its category's scope
+and each of its tags' scopes, so any page reads its top N with one query on
+the (kind, scope, -score) index.
+"""
+import math
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Comment, Post, PostRanking, PostStats, Watermark
+
+
+SCOPE_ALL = 'all'
+EPOCH = date(2024, 1, 1)
+WATERMARK_NAME = 'rankings'
+
+
+def category_scope(category_id):
+    return f'category:{category_id}'
+
+
+def tag_scope(tag_id):
+    return f'tag:{tag_id}'
+
+
+def half_life_hours(kind):
+    half_lives = getattr(settings, 'RANKING_HALF_LIFE_HOURS', {})
+    return half_lives.get(kind, 24)
+
+
+def log_score(activity, half_life):
+    """
+    Combine {day: weight} into a log-space decayed score (None without activity).
+    Each day counts at its midpoint; log-sum-exp keeps the result finite.
+    """
+    terms = [
+        math.log(weight) + math.log(2) * ((day - EPOCH).days * 24 + 12) / half_life
+        for day, weight in activity.items() if weight > 0
+    ]
+    if not terms:
+        return None
+    peak = max(terms)
+    return peak + math.log(sum(math.exp(term - peak) for term in terms))
+
+
+def top_posts(kind, scope=SCOPE_ALL, limit=None):
+    """Return the top published posts for a ranking and scope."""
+    limit = limit or getattr(settings, 'RANKING_TOP_N', 5)
+    rankings = PostRanking.objects.filter(
+        kind=kind, scope=scope, post__status=Post.Status.PUBLISHED
+    ).select_related('post').order_by('-score')[:limit]
+    return [ranking.post for ranking in rankings]
+
+
+def changed_post_ids(since):
+    """Posts whose views, comments, status or category changed since `since`."""
+    post_ids = set(PostStats.objects.filter(date__gte=timezone.localdate(since)).values_list('post_id', flat=True))
+    post_ids.update(Comment.objects.filter(updated_at__gte=since).values_list('post_id', flat=True))
+    post_ids.update(Post.objects.filter(updated_at__gte=since).values_list('pk', flat=True))
+    return post_ids
+
+
+def compute_rankings(post_ids, window_start):
+    """Build unsaved PostRanking rows for the given posts."""
+    comment_weight = getattr(settings, 'RANKING_COMMENT_WEIGHT', 5)
+    views = defaultdict(dict)
+    comments = defaultdict(dict)
+
+    for post_id, day, count in PostStats.objects.filter(
+        post_id__in=post_ids, date__gte=window_start
+    ).values_list('post_id', 'date', 'views'):
+        views[post_id][day] = count
+
+    start = timezone.make_aware(datetime.combine(window_start, time.min))
+    for post_id, day, count in Comment.objects.filter(
+        post_id__in=post_ids, is_approved=True, created_at__gte=start
+    ).annotate(day=TruncDate('created_at')).values('post_id', 'day').annotate(
+        count=Count('id')
+    ).values_list('post_id', 'day', 'count'):
+        comments[post_id][day] = count
+
+    scopes = {
+        pk: [SCOPE_ALL] + ([category_scope(category_id)] if category_id else [])
+        for pk, category_id in Post.published.filter(pk__in=post_ids).values_list('pk', 'category_id')
+    }
+    for post_id, tag_id in Post.tags.through.objects.filter(
+        post_id__in=scopes.keys()
+    ).values_list('post_id', 'tag_id'):
+        scopes[post_id].append(tag_scope(tag_id))
+
+    rows = []
+    for post_id, post_scopes in scopes.items():
+        trending = dict(views[post_id])
+        for day, count in comments[post_id].items():
+            trending[day] = trending.get(day, 0) + count * comment_weight
+        scores = {
+            PostRanking.Kind.TRENDING: log_score(trending, half_life_hours(PostRanking.Kind.TRENDING)),
+            PostRanking.Kind.DISCUSSED: log_score(comments[post_id], half_life_hours(PostRanking.Kind.DISCUSSED)),
+        }
+        for kind, score in scores.items():
+            if score is None:
+                continue
+            rows.extend(PostRanking(kind=kind, scope=scope, post_id=post_id, score=score) for scope in post_scopes)
+    return rows
+
+
+def update_rankings(full=False, batch_size=500):
+    """
+    Recompute rankings for posts with activity since the last run (or all
+    posts with `full`), one transaction per batch of posts.
+    Returns (posts processed, ranking rows written).
+
+    Deleted comments, tag-only edits and activity ageing out of the window
+    are picked up by the next full run.
+    """
+    started = timezone.now()
+    window_start = timezone.localdate(started) - timedelta(days=getattr(settings, 'RANKING_WINDOW_DAYS', 14))
+    watermark = Watermark.objects.filter(name=WATERMARK_NAME).first()
+
+    if full or watermark is None:
+        post_ids = set(Post.objects.values_list('pk', flat=True))
+    else:
+        post_ids = changed_post_ids(watermark.value)
+
+    post_ids = sorted(post_ids)
+    written = 0
+    for offset in range(0, len(post_ids), batch_size):
+        batch = post_ids[offset:offset + batch_size]
+        rows = compute_rankings(batch, window_start)
+        with transaction.atomic():
+            PostRanking.objects.filter(post_id__in=batch).delete()
+            PostRanking.objects.bulk_create(rows, batch_size=batch_size)
+        written += len(rows)
+
+    # Activity during this run is picked up by the next one
+    Watermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': started})
+    return len(post_ids), written
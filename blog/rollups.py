@@ -0,0 +1,171 @@
+"""
+Incrementally maintained daily rollups.
+
+PostStats (per post) is kept current by comment signals and the view
+counter; the category, tag and author rollups are filled by the
+rollup_stats command from a watermark. Every change is expressed as deltas
+keyed by (object id, date) and applied with one INSERT ... ON CONFLICT DO
+UPDATE statement, so reports read a few small rows per object and day
+instead of grouping Post and Comment rows.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+STATS_FIELDS = ('views', 'comments', 'pending_comments')
+
+
+def comment_counter(is_approved):
+    return 'comments' if is_approved else 'pending_comments'
+
+
+def comment_deltas(comments, sign=1):
+    """Deltas for comments being added (sign=1) or removed (sign=-1)."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for comment in comments:
+        day = timezone.localdate(comment.created_at)
+        deltas[(comment.post_id, day)][comment_counter(comment.is_approved)] += sign
+    return deltas
+
+
+def moderation_deltas(queryset, approved):
+    """Deltas for the comments in `queryset` switching to `approved`."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for row in queryset.annotate(day=TruncDate('created_at')).values('post_id', 'day').annotate(count=Count('id')):
+        key = (row['post_id'], row['day'])
+        deltas[key][comment_counter(approved)] += row['count']
+        deltas[key][comment_counter(not approved)] -= row['count']
+    return deltas
+
+
+def upsert_increments(model, key_fields, value_fields, deltas):
+    """
+    Add {key tuple: {field: delta}} to a rollup table with a unique constraint
+    on `key_fields`, using one executemany INSERT ... ON CONFLICT DO UPDATE
+    (SQLite 3.24+ / PostgreSQL) inside a transaction.
+    Returns the number of rows upserted.
+    """
+    rows = [
+        (*(connection.ops.adapt_datefield_value(part) if isinstance(part, date) else part for part in key),
+         *(changes.get(field, 0) for field in value_fields))
+        for key, changes in deltas.items()
+        if any(changes.values())
+    ]
+    if not rows:
+        return 0
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in (*key_fields, *value_fields))
+    conflict = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in key_fields)
+    placeholders = ', '.join(['%s'] * (len(key_fields) + len(value_fields)))
+    updates = ', '.join(f'{field} = {table}.{field} + excluded.{field}' for field in value_fields)
+    sql = (
+        f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+        f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}'
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    return len(rows)
+
+
+def add_to_post_stats(deltas):
+    """Add {(post_id, date): {field: delta}} to PostStats."""
+    from .models import Post, PostStats
+
+    if not deltas:
+        return 0
+    # Posts deleted in the meantime would violate the foreign key
+    existing = set(Post.objects.filter(pk__in={post_id for post_id, _ in deltas}).values_list('pk', flat=True))
+    return upsert_increments(
+        PostStats, ('post', 'date'), STATS_FIELDS,
+        {key: changes for key, changes in deltas.items() if key[0] in existing},
+    )
+
+
+CONTENT_ROLLUP_WATERMARK = 'content_rollups'
+
+
+def content_rollup_dimensions():
+    """(rollup model, key field, path from Post, path from Comment) per dimension."""
+    from .models import AuthorDailyStats, CategoryDailyStats, TagDailyStats
+
+    return [
+        (CategoryDailyStats, 'category', 'category', 'post__category'),
+        (TagDailyStats, 'tag', 'tags', 'post__tags'),
+        (AuthorDailyStats, 'author', 'author', 'post__author'),
+    ]
+
+
+def rollup_window(start, end):
+    """
+    Add posts published and comments received in [start, end) to the category,
+    tag and author daily rollups with one GROUP BY per source and dimension.
+    """
+    from .models import ArchivedComment, Comment, Post
+
+    posts = Post.published.filter(published_at__gte=start, published_at__lt=end).annotate(day=TruncDate('published_at'))
+    comments, archived = (
+        model.objects.filter(created_at__gte=start, created_at__lt=end).annotate(day=TruncDate('created_at'))
+        for model in (Comment, ArchivedComment)
+    )
+    for model, key, post_path, comment_path in content_rollup_dimensions():
+        deltas = defaultdict(lambda: defaultdict(int))
+        for source, path, field in (
+            (posts, post_path, 'posts_published'),
+            (comments, comment_path, 'comments'),
+            (archived, comment_path, 'comments'),
+        ):
+            for row in source.values(path, 'day').annotate(count=Count('id')).order_by():
+                if row[path] is not None:
+                    deltas[(row[path], row['day'])][field] += row['count']
+        upsert_increments(model, (key, 'date'), ('posts_published', 'comments'), deltas)
+
+
+def update_content_rollups(rebuild=False, batch_days=7):
+    """
+    Roll up everything between the last watermark and now (minus
+    ROLLUP_LAG_SECONDS, so rows from transactions still in flight are not
+    skipped), in windows of `batch_days`. Each window is counted and moves
+    the watermark in one short transaction. Returns the number of windows.
+
+    Posts count on the day they were (last) published; unpublishing a post
+    does not remove it from past days.
+    """
+    from .models import ArchivedComment, Comment, Post, Watermark
+
+    end = timezone.now() - timedelta(seconds=getattr(settings, 'ROLLUP_LAG_SECONDS', 60))
+    if rebuild:
+        with transaction.atomic():
+            for model, *_ in content_rollup_dimensions():
+                model.objects.all().delete()
+            Watermark.objects.filter(name=CONTENT_ROLLUP_WATERMARK).delete()
+
+    watermark = Watermark.objects.filter(name=CONTENT_ROLLUP_WATERMARK).first()
+    if watermark is not None:
+        start = watermark.value
+    else:
+        earliest = [
+            value for value in (
+                Post.objects.aggregate(first=Min('published_at'))['first'],
+                Comment.objects.aggregate(first=Min('created_at'))['first'],
+                ArchivedComment.objects.aggregate(first=Min('created_at'))['first'],
+            ) if value is not None
+        ]
+        start = min(earliest, default=end)
+
+    windows = 0
+    while start < end:
+        stop = min(start + timedelta(days=batch_days), end)
+        with transaction.atomic():
+            rollup_window(start, stop)
+            Watermark.objects.update_or_create(name=CONTENT_ROLLUP_WATERMARK, defaults={'value': stop})
+        start = stop
+        windows += 1
+    return windows
@@ -0,0 +1,73 @@
+"""
+Database router sending read-only views to replicas and everything else to the primary.
+
+Reads only go to a replica while a view that opted in with `replica_reads = True`
+is being handled (see blog.middleware.ReplicaRoutingMiddleware), the request has
+not written anything yet, and the client is outside its post-write stickiness
+window. Management commands, admin and write views always use the primary.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState:
+    """Per-request routing flags."""
+    __slots__ = ('allow_replica', 'pinned', 'wrote', 'replica')
+
+    def __init__(self, pinned=False):
+        self.allow_replica = False
+        self.replica = None
+        self.pinned = pinned
+        self.wrote = False
+
+
+routing_state = ContextVar('routing_state', default=None)
+
+# Always read from the primary; writes to them do not make a client sticky
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReadReplicaRouter:
+    """Route replica-safe reads to DATABASE_REPLICAS and all writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Follow relations on the database the instance was loaded from
+            return instance._state.db
+        state = routing_state.get()
+        replicas = replica_aliases()
+        if (not replicas or model._meta.app_label in PRIMARY_ONLY_APPS
+                or state is None or not state.allow_replica
+                or state.pinned or state.wrote
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        # Stick to one replica per request so its reads see one consistent snapshot
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Replicas get their schema by copying the primary, never by migrating."""
+        if db in replica_aliases():
+            return False
+        return None
@@ -1,13 +1,185 @@
 """
 Signals for blog app.
 """
-from django.db.models.signals import pre_save, post_save
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
-from .models import Post
+from django.db import transaction
+from .models import Post, Comment, Category, Tag
+from . import cdn
+from .db import apply_sqlite_pragmas
+from .counters import view_counter
+from .fragments import bump_versions_on_commit, comments_version_name
+from .rollups import add_to_post_stats, comment_counter, comment_deltas
+from .suggestions import suggestion_index
+from .taxonomy import taxonomy_index
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS (WAL, synchronous, cache sizes, busy timeout) to new connections."""
+    apply_sqlite_pragmas(connection)
+
+
+@receiver(request_finished)
+def flush_view_counts(sender, **kwargs):
+    """Write buffered post view counts once the response has been sent, when a flush is due."""
+    if view_counter.flush_due():
+        try:
+            view_counter.flush()
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.error(f'Error flushing post view counts: {e}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def refresh_taxonomy_index(sender, **kwargs):
+    """Make every process rebuild its autocomplete index once the change is committed."""
+    transaction.on_commit(taxonomy_index.invalidate)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def expire_taxonomy_fragments(sender, **kwargs):
+    """Re-render cached fragments that show category or tag names."""
+    bump_versions_on_commit('taxonomy')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_post_fragments(sender, raw=False, **kwargs):
+    """Re-render fragments that count posts (post cards are keyed by updated_at)."""
+    if not raw:
+        bump_versions_on_commit('posts')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def purge_taxonomy_pages(sender, instance, raw=False, **kwargs):
+    """Purge proxy-cached pages that show this category or tag (see blog.cdn)."""
+    if not raw:
+        key = cdn.category_key(instance.pk) if sender is Category else cdn.tag_key(instance.pk)
+        cdn.purge(key, 'taxonomy')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, raw=False, **kwargs):
+    """
+    Purge the post's page, every listing that shows it, and the listings it
+    may have just joined (a post moved or published into a category or tag).
+    """
+    if raw:
+        return
+    keys = [cdn.post_key(instance.pk), 'posts']
+    if instance.category_id:
+        keys.append(cdn.category_posts_key(instance.category_id))
+    if kwargs.get('created') is False:
+        keys += [cdn.tag_posts_key(pk) for pk in instance.tags.values_list('pk', flat=True)]
+    cdn.purge(*keys)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def refresh_suggestions(sender, instance, raw=False, **kwargs):
+    """Re-read this post into every process's title index once the change is committed."""
+    if not raw:
+        # Deleting clears instance.pk before the commit callbacks run
+        post_id = instance.pk
+        transaction.on_commit(lambda: suggestion_index.post_changed(post_id))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def touch_retagged_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    """Tagging doesn't save the post, so bump updated_at for fragments keyed by it."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        posts = Post.objects.filter(tags=instance) if action == 'pre_clear' else Post.objects.filter(pk__in=pk_set)
+    else:
+        posts = Post.objects.filter(pk=instance.pk)
+    posts.update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def purge_retagged_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    """Purge the retagged posts' pages and the tag listings they joined or left."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if action == 'pre_clear':
+        pk_set = set((instance.posts if reverse else instance.tags).values_list('pk', flat=True))
+    post_ids, tag_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    cdn.purge(*map(cdn.post_key, post_ids), *map(cdn.tag_posts_key, tag_ids))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_comment_fragments(sender, instance, raw=False, **kwargs):
+    """Re-render the post's cached comment list."""
+    if not raw:
+        bump_versions_on_commit(comments_version_name(instance.post_id))
+        cdn.purge(cdn.post_key(instance.post_id))
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_approval(sender, instance, **kwargs):
+    """Keep the stored approval state so post_save can tell whether it changed."""
+    if instance.pk and not instance._state.adding:
+        instance._was_approved = Comment.objects.filter(pk=instance.pk).values_list('is_approved', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    """Update the PostStats comment rollup for new and (un)approved comments."""
+    if raw:
+        return
+    if created:
+        add_to_post_stats(comment_deltas([instance]))
+        return
+    was_approved = getattr(instance, '_was_approved', None)
+    if was_approved is None or was_approved == instance.is_approved:
+        return
+    day = timezone.localdate(instance.created_at)
+    add_to_post_stats({(instance.post_id, day): {
+        comment_counter(instance.is_approved): 1,
+        comment_counter(was_approved): -1,
+    }})
+
+
+def deleted_with_post(origin):
+    return isinstance(origin, Post) or getattr(origin, 'model', None) is Post
+
+
+@receiver(pre_delete, sender=Comment)
+def remember_deleted_comment_approval(sender, instance, origin=None, **kwargs):
+    """Read the stored approval state, which a subtree UPDATE may have changed under this instance."""
+    if not deleted_with_post(origin):
+        instance._was_approved = Comment.objects.filter(pk=instance.pk).values_list('is_approved', flat=True).first()
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    """Remove a deleted comment from the PostStats rollup (unless its post is going too)."""
+    if deleted_with_post(origin):
+        return
+    day = timezone.localdate(instance.created_at)
+    was_approved = getattr(instance, '_was_approved', None)
+    if was_approved is None:
+        was_approved = instance.is_approved
+    add_to_post_stats({(instance.post_id, day): {comment_counter(was_approved): -1}})
 
 
 @receiver(pre_save, sender=Post)
@@ -42,8 +214,10 @@ def notify_admin_on_publish(sender, instance, created, **kwargs):
         )
         
         # Send email notification to each admin (if email is configured)
-        if admin_users.exists() and hasattr(settings, 'EMAIL_HOST') and settings.EMAIL_HOST:
+        if getattr(settings, 'EMAIL_HOST', None) and admin_users.exists():
             try:
+                # Only loaded when notifications are configured
+                from django.core.mail import send_mail
                 admin_emails = [admin.email for admin in admin_users if admin.email]
                 if admin_emails:
                     subject = f'New Post Published: {instance.title}'
@@ -0,0 +1,255 @@
+"""
+Static site export: published content as plain HTML files.
+
+export_site() renders every published post, category page, tag page and the
+home listing as an anonymous visitor into STATIC_EXPORT_DIR, one
+<path>/index.html per URL, with a thread pool of STATIC_EXPORT_WORKERS.
+Later pages of a listing go to <path>/page/<n>/ and later comment pages
+to <post path>/comments/<n>/. Their ?page= and ?comments_page= links are
+rewritten to match, so any web server that serves index.html files can
+serve the export.
+
+A manifest (.manifest.json in the output directory) records what each page
+was built from: a post's updated_at, category, tags and comments, and each
+category's and tag's name and slug. A later run re-renders only:
+
+    posts that changed, and posts whose category or tag was renamed
+    the home listing, if any post or category/tag changed
+    the category and tag listings a changed post left or joined
+
+It also deletes the pages of posts that were unpublished or deleted and of
+removed categories and tags. Sidebars (trending posts, related posts) and
+author names are only refreshed for the pages a run re-renders; use
+full=True (--full) to rebuild everything.
+"""
+import json
+import os
+import re
+import shutil
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+from django.urls import reverse
+
+from .counters import view_counter
+from .models import Category, Post, Tag
+from .warmup import anonymous_request_factory, render_anonymously
+
+MANIFEST_NAME = '.manifest.json'
+MANIFEST_VERSION = 1
+
+PAGE_LINK = re.compile(r'href="\?page=(\d+)[^"#]*')
+COMMENTS_PAGE_LINK = re.compile(r'href="\?comments_page=(\d+)')
+
+ExportResult = namedtuple('ExportResult', 'rendered pages removed seconds errors')
+
+
+def export_dir(output_dir=None):
+    return Path(output_dir or getattr(settings, 'STATIC_EXPORT_DIR', settings.BASE_DIR / 'static_site'))
+
+
+def post_signatures():
+    """{post id: {'signature', 'path', 'category', 'tags'}} for every published post."""
+    tags = defaultdict(list)
+    for post_id, tag_id in Post.tags.through.objects.filter(
+        post__status=Post.Status.PUBLISHED,
+    ).order_by('tag_id').values_list('post_id', 'tag_id'):
+        tags[post_id].append(tag_id)
+
+    posts = {}
+    for post in Post.published.annotate(
+        last_comment=Max('comments__updated_at'),
+        comment_total=Count('comments', distinct=True),
+        archived_total=Count('archived_comments', distinct=True),
+    ).values('pk', 'slug', 'updated_at', 'category_id', 'last_comment', 'comment_total', 'archived_total'):
+        posts[str(post['pk'])] = {
+            'signature': '|'.join(str(post[field]) for field in (
+                'updated_at', 'category_id', 'last_comment', 'comment_total', 'archived_total',
+            )) + f'|{tags[post["pk"]]}',
+            'path': reverse('blog:post_detail', args=[post['slug']]),
+            'category': post['category_id'],
+            'tags': tags[post['pk']],
+        }
+    return posts
+
+
+def taxonomy_signatures(model, url_name):
+    return {
+        str(pk): {'signature': f'{name}|{slug}', 'path': reverse(url_name, args=[slug])}
+        for pk, name, slug in model.objects.values_list('pk', 'name', 'slug')
+    }
+
+
+def changed_keys(old, new):
+    return {key for key, entry in new.items() if old.get(key, {}).get('signature') != entry['signature']}
+
+
+def output_file(root, path):
+    return root / path.strip('/') / 'index.html'
+
+
+def write_file(target, content):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f'.{target.name}.tmp')
+    temporary.write_text(content, encoding='utf-8')
+    os.replace(temporary, target)
+
+
+def remove_pages(root, path, subdirectory=None):
+    """Remove a page (or only its extra pages under `subdirectory`), never the export root itself."""
+    directory = root / path.strip('/')
+    if subdirectory:
+        shutil.rmtree(directory / subdirectory, ignore_errors=True)
+    elif directory != root:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class PageRenderer:
+    """Renders one URL with all of its pages into the export directory."""
+
+    def __init__(self, root):
+        self.root = root
+        self.factory = anonymous_request_factory()
+
+    def render(self, path, data=None):
+        # The context (pagination, comment pages) is read, so never take a cached page
+        response = render_anonymously(self.factory, path, data, bypass_page_cache=True)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned HTTP {response.status_code}')
+        return response, response.content.decode(response.charset)
+
+    def listing(self, path):
+        """Write every page of a paginated listing; returns the number of pages."""
+        def page_url(match):
+            number = int(match[1])
+            return f'href="{path}' + (f'page/{number}/' if number > 1 else '')
+
+        remove_pages(self.root, path, 'page')
+        response, content = self.render(path)
+        write_file(output_file(self.root, path), PAGE_LINK.sub(page_url, content))
+        pages = response.context_data['page_obj'].paginator.num_pages if response.context_data.get('is_paginated') else 1
+        for number in range(2, pages + 1):
+            _, content = self.render(path, {'page': number})
+            write_file(output_file(self.root, f'{path}page/{number}/'), PAGE_LINK.sub(page_url, content))
+        return pages
+
+    def post(self, path):
+        """Write a post with every page of its comments; returns the number of pages."""
+        def page_url(match):
+            number = int(match[1])
+            return f'href="{path}' + (f'comments/{number}/' if number > 1 else '')
+
+        remove_pages(self.root, path, 'comments')
+        number = 1
+        while True:
+            response, content = self.render(path, {'comments_page': number} if number > 1 else None)
+            target = path if number == 1 else f'{path}comments/{number}/'
+            write_file(output_file(self.root, target), COMMENTS_PAGE_LINK.sub(page_url, content))
+            if not response.context_data['comments_has_next']:
+                return number
+            number += 1
+
+
+def run_task(renderer, kind, path, close_connection):
+    try:
+        return renderer.post(path) if kind == 'posts' else renderer.listing(path)
+    finally:
+        if close_connection:
+            # Pool threads open their own connections; don't leave them behind
+            connections.close_all()
+
+
+def export_site(output_dir=None, workers=None, full=False):
+    """Export (or update) the static site. Returns an ExportResult."""
+    start = time.perf_counter()
+    root = export_dir(output_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest_file = root / MANIFEST_NAME
+    manifest = {}
+    if not full and manifest_file.exists():
+        manifest = json.loads(manifest_file.read_text(encoding='utf-8'))
+        if manifest.get('version') != MANIFEST_VERSION:
+            manifest = {}
+    old = {kind: manifest.get(kind, {}) for kind in ('posts', 'categories', 'tags', 'listings')}
+    new = {
+        'posts': post_signatures(),
+        'categories': taxonomy_signatures(Category, 'blog:category_posts'),
+        'tags': taxonomy_signatures(Tag, 'blog:tag_posts'),
+    }
+
+    changed = {kind: changed_keys(old[kind], new[kind]) for kind in ('posts', 'categories', 'tags')}
+    removed = {kind: set(old[kind]) - set(new[kind]) for kind in ('posts', 'categories', 'tags')}
+
+    # Posts showing a renamed category or tag
+    renamed = {kind: {key for key in changed[kind] if key in old[kind]} for kind in ('categories', 'tags')}
+    for key, entry in new['posts'].items():
+        if str(entry['category']) in renamed['categories'] or renamed['tags'] & set(map(str, entry['tags'])):
+            changed['posts'].add(key)
+    # Listings a changed or removed post appeared on, before or after the change
+    for key in changed['posts'] | removed['posts']:
+        for entry in (old['posts'].get(key), new['posts'].get(key)):
+            if entry:
+                if entry['category'] is not None:
+                    changed['categories'].add(str(entry['category']))
+                changed['tags'].update(map(str, entry['tags']))
+
+    home = reverse('blog:home')
+    tasks = [('listings', home, home)] if any(changed.values()) or any(removed.values()) or home not in old['listings'] else []
+    for kind in ('posts', 'categories', 'tags'):
+        tasks += [(kind, key, new[kind][key]['path']) for key in sorted(changed[kind]) if key in new[kind]]
+
+    workers = workers or getattr(settings, 'STATIC_EXPORT_WORKERS', 4)
+    renderer = PageRenderer(root)
+    results, errors = {}, []
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {(kind, key, path): pool.submit(run_task, renderer, kind, path, True) for kind, key, path in tasks}
+            for (kind, key, path), future in futures.items():
+                try:
+                    results[(kind, key)] = future.result()
+                except Exception as e:
+                    errors.append(f'{path}: {e}')
+    else:
+        for kind, key, path in tasks:
+            try:
+                results[(kind, key)] = run_task(renderer, kind, path, False)
+            except Exception as e:
+                errors.append(f'{path}: {e}')
+    # Rendering post pages counts views that no reader made
+    view_counter.discard()
+
+    for kind in ('posts', 'categories', 'tags'):
+        for key in removed[kind]:
+            remove_pages(root, old[kind][key]['path'])
+        # Pages whose slug changed were written to their new path
+        for key in changed[kind] & set(old[kind]) & set(new[kind]):
+            if old[kind][key]['path'] != new[kind][key]['path'] and (kind, key) in results:
+                remove_pages(root, old[kind][key]['path'])
+
+    # Failed pages keep their old manifest entry (or none), so the next run retries them
+    updated = {'version': MANIFEST_VERSION, 'listings': {}}
+    for kind in ('posts', 'categories', 'tags'):
+        updated[kind] = {}
+        for key, entry in new[kind].items():
+            if (kind, key) in results:
+                updated[kind][key] = {**entry, 'pages': results[(kind, key)]}
+            elif key not in changed[kind] and key in old[kind]:
+                updated[kind][key] = old[kind][key]
+    if ('listings', home) in results:
+        updated['listings'][home] = results[('listings', home)]
+    elif home in old['listings'] and not any(task[0] == 'listings' for task in tasks):
+        updated['listings'][home] = old['listings'][home]
+    write_file(manifest_file, json.dumps(updated, indent=1, sort_keys=True))
+
+    return ExportResult(
+        rendered=len(results),
+        pages=sum(results.values()),
+        removed=sum(len(keys) for keys in removed.values()),
+        seconds=time.perf_counter() - start,
+        errors=errors,
+    )
@@ -0,0 +1,151 @@
+"""
+Search-as-you-type suggestions from in-memory indexes.
+
+Published post titles are kept in a TitleIndex: the word-prefix index from
+blog.taxonomy plus a trigram index, so "learn" finds "Machine Learning" and
+"chine" still finds it once the prefixes run out. Categories and tags come
+from the autocomplete index in blog.taxonomy.
+
+Each process builds its title index once and then keeps it current
+incrementally. Post signals append the changed post id to a change log in
+the cache under an increasing sequence number. A lookup reads the latest
+sequence number (one cache get), and a process that is behind re-reads only
+the changed posts. Keystrokes never query the database unless posts have
+changed; a full rebuild only happens when the log has expired or grown past
+SEARCH_SUGGEST_MAX_CHANGES.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from .models import Post
+from .taxonomy import PrefixIndex, taxonomy_index
+
+
+SEQUENCE_CACHE_KEY = 'blog:suggest:sequence'
+CHANGE_CACHE_KEY = 'blog:suggest:change:{}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+
+
+def current_sequence():
+    """
+    Latest change log sequence number. A missing counter (first use, cache
+    flushed) restarts from the clock, far past any number a process may have
+    seen, so every process rebuilds instead of mistaking old numbers for new.
+    """
+    sequence = cache.get(SEQUENCE_CACHE_KEY)
+    if sequence is None:
+        cache.add(SEQUENCE_CACHE_KEY, time.time_ns() // 1000, None)
+        sequence = cache.get(SEQUENCE_CACHE_KEY)
+    return sequence
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TitleIndex(PrefixIndex):
+    """PrefixIndex with a trigram fallback for matches inside words."""
+
+    def __init__(self, items):
+        super().__init__(items)
+        self.trigrams = defaultdict(set)
+        for pk, name in self.names.items():
+            for trigram in trigrams(name.lower()):
+                self.trigrams[trigram].add(pk)
+
+    def add(self, pk, name, slug=None):
+        super().add(pk, name, slug)
+        for trigram in trigrams(name.lower()):
+            self.trigrams[trigram].add(pk)
+
+    def remove(self, pk):
+        name = self.names.get(pk)
+        super().remove(pk)
+        if name is None:
+            return
+        for trigram in trigrams(name.lower()):
+            self.trigrams[trigram].discard(pk)
+            if not self.trigrams[trigram]:
+                del self.trigrams[trigram]
+
+    def search(self, prefix, limit=20):
+        found = super().search(prefix, limit)
+        term = prefix.strip().lower()
+        if len(found) >= limit or len(term) < 3:
+            return found
+        candidates = set.intersection(*(self.trigrams.get(trigram, set()) for trigram in trigrams(term)))
+        seen = {pk for pk, _ in found}
+        extra = sorted(
+            ((pk, self.names[pk]) for pk in candidates - seen if term in self.names[pk].lower()),
+            key=lambda item: item[1].lower(),
+        )
+        return found + extra[:limit - len(found)]
+
+
+class SuggestionIndex:
+    """Per-process title index, caught up from the cached change log on each lookup."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._titles = None
+        self._sequence = 0
+
+    def suggest(self, term, limit=None):
+        """Return {'posts': [...], 'categories': [...], 'tags': [...]} of {'name', 'url'} dicts."""
+        limit = limit or getattr(settings, 'SEARCH_SUGGEST_LIMIT', 5)
+        titles = self._current()
+        return {
+            'posts': [
+                {'name': name, 'url': reverse('blog:post_detail', args=[titles.slugs[pk]])}
+                for pk, name in titles.search(term, limit)
+            ],
+            'categories': self._taxonomy('categories', 'blog:category_posts', term, limit),
+            'tags': self._taxonomy('tags', 'blog:tag_posts', term, limit),
+        }
+
+    def _taxonomy(self, kind, url_name, term, limit):
+        index = taxonomy_index.index(kind)
+        return [
+            {'name': name, 'url': reverse(url_name, args=[index.slugs[pk]])}
+            for pk, name in index.search(term, limit)
+        ]
+
+    def post_changed(self, post_id):
+        """Record that a post was saved or deleted; every process re-reads it on its next lookup."""
+        current_sequence()
+        sequence = cache.incr(SEQUENCE_CACHE_KEY)
+        cache.set(CHANGE_CACHE_KEY.format(sequence), post_id, CHANGE_TIMEOUT)
+
+    def _current(self):
+        sequence = current_sequence()
+        if self._titles is None or sequence != self._sequence:
+            with self._lock:
+                if self._titles is None or sequence != self._sequence:
+                    self._catch_up(sequence)
+        return self._titles
+
+    def _catch_up(self, sequence):
+        max_changes = getattr(settings, 'SEARCH_SUGGEST_MAX_CHANGES', 500)
+        changed = None
+        if self._titles is not None and 0 < sequence - self._sequence <= max_changes:
+            keys = [CHANGE_CACHE_KEY.format(number) for number in range(self._sequence + 1, sequence + 1)]
+            logged = cache.get_many(keys)
+            if len(logged) == len(keys):
+                changed = set(logged.values())
+
+        if changed is None:
+            self._titles = TitleIndex(Post.published.values_list('pk', 'title', 'slug'))
+        else:
+            for pk in changed:
+                self._titles.remove(pk)
+            for pk, title, slug in Post.published.filter(pk__in=changed).values_list('pk', 'title', 'slug'):
+                self._titles.add(pk, title, slug)
+        self._sequence = sequence
+
+
+suggestion_index = SuggestionIndex()
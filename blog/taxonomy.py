@@ -0,0 +1,126 @@
+"""
+In-memory prefix index over tag and category names for autocomplete.
+
+Each name is indexed under every word it contains ("Machine Learning" is
+found by "mac" and by "lea"), as a sorted list of (lowercased suffix, pk)
+pairs searched with bisect, so a lookup costs O(log n + matches) without
+touching the database. Tag and category signals bump a version number in
+the cache; every process rebuilds its copy on the next lookup after a
+change.
+"""
+import re
+import threading
+import uuid
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from .models import Category, Tag
+
+
+TAXONOMY_MODELS = {
+    'tags': Tag,
+    'categories': Category,
+}
+VERSION_CACHE_KEY = 'blog:taxonomy_index:version'
+WORD_START = re.compile(r'\b\w')
+
+
+def word_keys(pk, name):
+    lowered = name.lower()
+    return [(lowered[match.start():], pk) for match in WORD_START.finditer(lowered)]
+
+
+def name_order(item):
+    return item[1].lower()
+
+
+class PrefixIndex:
+    """
+    Sorted word-suffix index over (pk, name) or (pk, name, slug) items.
+    Slugs, when given, are kept in `slugs` for building links.
+    """
+
+    def __init__(self, items):
+        self.names = {}
+        self.slugs = {}
+        keys = []
+        for pk, name, *slug in items:
+            self.names[pk] = name
+            if slug:
+                self.slugs[pk] = slug[0]
+            keys.extend(word_keys(pk, name))
+        keys.sort()
+        self.keys = keys
+        self.by_name = sorted(self.names.items(), key=name_order)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, pk, name, slug=None):
+        """Index one item, replacing any previous entry for `pk`."""
+        self.remove(pk)
+        self.names[pk] = name
+        if slug is not None:
+            self.slugs[pk] = slug
+        for key in word_keys(pk, name):
+            insort(self.keys, key)
+        insort(self.by_name, (pk, name), key=name_order)
+
+    def remove(self, pk):
+        name = self.names.pop(pk, None)
+        if name is None:
+            return
+        self.slugs.pop(pk, None)
+        for key in word_keys(pk, name):
+            del self.keys[bisect_left(self.keys, key)]
+        self.by_name.remove((pk, name))
+
+    def search(self, prefix, limit=20):
+        """Return up to `limit` (pk, name) pairs with a word starting with `prefix`, by name."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return self.by_name[:limit]
+        found = {}
+        position = bisect_left(self.keys, (prefix,))
+        while position < len(self.keys) and len(found) < limit:
+            key, pk = self.keys[position]
+            if not key.startswith(prefix):
+                break
+            found[pk] = self.names[pk]
+            position += 1
+        return sorted(found.items(), key=lambda item: item[1].lower())
+
+
+class TaxonomyIndex:
+    """Per-process prefix indexes for TAXONOMY_MODELS, rebuilt when the cached version changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._version = None
+
+    def search(self, kind, prefix, limit=20):
+        return self.index(kind).search(prefix, limit)
+
+    def index(self, kind):
+        return self._current()[kind]
+
+    def invalidate(self):
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        self._indexes = {}
+
+    def _current(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        if not self._indexes or version != self._version:
+            with self._lock:
+                if not self._indexes or version != self._version:
+                    self._indexes = {
+                        kind: PrefixIndex(model.objects.values_list('pk', 'name', 'slug'))
+                        for kind, model in TAXONOMY_MODELS.items()
+                    }
+                    self._version = version
+        return self._indexes
+
+
+taxonomy_index = TaxonomyIndex()
@@ -0,0 +1,53 @@
+"""
+{% fragment %}: cache a block of template output under a versioned key.
+
+    {% load blog_fragments %}
+    {% fragment 'post_card' post.pk post.updated_at fragment_versions.taxonomy %}
+        ...
+    {% endfragment %}
+
+Like Django's {% cache %}, but the timeout and cache alias come from
+FRAGMENT_CACHE_TIMEOUT / FRAGMENT_CACHE and keys are built by
+blog.fragments.fragment_key, so fragments nest and can be looked up from
+Python. Set FRAGMENT_CACHE_ENABLED = False to always render.
+"""
+from django import template
+from django.conf import settings
+
+from ..fragments import fragment_cache, fragment_key, fragment_timeout
+
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        if not getattr(settings, 'FRAGMENT_CACHE_ENABLED', True):
+            return self.nodelist.render(context)
+        key = fragment_key(self.name.resolve(context), *(var.resolve(context) for var in self.vary_on))
+        cache = fragment_cache()
+        content = cache.get(key)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, fragment_timeout())
+        return content
+
+
+@register.tag('fragment')
+def do_fragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name.")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,53 @@
+"""
+Per-user bits of pages cached per role segment (see blog.page_cache).
+
+    {% load per_user %}
+    {% per_user_name %}
+    {% owner_only comment.user_id %}...{% endowner_only %}
+
+Outside a segment-cached render (no page_segment in the context) they
+render the real values straight away.
+"""
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..page_cache import USERNAME_PLACEHOLDER
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def per_user_name(context):
+    """The logged-in user's username."""
+    if context.get('page_segment'):
+        return mark_safe(USERNAME_PLACEHOLDER)
+    user = context.get('user')
+    return user.get_username() if user is not None and user.is_authenticated else ''
+
+
+class OwnerOnlyNode(template.Node):
+
+    def __init__(self, nodelist, owner_id):
+        self.nodelist = nodelist
+        self.owner_id = owner_id
+
+    def render(self, context):
+        owner_id = self.owner_id.resolve(context)
+        if context.get('page_segment'):
+            return f'<!--owner:{owner_id}-->{self.nodelist.render(context)}<!--/owner-->'
+        user = context.get('user')
+        if user is not None and user.is_authenticated and user.pk == owner_id:
+            return self.nodelist.render(context)
+        return ''
+
+
+@register.tag('owner_only')
+def do_owner_only(parser, token):
+    """Render the block only for the user whose id is given."""
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a user id.")
+    nodelist = parser.parse(('endowner_only',))
+    parser.delete_first_token()
+    return OwnerOnlyNode(nodelist, parser.compile_filter(bits[1]))
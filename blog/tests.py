@@ -1,3 +1,1168 @@
-from django.test import TestCase
+import json
+import math
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, router, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .archive import archive_comments
+from .cdn import LocalPurgeServer, PurgeDispatcher, purge_dispatcher
+from .comment_queue import comment_queue
+from .counters import ViewCounter, view_counter
+from .db import retry_on_locked
+from .middleware import ReplicaRoutingMiddleware
+from .models import (
+    ArchivedComment, AuthorDailyStats, Category, CategoryDailyStats, Comment, Post, PostRanking, PostStats, Tag,
+    TagDailyStats, Watermark, comment_path,
+)
+from .rankings import EPOCH, category_scope, compute_rankings, log_score, tag_scope, top_posts, update_rankings
+from .rollups import update_content_rollups
+from .static_export import MANIFEST_NAME, export_site
+from .taxonomy import PrefixIndex
+from .views import PostListView, add_comment
+from .warmup import run_warmup
+
+
+class SQLiteHelperTests(SimpleTestCase):
+    """Lock retries with backoff, and the pragmas applied to new connections."""
+
+    def call(self, errors, **kwargs):
+        """retry_on_locked() around a function raising `errors` in turn before succeeding."""
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return 'done'
+
+        with mock.patch('blog.db.time.sleep') as sleep:
+            try:
+                result = retry_on_locked(func, **kwargs)
+            except OperationalError as e:
+                result = e
+        return result, len(calls), [call.args[0] for call in sleep.call_args_list]
+
+    def test_retries_locked_errors_with_backoff(self):
+        with self.assertLogs('blog.db', 'WARNING') as logs:
+            result, calls, delays = self.call([OperationalError('database is locked')] * 3, base_delay=0.1, max_delay=0.3)
+        self.assertEqual((result, calls), ('done', 4))
+        self.assertEqual(len(logs.output), 3)
+        # Jittered exponential backoff: 0.1, 0.2, then capped at 0.3, each scaled by 0.5-1.0
+        for delay, ceiling in zip(delays, (0.1, 0.2, 0.3)):
+            self.assertTrue(ceiling / 2 <= delay <= ceiling, delays)
+
+    def test_gives_up_after_attempts(self):
+        error = OperationalError('database table is locked')
+        with self.assertLogs('blog.db', 'WARNING'):
+            result, calls, delays = self.call([error] * 5, attempts=3)
+        self.assertIs(result, error)
+        self.assertEqual((calls, len(delays)), (3, 2))
+
+    def test_other_errors_are_not_retried(self):
+        error = OperationalError('no such table: blog_post')
+        result, calls, delays = self.call([error])
+        self.assertIs(result, error)
+        self.assertEqual((calls, delays), (1, []))
+        with self.assertRaises(ValueError):
+            retry_on_locked(mock.Mock(side_effect=ValueError))
+
+    def test_not_retried_inside_atomic_block(self):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            result, calls, _ = self.call([OperationalError('database is locked')])
+        self.assertIsInstance(result, OperationalError)
+        self.assertEqual(calls, 1)
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 20000, 'temp_store': 'MEMORY'})
+    def test_pragmas_applied_to_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = connections[DEFAULT_DB_ALIAS].__class__(
+                {**connections[DEFAULT_DB_ALIAS].settings_dict, 'NAME': str(Path(directory, 'pragmas.sqlite3'))},
+                alias='pragmas',
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    values = {}
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store'):
+                        cursor.execute(f'PRAGMA {name}')
+                        values[name] = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+        # synchronous NORMAL is 1, temp_store MEMORY is 2
+        self.assertEqual(values, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000, 'temp_store': 2})
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions of ReadReplicaRouter under ReplicaRoutingMiddleware (no replica is queried)."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def handle(self, view, method='get', cookies=None, writes=()):
+        """Run `view` through the middleware; returns the response and the read aliases before/after writing."""
+        reads = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            reads.append(router.db_for_read(Post))
+            for model in writes:
+                router.db_for_write(model)
+            reads.append(router.db_for_read(Post))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        request = getattr(self.factory, method)('/')
+        request.COOKIES.update(cookies or {})
+        return middleware(request), reads
+
+    def test_replica_reads_views_read_from_replica(self):
+        response, reads = self.handle(PostListView.as_view())
+        self.assertEqual(reads, ['replica', 'replica'])
+        self.assertNotIn(ReplicaRoutingMiddleware.cookie_name, response.cookies)
+        # Views that didn't opt in, and code outside a request, use the primary
+        _, reads = self.handle(add_comment)
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_writes_and_posts_use_primary(self):
+        _, reads = self.handle(PostListView.as_view(), method='post')
+        self.assertEqual(reads, ['default', 'default'])
+        _, reads = self.handle(PostListView.as_view(), writes=[Comment])
+        self.assertEqual(reads, ['replica', 'default'])
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_write_pins_next_request_to_primary(self):
+        response, _ = self.handle(add_comment, method='post', writes=[Comment])
+        cookie = response.cookies[ReplicaRoutingMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], 10)
+        _, reads = self.handle(PostListView.as_view(), cookies={cookie.key: cookie.value})
+        self.assertEqual(reads, ['default', 'default'])
+        # An expired or garbled pin no longer applies
+        for value in ('1', 'junk'):
+            _, reads = self.handle(PostListView.as_view(), cookies={cookie.key: value})
+            self.assertEqual(reads, ['replica', 'replica'])
+
+    def test_sessions_never_make_client_sticky(self):
+        response, reads = self.handle(PostListView.as_view(), writes=[Session])
+        self.assertEqual(reads, ['replica', 'replica'])
+        self.assertNotIn(ReplicaRoutingMiddleware.cookie_name, response.cookies)
+        self.assertEqual(router.db_for_read(Session), 'default')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'view-counter-tests'}},
+    VIEW_COUNT_FLUSH_INTERVAL=30, VIEW_COUNT_MAX_PENDING=3,
+)
+class ViewCounterTests(TestCase):
+    """Buffered view counts reach PostStats in one upsert and survive failed flushes."""
+
+    def setUp(self):
+        caches['default'].clear()
+        author = User.objects.create_user('author', password='pass')
+        self.post = Post.objects.create(title='Post', content='Body', author=author, status=Post.Status.PUBLISHED)
+        self.other = Post.objects.create(title='Other', content='Body', author=author, status=Post.Status.PUBLISHED)
+        self.counter = ViewCounter()
+        self.today = timezone.localdate()
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def views(self, post, day=None):
+        return PostStats.objects.filter(post=post, date=day or self.today).values_list('views', flat=True).first()
+
+    def test_flush_is_one_upsert(self):
+        PostStats.objects.create(post=self.other, date=self.today, views=5)
+        yesterday = self.today - timedelta(days=1)
+        self.counter.increment(self.post.pk)
+        self.counter.increment(self.post.pk)
+        self.counter.increment(self.post.pk, yesterday)
+        self.counter.increment(self.other.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.counter.flush(), 3)
+        self.assertEqual(sum('INSERT INTO' in query['sql'] for query in queries.captured_queries), 1)
+        self.assertEqual((self.views(self.post), self.views(self.post, yesterday), self.views(self.other)), (2, 1, 6))
+        self.assertEqual(self.counter.pending(), {})
+        self.assertEqual(self.counter.flush(), 0)
+
+    def test_deleted_posts_are_skipped(self):
+        self.counter.increment(self.post.pk)
+        self.counter.increment(self.other.pk)
+        self.other.delete()
+        self.assertEqual(self.counter.flush(), 1)
+        self.assertEqual(self.views(self.post), 1)
+
+    def test_failed_flush_requeues_counts(self):
+        self.counter.increment(self.post.pk)
+        with mock.patch('blog.counters.add_to_post_stats', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                self.counter.flush()
+        self.counter.increment(self.post.pk)
+        self.assertEqual(self.counter.pending(), {(self.post.pk, self.today): 2})
+        self.counter.flush()
+        self.assertEqual(self.views(self.post), 2)
+
+    def test_concurrent_flush_keeps_buffering(self):
+        self.counter.increment(self.post.pk)
+        with self.counter._flush_lock:
+            self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual(self.counter.pending(), {(self.post.pk, self.today): 1})
+
+    def test_flush_due_after_interval_or_max_pending(self):
+        self.assertFalse(self.counter.flush_due())
+        self.counter.increment(self.post.pk)
+        self.assertFalse(self.counter.flush_due())
+        with mock.patch('blog.counters.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertTrue(self.counter.flush_due())
+        for day in range(1, 3):
+            self.counter.increment(self.post.pk, self.today - timedelta(days=day))
+        self.assertTrue(self.counter.flush_due())
+
+    @override_settings(VIEW_COUNT_FLUSH_INTERVAL=0)
+    def test_views_flushed_after_response(self):
+        view_counter.discard()
+        self.client.get(self.post.get_absolute_url())
+        self.assertEqual(self.views(self.post), 1)
+        self.assertEqual(view_counter.pending(), {})
+
+
+class RankingTests(TestCase):
+    """Decayed rankings: ordering, incremental runs, scopes and the top-N read."""
+
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='pass')
+        self.news = Category.objects.create(name='News')
+        self.notes = Category.objects.create(name='Notes')
+        self.tag = Tag.objects.create(name='Zygote')
+        self.hot = self.create_post('Hot', views={1: 50})
+        self.warm = self.create_post('Warm', views={1: 20, 3: 40})
+        self.cold = self.create_post('Cold', views={6: 30})
+        self.hot.tags.add(self.tag)
+        self.warm.tags.add(self.tag)
+
+    def create_post(self, title, views):
+        post = Post.objects.create(
+            title=title, content='Body', author=self.author, status=Post.Status.PUBLISHED, category=self.news,
+        )
+        today = timezone.localdate()
+        PostStats.objects.bulk_create(
+            PostStats(post=post, date=today - timedelta(days=age), views=count) for age, count in views.items()
+        )
+        return post
+
+    def test_log_score_orders_like_decayed_score(self):
+        today = timezone.localdate()
+        activities = [
+            {today: 1},
+            {today - timedelta(days=1): 3},
+            {today - timedelta(days=2): 3, today: 1},
+            {today - timedelta(days=5): 40},
+            {today - timedelta(days=10): 500, today - timedelta(days=9): 1},
+        ]
+        for half_life in (6, 24, 72):
+            for later in (0, 48, 24 * 30):
+                # Decayed score at `later` hours after today's midpoint
+                now = (today - EPOCH).days * 24 + 12 + later
+                decayed = [
+                    sum(weight * 2 ** (-(now - ((day - EPOCH).days * 24 + 12)) / half_life) for day, weight in activity.items())
+                    for activity in activities
+                ]
+                logs = [log_score(activity, half_life) for activity in activities]
+                self.assertEqual(
+                    sorted(range(len(activities)), key=decayed.__getitem__),
+                    sorted(range(len(activities)), key=logs.__getitem__),
+                )
+        self.assertIsNone(log_score({today: 0}, 24))
+        # Far from the epoch the terms would overflow without log-sum-exp
+        self.assertTrue(math.isfinite(log_score({EPOCH + timedelta(days=3650): 10}, 1)))
+
+    def test_full_run_ranks_every_scope(self):
+        processed, written = update_rankings(full=True)
+        self.assertEqual(processed, 3)
+        self.assertEqual(top_posts(PostRanking.Kind.TRENDING), [self.hot, self.warm, self.cold])
+        self.assertEqual(top_posts(PostRanking.Kind.TRENDING, category_scope(self.news.pk)), [self.hot, self.warm, self.cold])
+        self.assertEqual(top_posts(PostRanking.Kind.TRENDING, tag_scope(self.tag.pk)), [self.hot, self.warm])
+        self.assertEqual(top_posts(PostRanking.Kind.DISCUSSED), [])
+        # all, category and tag scope for hot and warm, all and category for cold
+        self.assertEqual(written, 8)
+
+    def test_incremental_run_only_touches_changed_posts(self):
+        update_rankings(full=True)
+        Post.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        Watermark.objects.filter(name='rankings').update(value=timezone.now() - timedelta(minutes=1))
+        Comment.objects.create(post=self.cold, user=self.author, content='Fresh')
+        untouched = set(PostRanking.objects.exclude(post=self.cold).values_list('pk', flat=True))
+        with mock.patch('blog.rankings.compute_rankings', wraps=compute_rankings) as compute:
+            processed, _ = update_rankings()
+        self.assertEqual(processed, 1)
+        self.assertEqual(compute.call_args.args[0], [self.cold.pk])
+        self.assertEqual(top_posts(PostRanking.Kind.DISCUSSED), [self.cold])
+        self.assertEqual(set(PostRanking.objects.exclude(post=self.cold).values_list('pk', flat=True)), untouched)
+
+        # Daily stats are matched by date, so today's row is picked up again, but nothing else
+        with mock.patch('blog.rankings.compute_rankings', wraps=compute_rankings) as compute:
+            update_rankings()
+        self.assertEqual(compute.call_args.args[0], [self.cold.pk])
+
+    def test_category_change_moves_scope(self):
+        update_rankings(full=True)
+        self.hot.category = self.notes
+        self.hot.save()
+        update_rankings()
+        self.assertEqual(top_posts(PostRanking.Kind.TRENDING, category_scope(self.news.pk)), [self.warm, self.cold])
+        self.assertEqual(top_posts(PostRanking.Kind.TRENDING, category_scope(self.notes.pk)), [self.hot])
+
+    def test_unpublished_posts_drop_out(self):
+        update_rankings(full=True)
+        self.hot.status = Post.Status.DRAFT
+        self.hot.save()
+        # Hidden straight away, before the next run removes its rows
+        self.assertEqual(top_posts(PostRanking.Kind.TRENDING), [self.warm, self.cold])
+        update_rankings()
+        self.assertFalse(PostRanking.objects.filter(post=self.hot).exists())
+        self.assertEqual(top_posts(PostRanking.Kind.TRENDING, tag_scope(self.tag.pk)), [self.warm])
+
+    def test_top_posts_is_one_query(self):
+        update_rankings(full=True)
+        with self.assertNumQueries(1):
+            titles = [post.title for post in top_posts(PostRanking.Kind.TRENDING, tag_scope(self.tag.pk))]
+        self.assertEqual(titles, ['Hot', 'Warm'])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'blog-tests'}},
+    RATE_LIMITS={'comment': {'rate': '6/m', 'burst': 2}},
+)
+class CommentRateLimitTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user('reader', password='pass')
+        self.client.force_login(self.user)
+        author = User.objects.create_user('author', password='pass')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content='Body', author=author, status=Post.Status.PUBLISHED)
+            for i in range(3)
+        ]
+
+    def comment(self, post, **extra):
+        return self.client.post(reverse('blog:add_comment', args=[post.slug]), {'content': 'Hello'}, **extra)
+
+    def test_limit_spans_posts(self):
+        self.assertEqual(self.comment(self.posts[0]).status_code, 302)
+        self.assertEqual(self.comment(self.posts[1]).status_code, 302)
+        response = self.comment(self.posts[2])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_user_limit_follows_user_across_ips(self):
+        self.comment(self.posts[0], REMOTE_ADDR='10.0.0.1')
+        self.comment(self.posts[0], REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(self.comment(self.posts[0], REMOTE_ADDR='10.0.0.3').status_code, 429)
+
+    def test_no_session_write(self):
+        self.comment(self.posts[0])
+        self.assertFalse(any(key.startswith('last_comment_time') for key in self.client.session.keys()))
+
+
+@override_settings(COMMENT_MAX_DEPTH=2)
+class CommentThreadTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='pass')
+        author = User.objects.create_user('author', password='pass')
+        self.post = Post.objects.create(title='Post', content='Body', author=author, status=Post.Status.PUBLISHED)
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def comment(self, parent=None, **kwargs):
+        return Comment.objects.create(post=self.post, user=self.user, content='Hi', parent=parent, **kwargs)
+
+    def test_thread_order_in_one_query(self):
+        old = self.comment()
+        new = self.comment()
+        old_reply = self.comment(parent=old)
+        nested = self.comment(parent=old_reply)
+        later_reply = self.comment(parent=old)
+        with self.assertNumQueries(1):
+            comments = list(Comment.objects.threads(self.post))
+        # Newest thread first, replies depth first in the order written
+        self.assertEqual(comments, [new, old, old_reply, nested, later_reply])
+        self.assertEqual([c.depth for c in comments], [0, 0, 1, 2, 1])
+
+    def test_insert_without_path_is_rolled_back(self):
+        with mock.patch('blog.models.comment_path', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.comment()
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.comment().path, comment_path(Comment.objects.get().pk, ''))
+
+    def test_pages_of_threads(self):
+        roots = [self.comment() for _ in range(3)]
+        reply = self.comment(parent=roots[1])
+        self.assertEqual(list(Comment.objects.threads(self.post, page=1, per_page=2)), [roots[2], roots[1], reply])
+        self.assertEqual(list(Comment.objects.threads(self.post, page=2, per_page=2)), [roots[0]])
+        self.assertEqual(list(Comment.objects.threads(self.post, page=3, per_page=2)), [])
+
+    def test_depth_limit(self):
+        level1 = self.comment(parent=self.comment())
+        level2 = self.comment(parent=level1)
+        too_deep = self.comment(parent=level2)
+        self.assertEqual(too_deep.depth, 2)
+        self.assertEqual(too_deep.parent, level1)
+
+    def test_subtree_moderation_is_one_update(self):
+        root = self.comment()
+        reply = self.comment(parent=root)
+        nested = self.comment(parent=reply)
+        other = self.comment()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(reply.set_subtree_approved(False), 2)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "blog_comment"')]
+        self.assertEqual(len(updates), 1)
+        approved = dict(Comment.objects.values_list('pk', 'is_approved'))
+        self.assertEqual(approved, {root.pk: True, reply.pk: False, nested.pk: False, other.pk: True})
+
+    def test_reply_view(self):
+        root = self.comment()
+        self.client.force_login(self.user)
+        self.client.post(reverse('blog:add_comment', args=[self.post.slug]), {'content': 'Reply', 'parent': root.pk})
+        self.assertEqual(root.replies.get().content, 'Reply')
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual([c.pk for c in response.context['comments']], [root.pk, root.replies.get().pk])
+
+    def test_bulk_create_sets_paths(self):
+        root = self.comment()
+        created = Comment.objects.bulk_create([
+            Comment(post=self.post, user=self.user, content='New'),
+            Comment(post=self.post, user=self.user, content='Reply', parent=root),
+        ])
+        self.assertTrue(all(comment.path for comment in Comment.objects.all()))
+        self.assertEqual(set(Comment.objects.subtree(root)), {root, created[1]})
+        self.assertEqual(created[1].depth, 1)
+
+    def test_bulk_create_loads_parents_per_level(self):
+        level1 = self.comment(parent=self.comment())
+        level2 = self.comment(parent=level1)
+        replies = [Comment(post=self.post, user=self.user, content='Reply', parent_id=parent.pk)
+                   for parent in (level1, level2, level2)]
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.bulk_create(replies)
+        selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT "blog_comment"')]
+        # One for the parents, one more for the ancestors of replies past the depth limit
+        self.assertEqual(len(selects), 2)
+        self.assertEqual([reply.parent_id for reply in replies], [level1.pk, level1.pk, level1.pk])
+        self.assertEqual([reply.depth for reply in replies], [2, 2, 2])
+
+    def test_bulk_create_is_atomic(self):
+        root = self.comment()
+        with mock.patch.object(Comment.objects, 'bulk_update', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Comment.objects.bulk_create([Comment(post=self.post, user=self.user, content='New', parent=root)])
+        self.assertEqual(list(Comment.objects.all()), [root])
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pass')
+        self.admin.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self.author = User.objects.create_user('author', password='pass')
+        self.author.groups.add(Group.objects.get_or_create(name='Author')[0])
+        self.own = Post.objects.create(title='Own', content='Body', author=self.author)
+        self.other = Post.objects.create(title='Other', content='Body', author=self.admin)
+        Comment.objects.create(post=self.own, user=self.admin, content='=1+1, "quoted"')
+        Comment.objects.create(post=self.other, user=self.author, content='Elsewhere')
+
+    def export(self, name, fmt):
+        response = self.client.get(reverse(name, args=[fmt]))
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_comments_are_scoped_like_moderation(self):
+        self.client.force_login(self.author)
+        lines = self.export('blog:export_comments', 'csv').splitlines()
+        self.assertEqual(lines[0], 'id,post,user,parent,content,approved,created_at')
+        self.assertEqual(len(lines), 2)
+        self.assertIn(',own,admin,,"\'=1+1, ""quoted""",True,', lines[1])
+
+        self.client.force_login(self.admin)
+        rows = [json.loads(line) for line in self.export('blog:export_comments', 'jsonl').splitlines()]
+        self.assertEqual([row['content'] for row in rows], ['Elsewhere', '=1+1, "quoted"'])
+
+    def test_posts_are_scoped_like_dashboard(self):
+        self.client.force_login(self.author)
+        rows = [json.loads(line) for line in self.export('blog:export_posts', 'jsonl').splitlines()]
+        self.assertEqual([(row['title'], row['author']) for row in rows], [('Own', 'author')])
+        self.client.force_login(self.admin)
+        self.assertEqual(len(self.export('blog:export_posts', 'csv').splitlines()), 3)
+
+    def test_readers_and_unknown_formats_are_refused(self):
+        reader = User.objects.create_user('reader', password='pass')
+        self.client.force_login(reader)
+        self.assertRedirects(self.client.get(reverse('blog:export_comments', args=['csv'])), reverse('blog:home'))
+        self.assertEqual(self.client.get(reverse('blog:export_posts', args=['csv'])).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('blog:export_posts', args=['xml'])).status_code, 404)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'queue-tests'}})
+class CommentQueueTests(TestCase):
+    """Queued comments are acknowledged at once and inserted in batches."""
+
+    def setUp(self):
+        caches['default'].clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(COMMENT_QUEUE_ENABLED=True, COMMENT_QUEUE_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user('reader', password='pass')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.user, status=Post.Status.PUBLISHED)
+        self.client.force_login(self.user)
+
+    def submit(self, content, parent=None):
+        data = {'content': content, **({'parent': parent.pk} if parent else {})}
+        return self.client.post(reverse('blog:add_comment', args=[self.post.slug]), data)
+
+    def test_comments_are_queued_then_inserted_in_one_batch(self):
+        root = Comment.objects.create(post=self.post, user=self.user, content='Root')
+        self.submit('First')
+        self.submit('Reply', parent=root)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(comment_queue.pending(), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(comment_queue.drain(), (2, 0))
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "blog_comment"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(comment_queue.pending(), 0)
+        reply = Comment.objects.get(content='Reply')
+        self.assertEqual((reply.parent, reply.depth), (root, 1))
+        self.assertEqual(set(Comment.objects.subtree(root)), {root, reply})
+        self.assertEqual(PostStats.objects.get(post=self.post).comments, 3)
+
+    def test_comments_on_deleted_parents_are_dropped(self):
+        root = Comment.objects.create(post=self.post, user=self.user, content='Root')
+        self.submit('Orphan', parent=root)
+        self.submit('Kept')
+        root.delete()
+        out = StringIO()
+        with self.assertLogs('blog.comment_queue', 'WARNING'):
+            call_command('drain_comments', stdout=out)
+        self.assertIn('Inserted 1 comments in 1 batch (1 dropped)', out.getvalue())
+        self.assertEqual(list(Comment.objects.values_list('content', flat=True)), ['Kept'])
+
+    def test_failed_batch_stays_queued(self):
+        self.submit('First')
+        with mock.patch.object(Comment.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                comment_queue.drain()
+        self.assertEqual(comment_queue.pending(), 1)
+        self.assertEqual(comment_queue.drain(), (1, 0))
+
+    @override_settings(COMMENT_QUEUE_CLAIM_TIMEOUT=0)
+    def test_replayed_entries_are_not_inserted_twice(self):
+        self.submit('First')
+        # The drainer dies after its commit, before removing the claimed files
+        with mock.patch.object(Path, 'unlink', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                comment_queue.drain()
+        self.assertEqual(Comment.objects.count(), 1)
+        self.submit('Second')
+        time.sleep(0.01)
+        self.assertEqual(comment_queue.release_stale(), 1)
+        with self.assertLogs('blog.comment_queue', 'WARNING') as logs:
+            self.assertEqual(comment_queue.drain_all(), (1, 0, 1))
+        self.assertIn('Skipped 1 queued comments', logs.output[0])
+        self.assertEqual(sorted(Comment.objects.values_list('content', flat=True)), ['First', 'Second'])
+        self.assertEqual(comment_queue.pending(), 0)
+        self.assertFalse(any(comment_queue.directory.joinpath('processing').iterdir()))
+
+
+class CommentRollupTests(TestCase):
+    """PostStats comment counters follow comments through their lifecycle."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='pass')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.user, status=Post.Status.PUBLISHED)
+
+    def totals(self):
+        stats = PostStats.objects.get(post=self.post)
+        return stats.comments, stats.pending_comments
+
+    def test_counts_follow_comments(self):
+        root = Comment.objects.create(post=self.post, user=self.user, content='A')
+        reply = Comment.objects.create(post=self.post, user=self.user, content='B', parent=root)
+        pending = Comment.objects.create(post=self.post, user=self.user, content='C', is_approved=False)
+        self.assertEqual(self.totals(), (2, 1))
+        pending.is_approved = True
+        pending.save()
+        self.assertEqual(self.totals(), (3, 0))
+        root.set_subtree_approved(False)
+        self.assertEqual(self.totals(), (1, 2))
+        reply.delete()
+        self.assertEqual(self.totals(), (1, 1))
+        Comment.objects.bulk_create([Comment(post=self.post, user=self.user, content='D')])
+        self.assertEqual(self.totals(), (2, 1))
+
+    def test_deleting_post_removes_stats(self):
+        Comment.objects.create(post=self.post, user=self.user, content='A')
+        self.post.delete()
+        self.assertFalse(PostStats.objects.exists())
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'archive-tests'}},
+    COMMENT_THREADS_PER_PAGE=2,
+)
+class CommentArchiveTests(TestCase):
+    """Inactive threads move to the archive and stay readable on the post page."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user('reader', password='pass')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.user, status=Post.Status.PUBLISHED)
+        self.old = self.comment('Ancient root')
+        self.old_reply = self.comment('Ancient reply', parent=self.old)
+        revived = self.comment('Revived root')
+        self.age(self.old, self.old_reply, revived)
+        self.comment('Fresh reply', parent=revived)
+        self.comment('Fresh root')
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def comment(self, content, parent=None):
+        return Comment.objects.create(post=self.post, user=self.user, content=content, parent=parent)
+
+    def age(self, *comments):
+        long_ago = timezone.now() - timedelta(days=400)
+        Comment.objects.filter(pk__in=[c.pk for c in comments]).update(created_at=long_ago, updated_at=long_ago)
+
+    def test_only_inactive_threads_move(self):
+        stats = PostStats.objects.get(post=self.post).comments
+        self.assertEqual(archive_comments(days=365), (1, 2))
+        self.assertEqual(set(ArchivedComment.objects.values_list('pk', flat=True)), {self.old.pk, self.old_reply.pk})
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(PostStats.objects.get(post=self.post).comments, stats)
+        self.assertEqual(archive_comments(days=365), (0, 0))
+
+    def test_deletes_in_chunks(self):
+        with mock.patch('blog.archive.DELETE_CHUNK_SIZE', 1), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(archive_comments(days=365), (1, 2))
+        self.assertEqual(sum(query['sql'].startswith('DELETE FROM "blog_comment"') for query in queries.captured_queries), 2)
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_archived_threads_follow_live_ones_on_the_post_page(self):
+        archive_comments(days=365)
+        url = self.post.get_absolute_url()
+        response = self.client.get(url)
+        self.assertContains(response, 'Fresh root')
+        self.assertNotContains(response, 'Ancient root')
+        self.assertTrue(response.context['comments_has_next'])
+        self.assertEqual(response.context['comment_count'], 5)
+
+        self.client.force_login(self.user)
+        response = self.client.get(url, {'comments_page': 2})
+        self.assertEqual([c.content for c in response.context['comments']], ['Ancient root', 'Ancient reply'])
+        self.assertFalse(response.context['comments_has_next'])
+        self.assertNotContains(response, reverse('blog:delete_comment', args=[self.old.pk]))
+
+    def test_command_dry_run(self):
+        out = StringIO()
+        call_command('archive_comments', dry_run=True, stdout=out)
+        self.assertIn('1 thread would be archived', out.getvalue())
+        self.assertFalse(ArchivedComment.objects.exists())
+
+
+@override_settings(ROLLUP_LAG_SECONDS=0)
+class ContentRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('author', password='pass')
+        self.category = Category.objects.create(name='News')
+        self.post = Post.objects.create(
+            title='Post', content='Body', author=self.user, category=self.category, status=Post.Status.PUBLISHED,
+        )
+        self.post.tags.add(Tag.objects.create(name='django'), Tag.objects.create(name='python'))
+        Comment.objects.create(post=self.post, user=self.user, content='A')
+
+    def test_incremental_runs_do_not_double_count(self):
+        update_content_rollups()
+        update_content_rollups()
+        self.assertEqual(
+            list(CategoryDailyStats.objects.values_list('posts_published', 'comments')), [(1, 1)]
+        )
+        self.assertEqual(sorted(TagDailyStats.objects.values_list('tag__name', 'comments')), [('django', 1), ('python', 1)])
+
+        Comment.objects.create(post=self.post, user=self.user, content='B')
+        update_content_rollups()
+        self.assertEqual(AuthorDailyStats.objects.get().comments, 2)
+
+    def test_rebuild(self):
+        update_content_rollups()
+        AuthorDailyStats.objects.update(comments=99)
+        update_content_rollups(rebuild=True)
+        self.assertEqual(AuthorDailyStats.objects.get().comments, 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'taxonomy-tests'}})
+class TaxonomyAutocompleteTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user('author', password='pass')
+        self.client.force_login(self.user)
+
+    def search(self, kind, term):
+        response = self.client.get(reverse('blog:taxonomy_autocomplete', args=[kind]), {'term': term})
+        return [result['text'] for result in response.json()['results']]
+
+    def test_prefix_index_matches_word_starts(self):
+        index = PrefixIndex([(1, 'Machine Learning'), (2, 'Machinery'), (3, 'Deep Learning'), (4, 'Cooking')])
+        self.assertEqual([name for _, name in index.search('learn')], ['Deep Learning', 'Machine Learning'])
+        self.assertEqual([name for _, name in index.search('MACH')], ['Machine Learning', 'Machinery'])
+        self.assertEqual(index.search('earn'), [])
+        self.assertEqual(len(index.search('', limit=3)), 3)
+
+    def test_index_refreshes_after_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(name='Django')
+        self.assertEqual(self.search('tags', 'dj'), ['Django'])
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Flask'
+            tag.save()
+        self.assertEqual(self.search('tags', 'dj'), [])
+        self.assertEqual(self.search('tags', 'fl'), ['Flask'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Web Development')
+        self.assertEqual(self.search('categories', 'dev'), ['Web Development'])
+
+    def test_lookup_does_not_query_taxonomy_tables(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Django')
+        self.search('tags', 'd')
+        with CaptureQueriesContext(connection) as queries:
+            self.search('tags', 'd')
+        self.assertFalse(any('blog_tag' in query['sql'] for query in queries.captured_queries))
+
+    def test_unknown_kind(self):
+        response = self.client.get(reverse('blog:taxonomy_autocomplete', args=['users']))
+        self.assertEqual(response.status_code, 404)
+
+
+class IdentityMapViewTests(TestCase):
+    """Each row a CRUD or listing view needs is fetched once per request."""
+
+    def setUp(self):
+        author_group, _ = Group.objects.get_or_create(name='Author')
+        self.user = User.objects.create_user('author', password='pass')
+        self.user.groups.add(author_group)
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name='Python')
+        self.tag = Tag.objects.create(name='Django')
+        self.post = Post.objects.create(
+            title='Post', content='Body', author=self.user, category=self.category, status=Post.Status.PUBLISHED
+        )
+        self.post.tags.add(self.tag)
+
+    def count_queries(self, url, table, column='slug'):
+        """Return (status, lookups of `table` by `column`, group membership queries)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        sql = [query['sql'] for query in queries.captured_queries]
+        lookups = sum(f'FROM "{table}" WHERE "{table}"."{column}" =' in query for query in sql)
+        groups = sum('"auth_user_groups"' in query for query in sql)
+        return response.status_code, lookups, groups
+
+    def test_edit_and_delete_fetch_post_once(self):
+        for name in ('blog:post_edit', 'blog:post_delete'):
+            self.assertEqual(self.count_queries(reverse(name, args=[self.post.slug]), 'blog_post'), (200, 1, 1))
+
+    def test_taxonomy_pages_fetch_object_once(self):
+        self.assertEqual(self.count_queries(reverse('blog:category_posts', args=[self.category.slug]), 'blog_category')[:2], (200, 1))
+        self.assertEqual(self.count_queries(reverse('blog:tag_posts', args=[self.tag.slug]), 'blog_tag')[:2], (200, 1))
+
+    def test_other_authors_post_is_forbidden(self):
+        other = User.objects.create_user('other', password='pass')
+        post = Post.objects.create(title='Theirs', content='Body', author=other)
+        self.assertEqual(self.client.get(reverse('blog:post_edit', args=[post.slug])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('blog:post_edit', args=['missing'])).status_code, 404)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragment-tests'}})
+class FragmentCacheTests(TestCase):
+    """Nested fragments are reused across users and re-rendered when their versions change."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user('reader', password='pass')
+        self.tag = Tag.objects.create(name='Zygote')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.user, status=Post.Status.PUBLISHED)
+        self.post.tags.add(self.tag)
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def tag_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        return response, sum('"blog_tag"' in query['sql'] for query in queries.captured_queries)
+
+    def test_cards_and_sidebar_are_shared_with_authenticated_users(self):
+        self.client.get(reverse('blog:home'))
+        self.client.force_login(self.user)
+        response, tag_queries = self.tag_queries(self.client, reverse('blog:home'))
+        self.assertContains(response, 'Zygote')
+        self.assertEqual(tag_queries, 0)
+
+    def test_retagging_and_renaming_rerender_cards(self):
+        self.client.get(reverse('blog:home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tags.add(Tag.objects.create(name='Flask'))
+        self.assertContains(self.client.get(reverse('blog:home')), 'Flask')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Channels'
+            self.tag.save()
+        response = self.client.get(reverse('blog:home'))
+        self.assertContains(response, 'Channels')
+        self.assertNotContains(response, 'Zygote')
+
+    def test_anonymous_comment_list_is_cached_until_comments_change(self):
+        url = reverse('blog:post_detail', args=[self.post.slug])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(any('"blog_comment"."path"' in query['sql'] for query in queries.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(post=self.post, user=self.user, content='First!')
+        self.assertContains(self.client.get(url), 'First!')
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.set_subtree_approved(False)
+        self.assertNotContains(self.client.get(url), 'First!')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'warmup-tests'}})
+class WarmupTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        author = User.objects.create_user('author', password='pass')
+        self.post = Post.objects.create(title='Post', content='Body', author=author, status=Post.Status.PUBLISHED)
+        self.post.tags.add(Tag.objects.create(name='Zygote'))
+
+    def test_all_steps_succeed_without_counting_views(self):
+        results = run_warmup()
+        self.assertEqual([step.name for step in results], ['database', 'templates', 'urls', 'taxonomy', 'pages'])
+        self.assertEqual([step.errors for step in results], [[]] * 5)
+        self.assertEqual(results[-1].detail, '2 pages')
+        self.assertEqual(view_counter.pending(), {})
+
+    def test_pages_fill_fragment_cache(self):
+        run_warmup(skip=['templates', 'urls'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog:home'))
+        self.assertContains(response, 'Zygote')
+        self.assertFalse(any('"blog_tag"' in query['sql'] for query in queries.captured_queries))
+
+    def test_command_reports_timings(self):
+        out = StringIO()
+        call_command('warmup', skip=['pages'], stdout=out)
+        self.assertIn('templates', out.getvalue())
+        self.assertIn('Warm-up finished', out.getvalue())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'suggest-tests'}})
+class SearchSuggestionTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user('author', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = self.create_post('Machine Learning Basics')
+            self.create_post('Machine Learning Drafts', status=Post.Status.DRAFT)
+            Category.objects.create(name='Machine Vision')
+            Tag.objects.create(name='Machinery')
+
+    def create_post(self, title, status=Post.Status.PUBLISHED):
+        return Post.objects.create(title=title, content='Body', author=self.author, status=status)
+
+    def suggest(self, term):
+        response = self.client.get(reverse('blog:search_suggestions'), {'q': term})
+        return {group: [item['name'] for item in items] for group, items in response.json().items()}
+
+    def test_prefix_and_infix_matches(self):
+        self.assertEqual(self.suggest('mach'), {
+            'posts': ['Machine Learning Basics'], 'categories': ['Machine Vision'], 'tags': ['Machinery'],
+        })
+        self.assertEqual(self.suggest('earn')['posts'], ['Machine Learning Basics'])
+        self.assertEqual(self.suggest('xyz')['posts'], [])
+
+    def test_keystrokes_do_not_query_the_database(self):
+        self.suggest('m')
+        with self.assertNumQueries(0):
+            self.suggest('ma')
+            self.suggest('mac')
+
+    def test_index_catches_up_with_changed_posts_only(self):
+        self.suggest('m')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_post('Machine Translation')
+            self.post.title = 'Deep Learning Basics'
+            self.post.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggest('mach')['posts'], ['Machine Translation'])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('IN', queries.captured_queries[0]['sql'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertEqual(self.suggest('deep')['posts'], [])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cdn-tests'}},
+    EDGE_CACHE_POLICIES={'listing': {'s_maxage': 300, 'stale_while_revalidate': 60}, 'post': {'s_maxage': 3600}},
+)
+class EdgeCacheTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user('author', password='pass')
+        self.category = Category.objects.create(name='Zygote')
+        self.tag = Tag.objects.create(name='Cells')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.author,
+                                        category=self.category, status=Post.Status.PUBLISHED)
+        self.post.tags.add(self.tag)
+        purge_dispatcher.discard()
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def test_anonymous_pages_are_public_and_tagged(self):
+        response = self.client.get(reverse('blog:home'))
+        self.assertIn('s-maxage=300', response['Cache-Control'])
+        self.assertIn('stale-while-revalidate=60', response['Cache-Control'])
+        self.assertEqual(response['Surrogate-Key'].split(), ['posts', 'taxonomy', f'post-{self.post.pk}'])
+
+        response = self.client.get(reverse('blog:post_detail', args=[self.post.slug]))
+        self.assertIn('s-maxage=3600', response['Cache-Control'])
+        self.assertEqual(set(response['Surrogate-Key'].split()), {
+            f'post-{self.post.pk}', f'category-{self.category.pk}',
+            f'category-posts-{self.category.pk}', f'tag-{self.tag.pk}',
+        })
+
+        response = self.client.get(reverse('blog:tag_posts', args=[self.tag.slug]))
+        self.assertIn(f'tag-posts-{self.tag.pk}', response['Surrogate-Key'].split())
+
+    def test_personal_pages_are_private(self):
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('blog:home'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('Surrogate-Key'))
+        self.assertFalse(self.client.get(reverse('blog:dashboard')).has_header('Surrogate-Key'))
+
+    def test_changes_purge_their_keys_after_commit(self):
+        with LocalPurgeServer() as server, override_settings(
+            CDN_PURGE_BACKEND='blog.cdn.HTTPPurgeBackend', CDN_PURGE_OPTIONS={'url': server.url},
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.title = 'Renamed'
+                self.post.save()
+                Comment.objects.create(post=self.post, user=self.author, content='Hi')
+                self.assertEqual(server.purged, [])
+            self.assertEqual(server.requests, 1)
+            self.assertEqual(set(server.purged), {
+                f'post-{self.post.pk}', 'posts', f'category-posts-{self.category.pk}', f'tag-posts-{self.tag.pk}',
+            })
+
+            server.purged.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.tag.name = 'Nuclei'
+                self.tag.save()
+            self.assertEqual(set(server.purged), {f'tag-{self.tag.pk}', 'taxonomy'})
+
+    def test_flush_is_scheduled_once_per_transaction(self):
+        dispatcher = PurgeDispatcher()
+        with mock.patch('blog.cdn.get_purge_backend') as backend:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    dispatcher.purge('a')
+                    raise RuntimeError
+                dispatcher.purge('b')
+                dispatcher.purge('c', 'b')
+        self.assertEqual(callbacks, [dispatcher.flush])
+        # Keys of the rolled-back block go out with the next commit
+        backend.return_value.purge.assert_called_once_with(['a', 'b', 'c'])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'page-tests'}},
+    PAGE_CACHE_ENABLED=True,
+)
+class SegmentPageCacheTests(TestCase):
+    """Pages are cached per role segment with the per-user bits filled in per request."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user('author', password='pass')
+        self.alice = User.objects.create_user('alice', password='pass')
+        self.bob = User.objects.create_user('bob', password='pass')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.author, status=Post.Status.PUBLISHED)
+        self.comment = Comment.objects.create(post=self.post, user=self.bob, content='Zygote')
+        self.url = self.post.get_absolute_url()
+        self.delete_url = reverse('blog:delete_comment', args=[self.comment.pk])
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def get_as(self, user, client=None):
+        client = client or Client()
+        client.force_login(user)
+        return client, client.get(self.url)
+
+    def test_readers_share_a_page_with_their_own_bits(self):
+        self.get_as(self.alice)
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.bob)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.url)
+        self.assertFalse(any('"blog_' in query['sql'] for query in queries.captured_queries))
+        self.assertContains(response, '<span>bob</span>')
+        self.assertNotContains(response, 'alice')
+        self.assertContains(response, self.delete_url)
+        self.assertEqual(view_counter.pending()[(self.post.pk, timezone.localdate())], 2)
+
+        token = response.content.decode().split('name="csrfmiddlewaretoken" value="')[1].split('"')[0]
+        response = client.post(reverse('blog:add_comment', args=[self.post.slug]),
+                               {'content': 'Reply', 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Comment.objects.filter(content='Reply').exists())
+
+        _, response = self.get_as(self.alice)
+        self.assertContains(response, '<span>alice</span>')
+        self.assertNotContains(response, self.delete_url)
+
+    def test_author_always_gets_a_fresh_page(self):
+        self.get_as(self.alice)
+        _, response = self.get_as(self.author)
+        self.assertContains(response, reverse('blog:post_edit', args=[self.post.slug]))
+        _, response = self.get_as(self.alice)
+        self.assertNotContains(response, reverse('blog:post_edit', args=[self.post.slug]))
+
+    def test_new_comments_expire_the_page(self):
+        self.get_as(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, user=self.author, content='Fresh thoughts')
+        _, response = self.get_as(self.bob)
+        self.assertContains(response, 'Fresh thoughts')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'static-export-tests'}})
+class StaticExportTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        author = User.objects.create_user('author', password='pass')
+        self.news = Category.objects.create(name='News')
+        self.notes = Category.objects.create(name='Notes')
+        self.tag = Tag.objects.create(name='Zygote')
+        self.posts = [
+            Post.objects.create(
+                title=f'Post {i}', content='Body', author=author, status=Post.Status.PUBLISHED,
+                category=self.news if i < 2 else self.notes,
+            )
+            for i in range(10)
+        ]
+        self.posts[0].tags.add(self.tag)
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def export(self, **kwargs):
+        # Pool threads can't see the test transaction, so render inline
+        return export_site(output_dir=self.root.name, workers=1, **kwargs)
+
+    def page(self, path):
+        return Path(self.root.name, path.strip('/'), 'index.html')
+
+    def test_first_export_writes_every_page(self):
+        result = self.export()
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.rendered, 1 + 10 + 2 + 1)
+        for path in [reverse('blog:home'), reverse('blog:category_posts', args=[self.news.slug]),
+                     reverse('blog:tag_posts', args=[self.tag.slug])] + [post.get_absolute_url() for post in self.posts]:
+            self.assertTrue(self.page(path).exists(), path)
+        manifest = json.loads(self.page('/').with_name(MANIFEST_NAME).read_text())
+        self.assertEqual(len(manifest['posts']), 10)
+        self.assertEqual(view_counter.pending(), {})
+
+    def test_listing_pages_are_linked_as_files(self):
+        self.export()
+        home = self.page(reverse('blog:home')).read_text()
+        self.assertIn(f'href="{reverse("blog:home")}page/2/', home)
+        self.assertNotIn('href="?page=', home)
+        self.assertTrue(self.page(f'{reverse("blog:home")}page/2/').exists())
+
+    def test_unchanged_site_renders_nothing(self):
+        self.export()
+        result = self.export()
+        self.assertEqual((result.rendered, result.removed), (0, 0))
+
+    def test_changed_post_renders_its_listings_only(self):
+        self.export()
+        post = self.posts[0]
+        post.title = 'Edited'
+        post.save()
+        result = self.export()
+        self.assertEqual(result.rendered, 4)  # post, home, its category and its tag
+        self.assertIn('Edited', self.page(reverse('blog:category_posts', args=[self.news.slug])).read_text())
+        self.assertIn('Edited', self.page(reverse('blog:tag_posts', args=[self.tag.slug])).read_text())
+        self.assertNotIn('Edited', self.page(reverse('blog:category_posts', args=[self.notes.slug])).read_text())
+
+    def test_unpublished_post_is_removed(self):
+        self.export()
+        post = self.posts[5]
+        path = post.get_absolute_url()
+        post.status = Post.Status.DRAFT
+        post.save()
+        result = self.export()
+        self.assertEqual(result.removed, 1)
+        self.assertFalse(self.page(path).exists())
+        self.assertNotIn(f'href="{path}"', self.page(reverse('blog:home')).read_text())
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_repeated_export_with_page_cache(self):
+        self.assertEqual(self.export().errors, [])
+        # Fill the page cache as a visitor would
+        self.client.get(reverse('blog:home'))
+        self.client.get(self.posts[0].get_absolute_url())
+        result = self.export(full=True)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.rendered, 14)
+        self.assertNotIn('perUserCsrfTokenPlaceholder', self.page(reverse('blog:home')).read_text())
+
+    def test_command_reports_and_full_rebuilds(self):
+        self.export()
+        out = StringIO()
+        call_command('export_static', output=self.root.name, workers=1, full=True, stdout=out)
+        self.assertIn('Rendered 14 URLs', out.getvalue())
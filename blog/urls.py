@@ -16,13 +16,22 @@ urlpatterns = [
     
     # Author dashboard and CRUD (must come before detail view to avoid conflicts)
     path('dashboard/', views.AuthorDashboardView.as_view(), name='dashboard'),
+    path('dashboard/export.<str:fmt>', views.PostExportView.as_view(), name='export_posts'),
     path('post/create/', views.CreatePostView.as_view(), name='post_create'),
     
     # Comments (must come before detail view)
     path('post/<slug:slug>/comment/', views.add_comment, name='add_comment'),
     path('comment/<int:comment_id>/approve/', views.approve_comment, name='approve_comment'),
+    path('comment/<int:comment_id>/hide/', views.hide_comment, name='hide_comment'),
     path('comment/<int:comment_id>/delete/', views.delete_comment, name='delete_comment'),
     path('comments/moderation/', views.comment_moderation, name='comment_moderation'),
+    path('comments/moderation/export.<str:fmt>', views.export_comments, name='export_comments'),
+    
+    # Tag and category autocomplete for post forms
+    path('autocomplete/<str:kind>/', views.taxonomy_autocomplete, name='taxonomy_autocomplete'),
+
+    # Search-as-you-type suggestions
+    path('search/suggest/', views.search_suggestions, name='search_suggestions'),
     
     # Post edit and delete (must come before detail view)
     path('post/<slug:slug>/edit/', views.UpdatePostView.as_view(), name='post_edit'),
@@ -1,21 +1,41 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Q
-from datetime import datetime, timedelta
-from .models import Post, Category, Tag, Comment
+from django.conf import settings
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject, cached_property
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from datetime import timedelta
+from .models import Post, Category, Tag, Comment, PostStats, PostRanking
 from .forms import PostForm, CommentForm
+from .archive import thread_page, thread_root_count
+from .db import retry_on_locked
+from .exports import export_response
+from .page_cache import SegmentCacheMixin
+from . import cdn
+from .comment_queue import comment_queue, queue_enabled
+from .counters import view_counter
+from .fragments import comments_version_name, get_versions, list_version
+from .rankings import SCOPE_ALL, category_scope, tag_scope, top_posts
+from .suggestions import suggestion_index
+from .taxonomy import TAXONOMY_MODELS, taxonomy_index
+from accounts.identity import identity_map
+from accounts.ratelimit import ratelimit
 from accounts.permissions import (
-    can_create_post, can_edit_post, can_delete_post,
+    can_create_post, can_edit_post, can_delete_post, is_admin,
     require_author_or_admin, require_post_owner_or_admin
 )
 
 
-class PostListView(ListView):
+class PostListView(SegmentCacheMixin, cdn.EdgeCacheMixin, ListView):
     """Display paginated list of published posts."""
+    replica_reads = True  # See blog.routers.ReadReplicaRouter
+    cache_policy = 'listing'  # See blog.cdn
     model = Post
     template_name = 'blog/home.html'
     context_object_name = 'posts'
@@ -38,14 +58,26 @@ class PostListView(ListView):
     def get_context_data(self, **kwargs):
         """Add extra context."""
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all().order_by('name')
+        context['categories'] = Category.objects.annotate(post_count=Count('posts')).order_by('name')
         context['tags'] = Tag.objects.all().order_by('name')
         context['search_query'] = self.request.GET.get('q', '')
+        # Fragment cache versions (see blog.fragments); the card grid's key
+        # covers every post on the page, so a hit skips all per-card queries
+        context['fragment_versions'] = get_versions('taxonomy', 'posts')
+        context['posts_version'] = list_version(context['posts'])
+        context['trending_posts'] = top_posts(PostRanking.Kind.TRENDING, SCOPE_ALL)
+        context['discussed_posts'] = top_posts(PostRanking.Kind.DISCUSSED, SCOPE_ALL)
         return context
 
+    def get_surrogate_keys(self, context):
+        return ['posts', 'taxonomy', *cdn.post_keys(context['posts']),
+                *cdn.post_keys(context['trending_posts']), *cdn.post_keys(context['discussed_posts'])]
 
-class PostDetailView(DetailView):
+
+class PostDetailView(SegmentCacheMixin, cdn.EdgeCacheMixin, DetailView):
     """Display a single post with comments."""
+    replica_reads = True  # See blog.routers.ReadReplicaRouter
+    cache_policy = 'post'  # See blog.cdn
     model = Post
     template_name = 'blog/post_detail.html'
     context_object_name = 'post'
@@ -60,27 +92,68 @@ class PostDetailView(DetailView):
             return Post.objects.filter(
                 Q(status=Post.Status.PUBLISHED) |
                 Q(author=user, status=Post.Status.DRAFT)
-            )
+            ).prefetch_related('tags')
         # Anonymous users only see published posts
-        return Post.published.all()
+        return Post.published.prefetch_related('tags')
+
+    def get(self, request, *args, **kwargs):
+        """Render the post and count the view (buffered, see blog.counters)."""
+        response = super().get(request, *args, **kwargs)
+        if self.object.is_published and self.object.author_id != request.user.id:
+            view_counter.increment(self.object.pk)
+        return response
+
+    def page_cache_hit(self, entry):
+        """Count views served from the page cache (only published posts, never to their author)."""
+        view_counter.increment(entry['object_id'])
+
+    def get_page_versions(self):
+        return [*self.page_versions, comments_version_name(self.object.pk)]
+
+    def get_page_owner_id(self):
+        return self.object.author_id
+
+    def page_storable(self):
+        return self.object.is_published
+
+    @staticmethod
+    def get_comment_thread(post, page, per_page, include_hidden):
+        """One page of threads (archived ones included), skipping replies whose parent is hidden from this user."""
+        shown = set()
+        comments = []
+        for comment in thread_page(post, page, per_page, include_hidden):
+            if comment.parent_id is None or comment.parent_id in shown:
+                shown.add(comment.pk)
+                comments.append(comment)
+        return comments
 
     def get_context_data(self, **kwargs):
         """Add comments and related posts."""
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
+        post = self.object
         user = self.request.user
         
-        # Get approved comments for public, or all comments for post author/admin
-        if user.is_authenticated and (user.is_superuser or 
-                                      user.groups.filter(name='Admin').exists() or 
-                                      post.author == user):
-            # Show all comments (approved and pending) to post author/admin
-            context['comments'] = post.comments.all()
-        else:
-            # Show only approved comments to public
-            context['comments'] = post.comments.filter(is_approved=True)
+        # Show all comments (approved and pending) to post author/admin,
+        # only approved comments to the public
+        include_hidden = user.is_authenticated and (is_admin(user) or post.author_id == user.pk)
         
-        context['comment_count'] = post.comments.filter(is_approved=True).count()
+        # One page of threads, replies included, in depth-first order
+        per_page = getattr(settings, 'COMMENT_THREADS_PER_PAGE', 20)
+        try:
+            page = max(1, int(self.request.GET.get('comments_page', 1)))
+        except ValueError:
+            page = 1
+        # Evaluated lazily, so a cached comment list fragment costs no queries
+        context['comments'] = SimpleLazyObject(lambda: self.get_comment_thread(post, page, per_page, include_hidden))
+        context['comments_page'] = page
+        context['comments_has_next'] = SimpleLazyObject(
+            lambda: thread_root_count(post, include_hidden) > page * per_page
+        )
+        context['comments_version'] = get_versions(comments_version_name(post.pk))[comments_version_name(post.pk)]
+        
+        context['comment_count'] = sum(
+            comments.filter(is_approved=True).count() for comments in (post.comments, post.archived_comments)
+        )
         context['comment_form'] = CommentForm()
         
         # Get related posts (same category, excluding current post)
@@ -93,44 +166,80 @@ class PostDetailView(DetailView):
         
         return context
 
+    def get_surrogate_keys(self, context):
+        post = self.object
+        keys = [cdn.post_key(post.pk), *cdn.post_keys(context['related_posts'])]
+        if post.category_id:
+            keys += [cdn.category_key(post.category_id), cdn.category_posts_key(post.category_id)]
+        else:
+            keys.append('posts')
+        keys += [cdn.tag_key(tag.pk) for tag in post.tags.all()]
+        return keys
+
 
-class CategoryPostListView(ListView):
+class CategoryPostListView(SegmentCacheMixin, cdn.EdgeCacheMixin, ListView):
     """Display posts filtered by category."""
+    replica_reads = True  # See blog.routers.ReadReplicaRouter
+    cache_policy = 'listing'  # See blog.cdn
     model = Post
     template_name = 'blog/category_posts.html'
     context_object_name = 'posts'
     paginate_by = 9
 
+    @property
+    def category(self):
+        return identity_map().get_or_404(Category, slug=self.kwargs['slug'])
+
     def get_queryset(self):
         """Filter posts by category slug."""
-        category = get_object_or_404(Category, slug=self.kwargs['slug'])
-        return Post.published.filter(category=category)
+        return Post.published.filter(category=self.category)
 
     def get_context_data(self, **kwargs):
         """Add category to context."""
         context = super().get_context_data(**kwargs)
-        context['category'] = get_object_or_404(Category, slug=self.kwargs['slug'])
+        context['category'] = self.category
+        scope = category_scope(self.category.pk)
+        context['trending_posts'] = top_posts(PostRanking.Kind.TRENDING, scope)
+        context['discussed_posts'] = top_posts(PostRanking.Kind.DISCUSSED, scope)
         return context
 
+    def get_surrogate_keys(self, context):
+        pk = self.category.pk
+        return [cdn.category_key(pk), cdn.category_posts_key(pk), *cdn.post_keys(context['posts']),
+                *cdn.post_keys(context['trending_posts']), *cdn.post_keys(context['discussed_posts'])]
 
-class TagPostListView(ListView):
+
+class TagPostListView(SegmentCacheMixin, cdn.EdgeCacheMixin, ListView):
     """Display posts filtered by tag."""
+    replica_reads = True  # See blog.routers.ReadReplicaRouter
+    cache_policy = 'listing'  # See blog.cdn
     model = Post
     template_name = 'blog/tag_posts.html'
     context_object_name = 'posts'
     paginate_by = 9
 
+    @property
+    def tag(self):
+        return identity_map().get_or_404(Tag, slug=self.kwargs['slug'])
+
     def get_queryset(self):
         """Filter posts by tag slug."""
-        tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
-        return Post.published.filter(tags=tag)
+        return Post.published.filter(tags=self.tag)
 
     def get_context_data(self, **kwargs):
         """Add tag to context."""
         context = super().get_context_data(**kwargs)
-        context['tag'] = get_object_or_404(Tag, slug=self.kwargs['slug'])
+        context['tag'] = self.tag
+        scope = tag_scope(self.tag.pk)
+        context['trending_posts'] = top_posts(PostRanking.Kind.TRENDING, scope)
+        context['discussed_posts'] = top_posts(PostRanking.Kind.DISCUSSED, scope)
         return context
 
+    def get_surrogate_keys(self, context):
+        pk = self.tag.pk
+        return [cdn.tag_key(pk), cdn.tag_posts_key(pk), *cdn.post_keys(context['posts']),
+                *cdn.post_keys(context['trending_posts']), *cdn.post_keys(context['discussed_posts'])]
+
 
 class AuthorDashboardView(ListView):
     """Dashboard for authors to manage their posts."""
@@ -144,24 +253,70 @@ class AuthorDashboardView(ListView):
         require_author_or_admin(request.user)
         return super().dispatch(request, *args, **kwargs)
 
-    def get_queryset(self):
+    @cached_property
+    def is_admin(self):
+        return is_admin(self.request.user)
+
+    def get_base_queryset(self):
         """Return user's posts, or all posts if admin."""
-        user = self.request.user
-        if user.is_superuser or user.groups.filter(name='Admin').exists():
-            return Post.objects.all().order_by('-created_at')
+        if self.is_admin:
+            return Post.objects.all()
         # Authors see only their own posts
-        return Post.objects.filter(author=user).order_by('-created_at')
+        return Post.objects.filter(author=self.request.user)
+
+    def get_queryset(self):
+        """Return the visible posts, newest first."""
+        return self.get_base_queryset().select_related('category').order_by('-created_at')
 
     def get_context_data(self, **kwargs):
-        """Add statistics."""
+        """Add statistics from one aggregate over posts and the PostStats rollup."""
         context = super().get_context_data(**kwargs)
-        queryset = self.get_queryset()
-        context['total_posts'] = queryset.count()
-        context['published_posts'] = queryset.filter(status=Post.Status.PUBLISHED).count()
-        context['draft_posts'] = queryset.filter(status=Post.Status.DRAFT).count()
+        context.update(self.get_base_queryset().aggregate(
+            total_posts=Count('pk'),
+            published_posts=Count('pk', filter=Q(status=Post.Status.PUBLISHED)),
+            draft_posts=Count('pk', filter=Q(status=Post.Status.DRAFT)),
+        ))
+
+        stats = PostStats.objects.all() if self.is_admin else PostStats.objects.filter(post__author=self.request.user)
+        since = timezone.localdate() - timedelta(days=getattr(settings, 'DASHBOARD_ACTIVITY_DAYS', 7) - 1)
+        context.update(stats.aggregate(
+            total_views=Coalesce(Sum('views'), 0),
+            total_comments=Coalesce(Sum('comments'), 0),
+            pending_comments=Coalesce(Sum('pending_comments'), 0),
+        ))
+        context['recent_activity'] = stats.filter(date__gte=since).values('date').annotate(
+            views=Sum('views'), comments=Sum('comments'), pending=Sum('pending_comments'),
+        ).order_by('-date')
+
+        # Per-post totals for the current page only
+        posts = context['posts']
+        totals = {
+            row['post']: row
+            for row in PostStats.objects.filter(post__in=[post.pk for post in posts]).values('post').annotate(
+                views=Sum('views'), comments=Sum('comments'), pending=Sum('pending_comments'),
+            )
+        }
+        for post in posts:
+            row = totals.get(post.pk, {})
+            post.total_views = row.get('views', 0)
+            post.comment_count = row.get('comments', 0)
+            post.pending_count = row.get('pending', 0)
         return context
 
 
+class PostExportView(AuthorDashboardView):
+    """Stream the dashboard's posts (all of them, not one page) as CSV or JSON Lines."""
+    columns = [
+        ('id', 'pk'), ('title', 'title'), ('slug', 'slug'), ('author', 'author__username'),
+        ('category', 'category__name'), ('status', 'status'), ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'), ('published_at', 'published_at'),
+    ]
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_base_queryset().order_by('-created_at')
+        return export_response(queryset, self.columns, kwargs['fmt'], 'posts')
+
+
 class CreatePostView(CreateView):
     """Create a new post."""
     model = Post
@@ -184,7 +339,20 @@ class CreatePostView(CreateView):
         return reverse_lazy('blog:dashboard')
 
 
-class UpdatePostView(UpdateView):
+class IdentityMapObjectMixin:
+    """
+    Fetch the view's object through the request's identity map, so the
+    permission check in dispatch() and the generic view share one query.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        lookup = {self.slug_field: self.kwargs[self.slug_url_kwarg]}
+        return identity_map().get_or_404(self.model, **lookup)
+
+
+class UpdatePostView(IdentityMapObjectMixin, UpdateView):
     """Update an existing post."""
     model = Post
     form_class = PostForm
@@ -208,7 +376,7 @@ class UpdatePostView(UpdateView):
         return reverse_lazy('blog:post_detail', kwargs={'slug': self.object.slug})
 
 
-class DeletePostView(DeleteView):
+class DeletePostView(IdentityMapObjectMixin, DeleteView):
     """Delete a post."""
     model = Post
     template_name = 'blog/post_confirm_delete.html'
@@ -232,26 +400,20 @@ class DeletePostView(DeleteView):
 
 
 @login_required
+@ratelimit('comment')
 def add_comment(request, slug):
-    """Add a comment to a post with spam prevention."""
+    """Add a comment to a post (rate limited per user and IP, see RATE_LIMITS)."""
     post = get_object_or_404(Post, slug=slug)
     
-    # Spam prevention: Check if user commented recently (within last 30 seconds)
-    session_key = f'last_comment_time_{post.id}'
-    last_comment_time = request.session.get(session_key)
-    
-    if last_comment_time:
-        last_time = datetime.fromisoformat(last_comment_time)
-        if datetime.now() - last_time < timedelta(seconds=30):
-            messages.error(request, 'Please wait a moment before posting another comment.')
-            return redirect('blog:post_detail', slug=slug)
-    
     if request.method == 'POST':
         form = CommentForm(request.POST)
         if form.is_valid():
             comment = form.save(commit=False)
             comment.post = post
             comment.user = request.user
+            parent_id = request.POST.get('parent')
+            if parent_id:
+                comment.parent = get_object_or_404(Comment, pk=parent_id, post=post, is_approved=True)
             
             # Auto-approve comments from admins/authors, others need moderation
             if request.user.is_superuser or request.user.groups.filter(name__in=['Admin', 'Author']).exists():
@@ -261,10 +423,14 @@ def add_comment(request, slug):
                 # Uncomment below to require moderation for non-admin/author users:
                 # comment.is_approved = False
             
-            comment.save()
-            
-            # Update session with comment time
-            request.session[session_key] = datetime.now().isoformat()
+            if queue_enabled():
+                # Inserted in batches by python manage.py drain_comments, see blog.comment_queue
+                comment_queue.enqueue(post.pk, request.user.pk, comment.content,
+                                      comment.parent_id, comment.is_approved)
+                messages.success(request, 'Your comment has been received and will appear shortly.')
+                return redirect('blog:post_detail', slug=slug)
+
+            retry_on_locked(comment.save)
             
             messages.success(request, 'Your comment has been posted!')
             return redirect('blog:post_detail', slug=slug)
@@ -287,12 +453,30 @@ def approve_comment(request, comment_id):
         messages.error(request, 'You do not have permission to moderate comments.')
         return redirect('blog:post_detail', slug=post.slug)
     
-    comment.is_approved = True
-    comment.save()
+    # Replies held back with their parent are released with it
+    retry_on_locked(comment.set_subtree_approved, True)
     messages.success(request, 'Comment approved successfully!')
     return redirect('blog:post_detail', slug=post.slug)
 
 
+@login_required
+def hide_comment(request, comment_id):
+    """Hide a comment and all replies to it (admin/author only)."""
+    comment = get_object_or_404(Comment, id=comment_id)
+    post = comment.post
+    
+    # Check permissions: Admin or post author can moderate
+    if not (request.user.is_superuser or 
+            request.user.groups.filter(name='Admin').exists() or
+            (request.user.groups.filter(name='Author').exists() and post.author == request.user)):
+        messages.error(request, 'You do not have permission to moderate comments.')
+        return redirect('blog:post_detail', slug=post.slug)
+    
+    retry_on_locked(comment.set_subtree_approved, False)
+    messages.success(request, 'Comment and its replies hidden.')
+    return redirect('blog:post_detail', slug=post.slug)
+
+
 @login_required
 def delete_comment(request, comment_id):
     """Delete a comment (admin/author/comment owner)."""
@@ -307,27 +491,32 @@ def delete_comment(request, comment_id):
         messages.error(request, 'You do not have permission to delete this comment.')
         return redirect('blog:post_detail', slug=post.slug)
     
-    comment.delete()
+    retry_on_locked(comment.delete)
     messages.success(request, 'Comment deleted successfully!')
     return redirect('blog:post_detail', slug=post.slug)
 
 
+def moderated_comments(user):
+    """Comments the user moderates, newest first, or None if they can't moderate."""
+    if not (user.is_superuser or 
+            user.groups.filter(name__in=['Admin', 'Author']).exists()):
+        return None
+    
+    # Get comments that need moderation or all comments
+    if user.is_superuser or user.groups.filter(name='Admin').exists():
+        return Comment.objects.all().order_by('-created_at')
+    # Authors see comments on their own posts
+    return Comment.objects.filter(post__author=user).order_by('-created_at')
+
+
 @login_required
 def comment_moderation(request):
     """View all comments for moderation (admin/author)."""
-    # Check if user can moderate
-    if not (request.user.is_superuser or 
-            request.user.groups.filter(name__in=['Admin', 'Author']).exists()):
+    comments = moderated_comments(request.user)
+    if comments is None:
         messages.error(request, 'You do not have permission to access this page.')
         return redirect('blog:home')
     
-    # Get comments that need moderation or all comments
-    if request.user.is_superuser or request.user.groups.filter(name='Admin').exists():
-        comments = Comment.objects.all().order_by('-created_at')
-    else:
-        # Authors see comments on their own posts
-        comments = Comment.objects.filter(post__author=request.user).order_by('-created_at')
-    
     # Pagination
     paginator = Paginator(comments, 20)
     page_number = request.GET.get('page')
@@ -337,3 +526,40 @@ def comment_moderation(request):
         'comments': page_obj,
         'page_obj': page_obj,
     })
+
+
+COMMENT_EXPORT_COLUMNS = [
+    ('id', 'pk'), ('post', 'post__slug'), ('user', 'user__username'), ('parent', 'parent_id'),
+    ('content', 'content'), ('approved', 'is_approved'), ('created_at', 'created_at'),
+]
+
+
+@login_required
+def export_comments(request, fmt):
+    """Stream every comment the user moderates as CSV or JSON Lines."""
+    comments = moderated_comments(request.user)
+    if comments is None:
+        messages.error(request, 'You do not have permission to access this page.')
+        return redirect('blog:home')
+    return export_response(comments, COMMENT_EXPORT_COLUMNS, fmt, 'comments')
+
+
+@login_required
+def taxonomy_autocomplete(request, kind):
+    """Return tags or categories matching ?term= as Select2 JSON, from the in-memory index."""
+    if kind not in TAXONOMY_MODELS:
+        raise Http404
+    term = request.GET.get('term', '')
+    results = taxonomy_index.search(kind, term, limit=20)
+    return JsonResponse({
+        'results': [{'id': pk, 'text': name} for pk, name in results],
+        'pagination': {'more': False},
+    })
+
+
+def search_suggestions(request):
+    """Return post titles, categories and tags matching ?q= as you type, from in-memory indexes."""
+    term = request.GET.get('q', '').strip()
+    if not term:
+        return JsonResponse({'posts': [], 'categories': [], 'tags': []})
+    return JsonResponse(suggestion_index.suggest(term))
@@ -0,0 +1,200 @@
+"""
+Process warm-up: pay the first-request costs before serving traffic.
+
+Each step is timed so startup regressions show up in the `warmup` command
+output and, with WARMUP_ON_BOOT, in the log of every worker that starts:
+
+    database    open the connection (runs the SQLite PRAGMAs)
+    templates   compile every template under the project template dirs into
+                the cached loader
+    urls        build the URL resolver, then reverse and resolve every named
+                URL
+    taxonomy    build the tag/category autocomplete index
+    pages       render the home page and the newest/trending post pages
+                anonymously, filling the fragment cache
+
+The template, URL and taxonomy steps only help the process they run in, so
+they matter for the on-boot hook in advanced_blog/wsgi.py. The pages step
+fills the shared fragment cache and helps every worker when that cache is
+shared (Redis/Memcached).
+"""
+import logging
+import os
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import RequestFactory
+from django.urls import URLResolver, get_resolver, resolve, reverse
+from django.urls.converters import IntConverter
+from django.urls.resolvers import RegexPattern
+
+
+logger = logging.getLogger(__name__)
+
+WarmupStep = namedtuple('WarmupStep', ['name', 'seconds', 'detail', 'errors'])
+
+
+def warm_database():
+    connection.ensure_connection()
+    return connection.vendor, []
+
+
+def warm_templates():
+    """Compile every project template; returns the count and any that fail to compile."""
+    compiled, errors, cached = 0, [], True
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        cached = cached and any(isinstance(loader, CachedLoader) for loader in engine.template_loaders)
+        count, failed = compile_templates(engine)
+        compiled += count
+        errors.extend(failed)
+    return f'{compiled} templates' + ('' if cached else ' (cached loader not enabled)'), errors
+
+
+def compile_templates(engine):
+    compiled, errors = 0, []
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                if not filename.endswith(('.html', '.txt')):
+                    continue
+                name = os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+                try:
+                    engine.get_template(name)
+                    compiled += 1
+                except Exception as e:
+                    errors.append(f'{name}: {e}')
+    return compiled, errors
+
+
+def named_urls(resolver=None, namespace=''):
+    """Yield (qualified name, pattern) for every named URL pattern."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            child = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from named_urls(pattern, child)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}', pattern.pattern
+
+
+def sample_kwargs(converters):
+    return {
+        param: 1 if isinstance(converter, IntConverter) else 'warmup'
+        for param, converter in converters.items()
+    }
+
+
+def warm_urls():
+    """
+    Reverse and resolve every named URL with placeholder arguments. Regex
+    patterns with groups (admin's app_list) can't be given a placeholder and
+    are only loaded into the resolver.
+    """
+    count, skipped, errors = 0, 0, []
+    for name, pattern in named_urls():
+        if isinstance(pattern, RegexPattern) and pattern.regex.groups:
+            skipped += 1
+            continue
+        try:
+            resolve(reverse(name, kwargs=sample_kwargs(pattern.converters) or None))
+            count += 1
+        except Exception as e:
+            errors.append(f'{name}: {e}')
+    return f'{count} named URLs ({skipped} regex patterns skipped)', errors
+
+
+def warm_taxonomy():
+    from .taxonomy import TAXONOMY_MODELS, taxonomy_index
+    for kind in TAXONOMY_MODELS:
+        taxonomy_index.search(kind, '')
+    return f'{len(TAXONOMY_MODELS)} indexes', []
+
+
+def warmup_paths():
+    """Home page plus the newest and currently trending published posts."""
+    from .models import Post, PostRanking
+    from .rankings import top_posts
+    posts = list(Post.published.order_by('-published_at', '-created_at')[:getattr(settings, 'WARMUP_POSTS', 10)])
+    posts.extend(top_posts(PostRanking.Kind.TRENDING))
+    paths = [reverse('blog:home')]
+    for post in posts:
+        path = post.get_absolute_url()
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def anonymous_request_factory():
+    return RequestFactory(SERVER_NAME=next(
+        (host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost'
+    ))
+
+
+def render_anonymously(factory, path, data=None, bypass_page_cache=False):
+    """
+    Call the view for `path` (without middleware) as an anonymous visitor and
+    return the rendered response. With bypass_page_cache the view neither reads
+    nor fills the page cache (see blog.page_cache), so the response is always a
+    freshly rendered TemplateResponse.
+    """
+    request = factory.get(path, data)
+    request.user = AnonymousUser()
+    request.bypass_page_cache = bypass_page_cache
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def warm_pages():
+    """
+    Render hot pages as an anonymous visitor. The post views this causes are
+    not real traffic, so they are dropped from the view counter.
+    """
+    from .counters import view_counter
+    factory = anonymous_request_factory()
+    rendered, errors = 0, []
+    for path in warmup_paths():
+        try:
+            render_anonymously(factory, path)
+            rendered += 1
+        except Exception as e:
+            errors.append(f'{path}: {e}')
+    view_counter.discard()
+    return f'{rendered} pages', errors
+
+
+STEPS = [
+    ('database', warm_database),
+    ('templates', warm_templates),
+    ('urls', warm_urls),
+    ('taxonomy', warm_taxonomy),
+    ('pages', warm_pages),
+]
+
+
+def run_warmup(skip=()):
+    """Run every warm-up step not in `skip`; returns a WarmupStep per step run."""
+    results = []
+    for name, step in STEPS:
+        if name in skip:
+            continue
+        start = time.perf_counter()
+        try:
+            detail, errors = step()
+        except Exception as e:
+            detail, errors = 'failed', [str(e)]
+        seconds = time.perf_counter() - start
+        results.append(WarmupStep(name, seconds, detail, errors))
+        logger.info('warmup %s: %.1f ms (%s, %d errors)', name, seconds * 1000, detail, len(errors))
+    return results
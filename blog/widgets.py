@@ -0,0 +1,49 @@
+"""
+Select widgets that render only the selected options and fetch the rest
+from the taxonomy autocomplete endpoint (see blog.taxonomy).
+"""
+from django import forms
+from django.urls import reverse
+
+
+class AutocompleteMixin:
+    """Select2 widget backed by blog:taxonomy_autocomplete for the given kind."""
+
+    def __init__(self, kind, attrs=None, choices=()):
+        super().__init__(attrs, choices)
+        self.kind = kind
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['class'] = f"{attrs.get('class', '')} autocomplete-select".strip()
+        attrs['data-autocomplete-url'] = reverse('blog:taxonomy_autocomplete', args=[self.kind])
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        """Only query the selected objects instead of iterating the whole queryset."""
+        selected = [v for v in value if str(v).isdigit()]
+        options = []
+        if not self.allow_multiple_selected:
+            options.append(self.create_option(name, '', '', False, 0))
+        for obj in self.choices.queryset.filter(pk__in=selected):
+            options.append(self.create_option(name, obj.pk, str(obj), True, len(options)))
+        return [(None, options, 0)]
+
+    @property
+    def media(self):
+        return forms.Media(
+            css={'all': ['admin/css/vendor/select2/select2.min.css']},
+            js=[
+                'admin/js/vendor/jquery/jquery.min.js',
+                'admin/js/vendor/select2/select2.full.min.js',
+                'js/autocomplete.js',
+            ],
+        )
+
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    pass
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    pass
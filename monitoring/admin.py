@@ -0,0 +1,38 @@
+from django.contrib import admin
+from django.utils.html import format_html
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Read-only browser for stored request profiles."""
+    list_display = ['created_at', 'method', 'path', 'view_name', 'user', 'status_code', 'duration_ms', 'trigger']
+    list_filter = ['trigger', 'method', 'status_code', 'created_at']
+    search_fields = ['path', 'view_name', 'user__username']
+    date_hierarchy = 'created_at'
+    list_select_related = ['user']
+    readonly_fields = ['created_at', 'method', 'path', 'view_name', 'user', 'status_code',
+                       'duration_ms', 'trigger', 'stats_file', 'top_functions']
+
+    fieldsets = (
+        ('Request', {
+            'fields': ('created_at', 'method', 'path', 'view_name', 'user', 'status_code', 'duration_ms', 'trigger')
+        }),
+        ('Profile', {
+            'fields': ('stats_file', 'top_functions')
+        }),
+    )
+
+    def top_functions(self, obj):
+        """Display the most expensive functions by cumulative time."""
+        if obj and obj.pk:
+            return format_html('<pre style="font-size: 12px; white-space: pre;">{}</pre>', obj.top_functions())
+        return '-'
+    top_functions.short_description = 'Top functions (cumulative)'
+
+    def has_add_permission(self, request):
+        """Profiles are only created by the profiling middleware."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,41 @@
+"""
+Management command to profile the imports of a cold project startup.
+Run: python manage.py importtime [--top 25] [--modules] [--budget 800]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.startup import group_by_package, profile_imports, startup_time
+
+
+class Command(BaseCommand):
+    help = 'Starts the project in a fresh interpreter under -X importtime and reports import time per package'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Number of packages (or modules) to show (default: 25)')
+        parser.add_argument('--modules', action='store_true', help='List the slowest individual modules instead of packages')
+        parser.add_argument('--budget', type=float,
+                            help='Fail if cold startup takes longer than this many ms (default: STARTUP_BUDGET_MS)')
+
+    def handle(self, *args, **options):
+        total_ms, entries = profile_imports()
+
+        if options['modules']:
+            self.stdout.write(f'{"self ms":>9} {"cumul. ms":>10}  module')
+            for entry in sorted(entries, key=lambda entry: entry.self_us, reverse=True)[:options['top']]:
+                self.stdout.write(f'{entry.self_us / 1000:9.1f} {entry.cumulative_us / 1000:10.1f}  {entry.module}')
+        else:
+            self.stdout.write(f'{"self ms":>9} {"cumul. ms":>10} {"modules":>8}  package')
+            for times in group_by_package(entries)[:options['top']]:
+                self.stdout.write(f'{times.self_ms:9.1f} {times.cumulative_ms:10.1f} {times.modules:8}  {times.package}')
+
+        self_ms = sum(entry.self_us for entry in entries) / 1000
+        self.stdout.write(f'\n{len(entries)} modules imported, {self_ms:.0f} ms in imports, '
+                          f'{total_ms:.0f} ms to load the WSGI application (under -X importtime)')
+
+        budget = options['budget'] or getattr(settings, 'STARTUP_BUDGET_MS', None)
+        if budget:
+            cold_ms = startup_time()
+            if cold_ms > budget:
+                raise CommandError(f'Cold startup took {cold_ms:.0f} ms, over the {budget:.0f} ms budget')
+            self.stdout.write(self.style.SUCCESS(f'✓ Cold startup {cold_ms:.0f} ms (budget {budget:.0f} ms)'))
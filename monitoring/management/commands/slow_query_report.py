@@ -0,0 +1,82 @@
+"""
+Management command to aggregate the slow query log.
+Run: python manage.py slow_query_report [--top 20] [--since 2025-01-01] [--plans]
+"""
+import json
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Lists the slowest query fingerprints from the slow query log by total time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Slow query log to read (default: SLOW_QUERY_LOG_FILE)')
+        parser.add_argument('--top', type=int, default=20, help='Number of fingerprints to show (default: 20)')
+        parser.add_argument('--since', help='Only include entries at or after this ISO date/time')
+        parser.add_argument('--view', help='Only include queries from this view name')
+        parser.add_argument('--plans', action='store_true', help='Print the captured query plan for each fingerprint')
+        parser.add_argument('--clear', action='store_true', help='Empty the log after reporting')
+
+    def handle(self, *args, **options):
+        path = options['file'] or getattr(settings, 'SLOW_QUERY_LOG_FILE', None)
+        if not path or not Path(path).exists():
+            raise CommandError(f'Slow query log not found: {path}')
+
+        since = None
+        if options['since']:
+            try:
+                since = datetime.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be an ISO date or date/time')
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+
+        stats = {}
+        with open(path) as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if since and datetime.fromisoformat(entry['time']) < since:
+                    continue
+                if options['view'] and entry.get('view') != options['view']:
+                    continue
+                row = stats.setdefault(entry['fingerprint'], {
+                    'sql': entry['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'views': Counter(), 'call_sites': Counter(), 'plan': None,
+                })
+                row['count'] += 1
+                row['total_ms'] += entry['ms']
+                row['max_ms'] = max(row['max_ms'], entry['ms'])
+                row['views'][entry.get('view')] += 1
+                row['call_sites'][entry.get('call_site')] += 1
+                if entry.get('plan') and not row['plan']:
+                    row['plan'] = entry['plan']
+
+        if not stats:
+            self.stdout.write(self.style.WARNING('No slow queries recorded.'))
+        ranked = sorted(stats.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        for fp, row in ranked[:options['top']]:
+            view, _ = row['views'].most_common(1)[0]
+            site, _ = row['call_sites'].most_common(1)[0]
+            self.stdout.write(self.style.SUCCESS(
+                f'\n[{fp}] total {row["total_ms"]:.1f} ms, {row["count"]} calls, '
+                f'avg {row["total_ms"] / row["count"]:.1f} ms, max {row["max_ms"]:.1f} ms'
+            ))
+            self.stdout.write(f'  view: {view}  ({len(row["views"])} distinct)')
+            self.stdout.write(f'  call site: {site}  ({len(row["call_sites"])} distinct)')
+            self.stdout.write(f'  sql: {row["sql"]}')
+            if options['plans'] and row['plan']:
+                self.stdout.write('  plan:')
+                for plan_line in row['plan'].splitlines():
+                    self.stdout.write(f'    {plan_line}')
+
+        if options['clear']:
+            open(path, 'w').close()
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Cleared {path}'))
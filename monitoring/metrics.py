@@ -0,0 +1,130 @@
+"""
+In-process request metrics: per-request accumulators and per-view histograms.
+
+Each worker process keeps its own registry; scrape every worker (or sum them
+in the monitoring system) to get totals for a multi-process deployment.
+"""
+import threading
+from contextvars import ContextVar
+
+
+# Metrics of the request currently being handled by this thread/task
+current_request_metrics = ContextVar('current_request_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class RequestMetrics:
+    """Timings collected while handling a single request."""
+    __slots__ = ('request', 'sql_count', 'sql_time', 'template_time', 'template_depth')
+
+    def __init__(self, request=None):
+        self.request = request
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition style."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Yield (upper bound, cumulative count) pairs including +Inf."""
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield bound, running
+        yield '+Inf', self.total
+
+
+class ViewStats:
+    """Aggregated metrics for one URL name."""
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    """Thread-safe collection of ViewStats keyed by URL name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, status, duration, metrics):
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = ViewStats()
+            stats.duration.observe(duration)
+            stats.queries.observe(metrics.sql_count)
+            stats.sql_seconds += metrics.sql_time
+            stats.template_seconds += metrics.template_time
+            status_class = f'{status // 100}xx'
+            stats.statuses[status_class] = stats.statuses.get(status_class, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            lines.append('# HELP blog_requests_total Requests handled, by view and status class.')
+            lines.append('# TYPE blog_requests_total counter')
+            for name, stats in views:
+                for status_class, count in sorted(stats.statuses.items()):
+                    lines.append(f'blog_requests_total{{view="{name}",status="{status_class}"}} {count}')
+
+            self._render_histogram(lines, views, 'blog_request_duration_seconds',
+                                   'Total request time in seconds.', lambda s: s.duration)
+            self._render_histogram(lines, views, 'blog_request_db_queries',
+                                   'SQL queries per request.', lambda s: s.queries)
+
+            lines.append('# HELP blog_db_query_seconds_total Time spent executing SQL.')
+            lines.append('# TYPE blog_db_query_seconds_total counter')
+            for name, stats in views:
+                lines.append(f'blog_db_query_seconds_total{{view="{name}"}} {stats.sql_seconds:.6f}')
+
+            lines.append('# HELP blog_template_render_seconds_total Time spent rendering templates.')
+            lines.append('# TYPE blog_template_render_seconds_total counter')
+            for name, stats in views:
+                lines.append(f'blog_template_render_seconds_total{{view="{name}"}} {stats.template_seconds:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histogram(lines, views, metric, help_text, get_histogram):
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for name, stats in views:
+            histogram = get_histogram(stats)
+            for bound, count in histogram.cumulative():
+                lines.append(f'{metric}_bucket{{view="{name}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_sum{{view="{name}"}} {histogram.sum:.6f}')
+            lines.append(f'{metric}_count{{view="{name}"}} {histogram.total}')
+
+
+registry = MetricsRegistry()
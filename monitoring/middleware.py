@@ -0,0 +1,120 @@
+"""
+Middleware measuring request time, SQL time and template render time,
+and profiling individual requests on demand.
+"""
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestMetrics, current_request_metrics, registry
+from .models import RequestProfile
+from .profiling import save_profile
+from .slow_queries import slow_query_log
+
+
+class QueryTimer:
+    """
+    Database execute wrapper adding query count and time to a RequestMetrics,
+    and passing queries slower than `slow_threshold` seconds to the slow query log.
+    """
+
+    def __init__(self, metrics, slow_threshold=None):
+        self.metrics = metrics
+        self.slow_threshold = slow_threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        if slow_query_log.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.metrics.sql_time += duration
+            self.metrics.sql_count += 1
+            if self.slow_threshold is not None and duration > self.slow_threshold:
+                slow_query_log.record(sql, params, many, duration, context['connection'], self.metrics.request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Time each request and record it against its URL name.
+    Adds a Server-Timing header (total, db and template time) when
+    SERVER_TIMING_HEADER is enabled. Should be the first middleware so the
+    total covers the rest of the stack.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SERVER_TIMING_HEADER', True)
+
+    def __call__(self, request):
+        metrics = RequestMetrics(request)
+        token = current_request_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                timer = QueryTimer(metrics, slow_query_log.threshold)
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        registry.record(view_name, response.status_code, duration, metrics)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'total;dur={duration * 1000:.1f}, '
+                f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.sql_count} queries", '
+                f'tpl;dur={metrics.template_time * 1000:.1f}'
+            )
+        return response
+
+
+class RequestProfilerMiddleware:
+    """
+    Run the rest of the request (later middleware, the view and its template
+    rendering) under cProfile and store the result.
+    Staff users trigger it with an `X-Profile: 1` header or `?profile=1`;
+    PROFILING_SAMPLE_EVERY = N additionally profiles one in N requests.
+    Must come after AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_every = getattr(settings, 'PROFILING_SAMPLE_EVERY', 0)
+
+    def __call__(self, request):
+        trigger = self.get_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        # Imported on first use; most workers never profile a request
+        import cProfile
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        # The handler runs the view the usual way (process_view hooks,
+        # ATOMIC_REQUESTS) and renders TemplateResponses before returning
+        response = profiler.runcall(self.get_response, request)
+        duration = time.perf_counter() - start
+
+        profile = save_profile(profiler, request, response, duration, trigger)
+        if trigger != RequestProfile.Trigger.SAMPLE:
+            response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def get_trigger(self, request):
+        """Return why this request should be profiled, or None."""
+        if request.user.is_authenticated and request.user.is_staff:
+            if request.headers.get('X-Profile') == '1':
+                return RequestProfile.Trigger.HEADER
+            if request.GET.get('profile') == '1':
+                return RequestProfile.Trigger.QUERY
+        if self.sample_every and random.randrange(self.sample_every) == 0:
+            return RequestProfile.Trigger.SAMPLE
+        return None
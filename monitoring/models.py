@@ -0,0 +1,43 @@
+import io
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """A cProfile capture of a single request, stored on disk under PROFILING_DIR."""
+
+    class Trigger(models.TextChoices):
+        HEADER = 'header', 'X-Profile header'
+        QUERY = 'query', 'Query parameter'
+        SAMPLE = 'sample', 'Sampled'
+
+    path = models.CharField(max_length=500)
+    method = models.CharField(max_length=10)
+    view_name = models.CharField(max_length=200, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    trigger = models.CharField(max_length=10, choices=Trigger.choices)
+    stats_file = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
+
+    def top_functions(self, limit=40, sort='cumulative'):
+        """Return the pstats report of the `limit` most expensive functions."""
+        import pstats
+        if not Path(self.stats_file).exists():
+            return 'Profile data file is missing.'
+        stream = io.StringIO()
+        stats = pstats.Stats(self.stats_file, stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
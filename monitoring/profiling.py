@@ -0,0 +1,47 @@
+"""
+Storage for per-request cProfile captures.
+"""
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RequestProfile
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def save_profile(profiler, request, response, duration, trigger):
+    """Dump profiler stats to disk, record their metadata and rotate old captures."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stats_file = directory / f'{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.prof'
+    profiler.dump_stats(stats_file)
+
+    match = request.resolver_match
+    profile = RequestProfile.objects.create(
+        path=request.get_full_path()[:500],
+        method=request.method,
+        view_name=match.view_name if match else '',
+        user=request.user if request.user.is_authenticated else None,
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        trigger=trigger,
+        stats_file=str(stats_file),
+    )
+    rotate_profiles()
+    return profile
+
+
+def rotate_profiles():
+    """Delete the oldest captures beyond PROFILING_MAX_PROFILES (files go with them)."""
+    keep = getattr(settings, 'PROFILING_MAX_PROFILES', 200)
+    stale_ids = list(
+        RequestProfile.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)[keep:]
+    )
+    if stale_ids:
+        # Queryset delete still sends post_delete per row, which removes the files
+        RequestProfile.objects.filter(pk__in=stale_ids).delete()
@@ -0,0 +1,15 @@
+"""
+Signals for monitoring app.
+"""
+from pathlib import Path
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import RequestProfile
+
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_file(sender, instance, **kwargs):
+    """Remove the stats file from disk when its profile record is deleted."""
+    Path(instance.stats_file).unlink(missing_ok=True)
@@ -0,0 +1,147 @@
+"""
+Slow query log: records queries over SLOW_QUERY_THRESHOLD_MS with their
+normalized fingerprint, originating view and call site, and captures the
+query plan the first time each fingerprint is seen by a process.
+
+Records are appended as JSON lines to SLOW_QUERY_LOG_FILE so that the
+`slow_query_report` command can aggregate them across processes.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Cap on fingerprints remembered per process for EXPLAIN de-duplication
+MAX_SEEN_FINGERPRINTS = 10000
+
+# Frames of django/template/base.py carry the template node being rendered
+TEMPLATE_BASE_FILE = os.path.join('template', 'base.py')
+
+_IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Replace literals and placeholder lists so equivalent queries compare equal."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER_RE.sub('?', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def call_site():
+    """
+    Return where the query came from: 'path:line in function' for the innermost
+    project frame outside this app, or 'template:line' for a template tag.
+    """
+    base_dir = str(settings.BASE_DIR)
+    monitoring_dir = str(Path(__file__).resolve().parent)
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if frame.f_code.co_name == 'render_annotated' and filename.endswith(TEMPLATE_BASE_FILE):
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno} (template)'
+        if (filename.startswith(base_dir) and not filename.startswith(monitoring_dir)
+                and 'site-packages' not in filename):
+            return f'{Path(filename).relative_to(base_dir)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryLog:
+    """Process-wide slow query recorder."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._local = threading.local()
+
+    @property
+    def threshold(self):
+        """Threshold in seconds, or None when the log is disabled."""
+        threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+        return None if threshold_ms is None else threshold_ms / 1000
+
+    @property
+    def explaining(self):
+        """True while this thread runs an EXPLAIN, so it is not timed or logged itself."""
+        return getattr(self._local, 'explaining', False)
+
+    def record(self, sql, params, many, duration, connection, request=None):
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        match = getattr(request, 'resolver_match', None)
+        entry = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'fingerprint': key,
+            'sql': normalized,
+            'ms': round(duration * 1000, 3),
+            'database': connection.alias,
+            'view': match.view_name if match else (request.path if request is not None else None),
+            'call_site': call_site(),
+        }
+
+        with self._lock:
+            is_new = key not in self._seen
+            if is_new and len(self._seen) < MAX_SEEN_FINGERPRINTS:
+                self._seen.add(key)
+        if is_new and not many:
+            entry['plan'] = self.explain(connection, sql, params)
+
+        logger.warning('Slow query (%.1f ms) [%s] from %s at %s: %s',
+                       entry['ms'], key, entry['view'], entry['call_site'], normalized)
+        self.write(entry)
+
+    def explain(self, connection, sql, params):
+        """Return the query plan for a SELECT, or None."""
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return None
+        self._local.explaining = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                rows = cursor.fetchall()
+        except Exception as e:
+            return f'EXPLAIN failed: {e}'
+        finally:
+            self._local.explaining = False
+        if connection.vendor == 'sqlite':
+            # Rows are (id, parent, notused, detail)
+            return '\n'.join(row[-1] for row in rows)
+        return '\n'.join(' '.join(str(col) for col in row) for row in rows)
+
+    def write(self, entry):
+        path = getattr(settings, 'SLOW_QUERY_LOG_FILE', None)
+        if not path:
+            return
+        path = Path(path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock, open(path, 'a') as fh:
+                fh.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            logger.error(f'Error writing slow query log: {e}')
+
+
+slow_query_log = SlowQueryLog()
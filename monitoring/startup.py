@@ -0,0 +1,113 @@
+"""
+Cold-start measurements for the project.
+
+Both measurements run in a fresh interpreter, since the current process has
+already imported everything:
+
+- startup_time() times loading the WSGI application (settings, every
+  installed app and its models, signals and the middleware chain).
+- profile_imports() runs the same startup under `python -X importtime` and
+  groups the per-module times by package, so a slow import can be traced
+  to the app that pulled it in.
+
+Django imports app and models modules with importlib.import_module(), which
+-X importtime doesn't report. The profiling run routes those imports through
+__import__ so they show up like any other import.
+"""
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+
+
+ImportEntry = namedtuple('ImportEntry', ['module', 'depth', 'self_us', 'cumulative_us'])
+PackageTimes = namedtuple('PackageTimes', ['package', 'modules', 'self_ms', 'cumulative_ms'])
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+print((time.perf_counter() - start) * 1000)
+'''
+
+TRACE_APP_IMPORTS = '''
+import importlib, sys
+_import_module = importlib.import_module
+def import_module(name, package=None):
+    if package or name.startswith('.'):
+        return _import_module(name, package)
+    __import__(name)
+    return sys.modules[name]
+importlib.import_module = import_module
+'''
+
+
+def run_startup(script, python_options=()):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    return subprocess.run(
+        [sys.executable, *python_options, '-c', script],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def startup_time(runs=3):
+    """Best of `runs` cold starts, in milliseconds."""
+    return min(float(run_startup(STARTUP_SCRIPT).stdout.strip().splitlines()[-1]) for _ in range(runs))
+
+
+def parse_importtime(output):
+    entries = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append(ImportEntry(module, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def package_of(module):
+    """Group django.contrib apps separately from the rest of Django."""
+    parts = module.split('.')
+    if parts[:2] == ['django', 'contrib'] and len(parts) > 2:
+        return '.'.join(parts[:3])
+    return parts[0]
+
+
+def group_by_package(entries):
+    """
+    Sum import times per package. `self_ms` is time spent in the package's
+    own modules; `cumulative_ms` adds everything they imported first, which
+    is roughly what not importing the package at startup would save (a
+    dependency is counted under each package that imported it first).
+    """
+    modules = defaultdict(int)
+    self_us = defaultdict(int)
+    cumulative_us = defaultdict(int)
+    # -X importtime lists children before their parent; a parent is the next
+    # line with a smaller depth, so walk backwards keeping the open parents
+    parents = []
+    for entry in reversed(entries):
+        del parents[entry.depth:]
+        package = package_of(entry.module)
+        modules[package] += 1
+        self_us[package] += entry.self_us
+        if not parents or package_of(parents[-1]) != package:
+            cumulative_us[package] += entry.cumulative_us
+        parents.append(entry.module)
+    return sorted(
+        (PackageTimes(package, modules[package], self_us[package] / 1000, cumulative_us[package] / 1000)
+         for package in modules),
+        key=lambda times: times.cumulative_ms, reverse=True,
+    )
+
+
+def profile_imports():
+    """Return (startup ms, ImportEntry list) for one cold start under -X importtime."""
+    result = run_startup(TRACE_APP_IMPORTS + STARTUP_SCRIPT, python_options=['-X', 'importtime'])
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
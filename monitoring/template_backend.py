@@ -0,0 +1,37 @@
+"""
+Django template backend that reports render time to the request metrics.
+"""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import current_request_metrics
+
+
+class TimedTemplate(Template):
+    """Backend template wrapper timing top-level render() calls."""
+
+    def render(self, context=None, request=None):
+        metrics = current_request_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        # Templates rendered from inside another render are already being timed
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend returning TimedTemplate instances."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,261 @@
+import json
+import os
+import pstats
+import re
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .metrics import Histogram, RequestMetrics, registry
+from .middleware import QueryTimer
+from .models import RequestProfile
+from .slow_queries import fingerprint, normalize_sql, slow_query_log
+from .startup import group_by_package, parse_importtime, profile_imports, startup_time
+
+
+IMPORTTIME_SAMPLE = '''\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     django.db.models.fields
+import time:       200 |        300 |   django.db.models
+import time:       400 |        700 | blog.models
+import time:        50 |         50 | blog.signals
+import time:        30 |         30 | django.urls
+'''
+
+
+class HistogramTests(SimpleTestCase):
+
+    def test_cumulative_buckets(self):
+        histogram = Histogram((1, 2, 5))
+        for value in (0.5, 2, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative()), [(1, 1), (2, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual((histogram.total, histogram.sum), (4, 15.5))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'metrics-tests'}},
+    METRICS_ALLOWED_IPS=[],
+)
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_query_timer_counts_queries(self):
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(QueryTimer(metrics)):
+            User.objects.count()
+            User.objects.exists()
+        self.assertEqual(metrics.sql_count, 2)
+        self.assertGreater(metrics.sql_time, 0)
+
+    def test_request_is_timed_per_view(self):
+        response = self.client.get(reverse('blog:home'))
+        timing = re.fullmatch(
+            r'total;dur=([\d.]+), db;dur=([\d.]+);desc="(\d+) queries", tpl;dur=([\d.]+)', response['Server-Timing'],
+        )
+        self.assertIsNotNone(timing, response['Server-Timing'])
+        total, db, queries, template = timing.groups()
+        self.assertGreater(int(queries), 0)
+        self.assertGreater(float(template), 0)
+        self.assertLessEqual(float(db), float(total))
+
+        output = registry.render()
+        self.assertIn('blog_requests_total{view="blog:home",status="2xx"} 1', output)
+        self.assertIn('blog_request_duration_seconds_bucket{view="blog:home",le="+Inf"} 1', output)
+        self.assertIn('blog_request_duration_seconds_count{view="blog:home"} 1', output)
+        self.assertIn('blog_request_db_queries_bucket{view="blog:home",le="+Inf"} 1', output)
+        self.assertIn('blog_template_render_seconds_total{view="blog:home"}', output)
+
+    def test_metrics_need_staff_or_allowed_ip(self):
+        self.client.get(reverse('blog:home'))
+        self.assertEqual(self.client.get(reverse('monitoring:metrics')).status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.7']):
+            response = self.client.get(reverse('monitoring:metrics'), REMOTE_ADDR='10.0.0.7')
+        self.assertContains(response, 'blog_requests_total{view="blog:home"')
+        self.client.force_login(User.objects.create_user('staff', password='pass', is_staff=True))
+        self.assertEqual(self.client.get(reverse('monitoring:metrics')).status_code, 200)
+
+    def test_health_reports_failures_without_details_for_anonymous(self):
+        response = self.client.get(reverse('monitoring:health'))
+        self.assertEqual((response.status_code, response.json()['status']), (200, 'ok'))
+
+        with mock.patch.object(caches['default'], 'set', side_effect=ConnectionError('cache at 10.0.0.3 refused')):
+            response = self.client.get(reverse('monitoring:health'))
+        self.assertEqual((response.status_code, response.json()['status']), (503, 'error'))
+        self.assertFalse(response.json()['cache']['default']['ok'])
+        self.assertNotContains(response, '10.0.0.3', status_code=503)
+
+        broken = mock.Mock(alias='default')
+        broken.cursor.side_effect = OperationalError('unable to open /srv/db.sqlite3')
+        self.client.force_login(User.objects.create_user('staff', password='pass', is_staff=True))
+        with mock.patch('monitoring.views.connections') as connections:
+            connections.all.return_value = [broken]
+            response = self.client.get(reverse('monitoring:health'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['database']['default']['error'], 'unable to open /srv/db.sqlite3')
+        self.assertIn('ms', response.json()['database']['default'])
+
+
+class SlowQueryFingerprintTests(SimpleTestCase):
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT  * FROM blog_post2 WHERE id IN (%s, %s,%s)\n AND title = 'It''s 42' AND views > 10 AND score < 2.5"),
+            'SELECT * FROM blog_post2 WHERE id IN (...) AND title = ? AND views > ? AND score < ?',
+        )
+        self.assertEqual(normalize_sql('SELECT 1 FROM t WHERE a = %s LIMIT 21'), 'SELECT ? FROM t WHERE a = ? LIMIT ?')
+
+    def test_fingerprint_ignores_literals_and_list_lengths(self):
+        first = fingerprint(normalize_sql('SELECT * FROM t WHERE id IN (%s, %s) AND x = 1'))
+        self.assertEqual(first, fingerprint(normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 'y'")))
+        self.assertNotEqual(first, fingerprint(normalize_sql('SELECT * FROM u WHERE id IN (%s, %s) AND x = 1')))
+        self.assertRegex(first, r'^[0-9a-f]{16}$')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'slow-query-tests'}},
+    SLOW_QUERY_THRESHOLD_MS=0,
+)
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_file = Path(directory.name, 'slow.jsonl')
+        settings_override = override_settings(SLOW_QUERY_LOG_FILE=self.log_file)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Plans are captured once per fingerprint and process
+        slow_query_log._seen.clear()
+
+    def entries(self):
+        return [json.loads(line) for line in self.log_file.read_text().splitlines()]
+
+    def test_slow_queries_are_logged_with_view_call_site_and_plan(self):
+        with self.assertLogs('monitoring.slow_queries', 'WARNING'):
+            self.client.get(reverse('blog:home'))
+        first = self.entries()
+        self.assertTrue(first)
+        self.assertEqual({entry['view'] for entry in first}, {'blog:home'})
+        self.assertTrue(all(entry['call_site'] for entry in first))
+        plans = [entry for entry in first if entry.get('plan')]
+        self.assertTrue(plans)
+        self.assertIn('blog_post', ' '.join(entry['plan'] for entry in plans))
+        # The EXPLAIN queries themselves are not timed or logged
+        self.assertFalse(any(entry['sql'].startswith('EXPLAIN') for entry in first))
+
+        with self.assertLogs('monitoring.slow_queries', 'WARNING'):
+            self.client.get(reverse('blog:home'))
+        second = self.entries()[len(first):]
+        self.assertTrue(second)
+        self.assertFalse(any('plan' in entry for entry in second))
+
+        out = StringIO()
+        call_command('slow_query_report', plans=True, stdout=out)
+        self.assertIn('view: blog:home', out.getvalue())
+        self.assertIn('call site: ', out.getvalue())
+        self.assertIn('plan:', out.getvalue())
+        self.assertIn('2 calls', out.getvalue())
+
+    def test_report_filters_and_clear(self):
+        with self.assertLogs('monitoring.slow_queries', 'WARNING'):
+            self.client.get(reverse('blog:home'))
+        out = StringIO()
+        call_command('slow_query_report', view='blog:post_detail', stdout=out)
+        self.assertIn('No slow queries recorded.', out.getvalue())
+        out = StringIO()
+        call_command('slow_query_report', since='2999-01-01', stdout=out)
+        self.assertIn('No slow queries recorded.', out.getvalue())
+        out = StringIO()
+        call_command('slow_query_report', since='2000-01-01', view='blog:home', clear=True, stdout=out)
+        self.assertIn('view: blog:home', out.getvalue())
+        self.assertIn('Cleared', out.getvalue())
+        self.assertEqual(self.log_file.read_text(), '')
+        with self.assertRaisesMessage(CommandError, '--since must be an ISO date'):
+            call_command('slow_query_report', since='last week')
+
+
+class StartupProfileTests(SimpleTestCase):
+
+    def test_group_by_package(self):
+        entries = parse_importtime(IMPORTTIME_SAMPLE)
+        self.assertEqual([(entry.module, entry.depth) for entry in entries][:3], [
+            ('django.db.models.fields', 2), ('django.db.models', 1), ('blog.models', 0),
+        ])
+        times = {times.package: times for times in group_by_package(entries)}
+        self.assertEqual((times['blog'].modules, times['blog'].self_ms, times['blog'].cumulative_ms), (2, 0.45, 0.75))
+        self.assertEqual((times['django'].self_ms, times['django'].cumulative_ms), (0.33, 0.33))
+
+    def test_startup_skips_unused_and_on_demand_modules(self):
+        _, entries = profile_imports()
+        imported = {entry.module for entry in entries}
+        self.assertIn('blog.models', imported)
+        for module in ('taggit', 'cProfile', 'pstats'):
+            self.assertNotIn(module, imported)
+
+    # Wall-clock timing flakes on busy hosts; `importtime --budget` enforces the budget
+    @skipUnless(os.environ.get('STARTUP_BUDGET_TEST'), 'set STARTUP_BUDGET_TEST=1 to time cold starts')
+    def test_cold_startup_within_budget(self):
+        budget = getattr(settings, 'STARTUP_BUDGET_MS', 1000)
+        elapsed = startup_time()
+        self.assertLessEqual(elapsed, budget, f'Cold startup took {elapsed:.0f} ms, over the {budget} ms budget')
+
+
+class MarkViewMiddleware:
+    """Records that its process_view hook ran (it comes after the profiler)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        response['X-Process-View'] = str(getattr(request, 'process_view_ran', False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.process_view_ran = True
+
+
+@override_settings(
+    MIDDLEWARE=settings.MIDDLEWARE + ['monitoring.tests.MarkViewMiddleware'],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'profiler-tests'}},
+)
+class RequestProfilerTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PROFILING_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(User.objects.create_user('staff', password='pass', is_staff=True))
+
+    def test_profiled_request_runs_the_whole_stack(self):
+        response = self.client.get(reverse('blog:home'), HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Process-View'], 'True')
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.view_name, profile.trigger), ('blog:home', RequestProfile.Trigger.HEADER))
+        functions = {name for _, _, name in pstats.Stats(profile.stats_file).stats}
+        self.assertIn('render', functions)
+
+    def test_unprofiled_request(self):
+        response = self.client.get(reverse('blog:home'))
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(response['X-Process-View'], 'True')
+        self.assertFalse(RequestProfile.objects.exists())
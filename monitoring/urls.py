@@ -0,0 +1,12 @@
+"""
+URL configuration for monitoring app.
+"""
+from django.urls import path
+from . import views
+
+app_name = 'monitoring'
+
+urlpatterns = [
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('health/', views.health_view, name='health'),
+]
@@ -0,0 +1,67 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.cache import never_cache
+
+from .metrics import registry
+
+
+def can_view_metrics(request):
+    """Allow staff users and requests from METRICS_ALLOWED_IPS."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', [])
+
+
+@never_cache
+def metrics_view(request):
+    """Expose per-view request metrics in the Prometheus text format."""
+    if not can_view_metrics(request):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@never_cache
+def health_view(request):
+    """
+    Probe every database and cache, returning their latency and 503 on failure.
+    Error messages are only shown to callers allowed to see the metrics.
+    """
+    detailed = can_view_metrics(request)
+    healthy = True
+    checks = {'database': {}, 'cache': {}}
+
+    for connection in connections.all():
+        start = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            checks['database'][connection.alias] = {'ok': True}
+        except Exception as e:
+            healthy = False
+            checks['database'][connection.alias] = {'ok': False}
+            if detailed:
+                checks['database'][connection.alias]['error'] = str(e)
+        checks['database'][connection.alias]['ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    for alias in settings.CACHES:
+        start = time.perf_counter()
+        try:
+            cache = caches[alias]
+            cache.set('monitoring:health', 'ok', 10)
+            ok = cache.get('monitoring:health') == 'ok'
+            checks['cache'][alias] = {'ok': ok}
+            healthy = healthy and ok
+        except Exception as e:
+            healthy = False
+            checks['cache'][alias] = {'ok': False}
+            if detailed:
+                checks['cache'][alias]['error'] = str(e)
+        checks['cache'][alias]['ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    checks['status'] = 'ok' if healthy else 'error'
+    return JsonResponse(checks, status=200 if healthy else 503)
@@ -0,0 +1,23 @@
+/* Turn .autocomplete-select elements into Select2 boxes fed by the taxonomy autocomplete endpoint */
+(function ($) {
+    'use strict';
+
+    $(function () {
+        $('select.autocomplete-select').each(function () {
+            var $select = $(this);
+            $select.select2({
+                width: '100%',
+                allowClear: !this.multiple,
+                placeholder: this.multiple ? 'Search tags...' : 'Search categories...',
+                ajax: {
+                    url: $select.data('autocomplete-url'),
+                    dataType: 'json',
+                    delay: 150,
+                    data: function (params) {
+                        return {term: params.term || ''};
+                    }
+                }
+            });
+        });
+    });
+})(jQuery);
@@ -0,0 +1,86 @@
+/* Search-as-you-type suggestions for inputs with a data-suggest-url attribute */
+document.addEventListener('DOMContentLoaded', function() {
+    const GROUPS = [['posts', 'Posts'], ['categories', 'Categories'], ['tags', 'Tags']];
+
+    document.querySelectorAll('input[data-suggest-url]').forEach(input => {
+        const form = input.form;
+        const list = document.createElement('ul');
+        list.className = 'search-suggestions';
+        list.hidden = true;
+        form.style.position = 'relative';
+        form.appendChild(list);
+
+        let timer = null;
+        let controller = null;
+        let active = -1;
+
+        function links() {
+            return Array.from(list.querySelectorAll('a'));
+        }
+
+        function highlight(index) {
+            const items = links();
+            items.forEach(link => link.classList.remove('active'));
+            active = items.length ? (index + items.length) % items.length : -1;
+            if (active >= 0) items[active].classList.add('active');
+        }
+
+        function render(data) {
+            list.innerHTML = '';
+            active = -1;
+            GROUPS.forEach(([key, label]) => {
+                if (!data[key] || !data[key].length) return;
+                const heading = document.createElement('li');
+                heading.className = 'suggestion-group';
+                heading.textContent = label;
+                list.appendChild(heading);
+                data[key].forEach(item => {
+                    const li = document.createElement('li');
+                    const link = document.createElement('a');
+                    link.href = item.url;
+                    link.textContent = item.name;
+                    li.appendChild(link);
+                    list.appendChild(li);
+                });
+            });
+            list.hidden = !list.children.length;
+        }
+
+        function fetchSuggestions() {
+            const term = input.value.trim();
+            if (controller) controller.abort();
+            if (!term) {
+                render({});
+                return;
+            }
+            controller = new AbortController();
+            fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(term), {signal: controller.signal})
+                .then(response => response.json())
+                .then(render)
+                .catch(() => {});
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(fetchSuggestions, 80);
+        });
+
+        input.addEventListener('keydown', function(e) {
+            if (list.hidden) return;
+            if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+                e.preventDefault();
+                highlight(active + (e.key === 'ArrowDown' ? 1 : -1));
+            } else if (e.key === 'Enter' && active >= 0) {
+                e.preventDefault();
+                window.location = links()[active].href;
+            } else if (e.key === 'Escape') {
+                list.hidden = true;
+            }
+        });
+
+        input.addEventListener('blur', function() {
+            // Let a click on a suggestion land before hiding the list
+            setTimeout(() => { list.hidden = true; }, 150);
+        });
+    });
+});